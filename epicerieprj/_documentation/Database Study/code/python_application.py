@@ -1,5 +1,6 @@
 import sys
 import os
+import time
 import datetime
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QTabWidget, QVBoxLayout, QHBoxLayout,
@@ -8,14 +9,25 @@ from PyQt5.QtWidgets import (
     QSpinBox, QDoubleSpinBox, QDateEdit, QFrame, QStackedWidget, QScrollArea,
     QSplitter, QHeaderView, QStyle, QGridLayout, QSpacerItem, QSizePolicy
 )
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtCore import Qt, QDate, QObject, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon, QFont
 import pyodbc
 from dotenv import load_dotenv
 
+from replica_cache import ReplicaCache, ReplicaSync
+from search_index import SearchIndex
+from reports_tab import ReportsTab
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Startup timing: the login screen should be on screen within this budget
+STARTUP_STARTED = time.perf_counter()
+STARTUP_TARGET_MS = 300
+
+# Delay after the last keystroke before the list is filtered
+SEARCH_DEBOUNCE_MS = 100
+
 # Database connection
 class DatabaseConnection:
     def __init__(self):
@@ -28,7 +40,7 @@ class DatabaseConnection:
             self.password = os.getenv("DB_PASSWORD")
             
             # Create connection string
-            conn_str = (
+            self.conn_str = (
                 f"DRIVER={{ODBC Driver 17 for SQL Server}};"
                 f"SERVER={self.server};"
                 f"DATABASE={self.database};"
@@ -37,7 +49,7 @@ class DatabaseConnection:
             )
             
             # Connect to database
-            self.connection = pyodbc.connect(conn_str)
+            self.connection = pyodbc.connect(self.conn_str)
             print("Database connection successful")
             
         except Exception as e:
@@ -46,11 +58,20 @@ class DatabaseConnection:
     def get_connection(self):
         return self.connection
     
+    def new_connection(self):
+        # Separate connection for background work (pyodbc connections must not
+        # be shared between threads)
+        return pyodbc.connect(self.conn_str)
+    
     def close_connection(self):
         if self.connection:
             self.connection.close()
             print("Database connection closed")
 
+# Relays replica sync results from the sync thread to the UI thread
+class SyncNotifier(QObject):
+    synced = pyqtSignal(dict)
+
 # Authentication System
 class AuthenticationSystem:
     def __init__(self, db_connection):
@@ -92,7 +113,16 @@ class MainWindow(QMainWindow):
         # Set up the authentication system
         self.auth_system = AuthenticationSystem(self.conn)
         
+        # Local replica of suppliers, products and prices, read by the tabs and
+        # kept up to date in the background (see replica_cache.py); stored in the
+        # user's application data directory unless REPLICA_PATH is set
+        self.replica = ReplicaCache(os.getenv("REPLICA_PATH") or None)
+        self.sync_notifier = SyncNotifier()
+        self.replica_sync = ReplicaSync(self.replica, self.db.new_connection, self.sync_notifier.synced.emit)
+        self.replica_sync.start(interval=int(os.getenv("REPLICA_SYNC_SECONDS", "30")))
+        
         # Initialize UI
+        self.startup_logged = False
         self.setup_ui()
         
     def setup_ui(self):
@@ -103,25 +133,42 @@ class MainWindow(QMainWindow):
         # Create login widget
         self.login_widget = LoginWidget(self.auth_system, self.on_login_success)
         
-        # Create main dashboard widget
-        self.dashboard_widget = DashboardWidget(self.conn)
+        # The dashboard is created after login (see on_login_success)
+        self.dashboard_widget = None
         
         # Add widgets to stack
         self.central_widget.addWidget(self.login_widget)
-        self.central_widget.addWidget(self.dashboard_widget)
         
         # Start with login screen
         self.central_widget.setCurrentIndex(0)
     
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.startup_logged:
+            self.startup_logged = True
+            # Runs once the event loop is idle, i.e. after the first paint
+            QTimer.singleShot(0, self.log_startup_time)
+    
+    def log_startup_time(self):
+        elapsed_ms = (time.perf_counter() - STARTUP_STARTED) * 1000
+        status = "OK" if elapsed_ms <= STARTUP_TARGET_MS else f"over the {STARTUP_TARGET_MS} ms target"
+        print(f"Startup: login screen shown in {elapsed_ms:.0f} ms ({status})")
+    
     def on_login_success(self, user_data):
+        # Create the dashboard on first login; its tabs load their data when first opened
+        if self.dashboard_widget is None:
+            self.dashboard_widget = DashboardWidget(self.conn, self.replica_sync, self.sync_notifier)
+            self.central_widget.addWidget(self.dashboard_widget)
+        
         # Set user data in dashboard
         self.dashboard_widget.set_user_data(user_data)
         
         # Switch to dashboard view
-        self.central_widget.setCurrentIndex(1)
+        self.central_widget.setCurrentWidget(self.dashboard_widget)
     
     def closeEvent(self, event):
-        # Close database connection when application exits
+        # Stop background sync and close database connection when application exits
+        self.replica_sync.stop()
         self.db.close_connection()
         event.accept()
 
@@ -213,10 +260,13 @@ class LoginWidget(QWidget):
 
 # Dashboard Widget
 class DashboardWidget(QWidget):
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, replica_sync=None, sync_notifier=None):
         super().__init__()
         self.db_connection = db_connection
+        self.replica_sync = replica_sync
+        self.sync_notifier = sync_notifier
         self.user_data = None
+        self.is_admin = False
         self.setup_ui()
     
     def set_user_data(self, user_data):
@@ -224,10 +274,13 @@ class DashboardWidget(QWidget):
         self.update_user_info()
         
         # Update access control based on user role
-        is_admin = self.user_data["role"] == "Administrator"
-        self.supplier_management.set_admin_access(is_admin)
-        self.product_management.set_admin_access(is_admin)
-        self.catalog_management.set_admin_access(is_admin)
+        self.is_admin = self.user_data["role"] == "Administrator"
+        for tab in self.tabs.values():
+            if hasattr(tab, "set_admin_access"):
+                tab.set_admin_access(self.is_admin)
+        
+        # Build the tab that is showing
+        self.activate_tab(self.tab_widget.currentIndex())
     
     def update_user_info(self):
         if self.user_data:
@@ -261,38 +314,72 @@ class DashboardWidget(QWidget):
         header_layout.addWidget(logout_button)
         
         # Create tab widget for main sections
-        tab_widget = QTabWidget()
-        
-        # Create each management tab
-        self.supplier_management = SupplierManagementTab(self.db_connection)
-        self.product_management = ProductManagementTab(self.db_connection)
-        self.catalog_management = CatalogManagementTab(self.db_connection)
-        self.reports = ReportsTab(self.db_connection)
-        
-        # Add tabs to tab widget
-        tab_widget.addTab(self.supplier_management, "Supplier Management")
-        tab_widget.addTab(self.product_management, "Product Management")
-        tab_widget.addTab(self.catalog_management, "Catalog Management")
-        tab_widget.addTab(self.reports, "Reports")
+        self.tab_widget = QTabWidget()
+        
+        # Each tab queries the database when it is built, so tabs start as
+        # empty placeholders and are built the first time they are opened
+        self.tab_factories = [
+            ("Supplier Management", lambda: SupplierManagementTab(
+                self.db_connection, self.replica_sync, self.sync_notifier
+            )),
+            ("Product Management", lambda: ProductManagementTab(self.db_connection)),
+            ("Catalog Management", lambda: CatalogManagementTab(self.db_connection)),
+            ("Reports", lambda: ReportsTab(self.db_connection)),
+        ]
+        self.tabs = {}
+        for title, factory in self.tab_factories:
+            placeholder = QWidget()
+            placeholder_layout = QVBoxLayout(placeholder)
+            placeholder_layout.setContentsMargins(0, 0, 0, 0)
+            self.tab_widget.addTab(placeholder, title)
+        self.tab_widget.currentChanged.connect(self.activate_tab)
         
         # Add layouts and widgets to main layout
         main_layout.addLayout(header_layout)
-        main_layout.addWidget(tab_widget)
+        main_layout.addWidget(self.tab_widget)
         
         self.setLayout(main_layout)
     
+    def activate_tab(self, index):
+        if index < 0 or index in self.tabs:
+            return
+        title, factory = self.tab_factories[index]
+        
+        started = time.perf_counter()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            tab = factory()
+        finally:
+            QApplication.restoreOverrideCursor()
+        if hasattr(tab, "set_admin_access"):
+            tab.set_admin_access(self.is_admin)
+        self.tab_widget.widget(index).layout().addWidget(tab)
+        self.tabs[index] = tab
+        print(f"Startup: {title} tab loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
     def logout(self):
         # Switch back to login screen
         self.parent().parent().central_widget.setCurrentIndex(0)
 
 # Supplier Management Tab
 class SupplierManagementTab(QWidget):
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, replica_sync=None, sync_notifier=None):
         super().__init__()
         self.db_connection = db_connection
+        self.replica_sync = replica_sync
+        self.replica = replica_sync.replica if replica_sync else None
         self.is_admin = False
+        
+        # Filter-as-you-type over the loaded rows
+        self.search_index = SearchIndex()
+        self.row_for_key = {}
+        self.hidden_keys = set()
         self.setup_ui()
         
+        # Reload when the background sync brings in supplier changes
+        if sync_notifier:
+            sync_notifier.synced.connect(self.on_replica_synced)
+        
     def set_admin_access(self, is_admin):
         self.is_admin = is_admin
         self.add_supplier_button.setEnabled(is_admin)
@@ -312,6 +399,15 @@ class SupplierManagementTab(QWidget):
         self.search_input.setPlaceholderText("Search by company name, TIN, etc.")
         search_button = QPushButton("Search")
         search_button.clicked.connect(self.search_suppliers)
+        self.search_input.returnPressed.connect(self.search_suppliers)
+        
+        # Filter the loaded rows as the user types, once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_filter)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.match_label = QLabel("")
         
         # Add supplier button
         self.add_supplier_button = QPushButton("Add New Supplier")
@@ -329,6 +425,7 @@ class SupplierManagementTab(QWidget):
         control_panel.addWidget(search_label)
         control_panel.addWidget(self.search_input)
         control_panel.addWidget(search_button)
+        control_panel.addWidget(self.match_label)
         control_panel.addStretch()
         control_panel.addWidget(self.add_supplier_button)
         control_panel.addWidget(self.edit_supplier_button)
@@ -351,7 +448,53 @@ class SupplierManagementTab(QWidget):
         # Load suppliers on initialization
         self.load_suppliers()
     
+    def populate_table(self, rows):
+        rows = list(rows)
+        
+        # Clear table
+        self.suppliers_table.setRowCount(0)
+        
+        # Populate table with suppliers
+        self.row_for_key = {}
+        for row_num, row_data in enumerate(rows):
+            self.suppliers_table.insertRow(row_num)
+            for col_num, data in enumerate(row_data):
+                item = QTableWidgetItem(str(data))
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)  # Make read-only
+                self.suppliers_table.setItem(row_num, col_num, item)
+            self.row_for_key[row_data[0]] = row_num
+        
+        # Index TIN, company name and status; only changed rows are re-indexed
+        self.search_index.sync((row[0], row[1], row[2], row[5]) for row in rows)
+        self.hidden_keys = set()
+        self.apply_filter()
+    
+    def apply_filter(self):
+        self.search_timer.stop()
+        matches = self.search_index.search(self.search_input.text())
+        if matches is None:
+            hidden = set()
+        else:
+            hidden = self.row_for_key.keys() - matches
+        
+        # Only touch the rows whose visibility changed since the last keystroke
+        changed = hidden ^ self.hidden_keys
+        if changed:
+            self.suppliers_table.setUpdatesEnabled(False)
+            for key in changed:
+                self.suppliers_table.setRowHidden(self.row_for_key[key], key in hidden)
+            self.suppliers_table.setUpdatesEnabled(True)
+        self.hidden_keys = hidden
+        
+        total = len(self.row_for_key)
+        self.match_label.setText(f"{total - len(hidden)} of {total}" if hidden else "")
+    
     def load_suppliers(self):
+        # Read from the local replica when it has been synced at least once
+        if self.replica and not self.replica.is_empty():
+            self.populate_table(self.replica.suppliers())
+            return
+        
         try:
             cursor = self.db_connection.cursor()
             cursor.execute("""
@@ -359,27 +502,42 @@ class SupplierManagementTab(QWidget):
                 FROM Suppliers 
                 ORDER BY CompanyName
             """)
-            
-            # Clear table
-            self.suppliers_table.setRowCount(0)
-            
-            # Populate table with suppliers
-            for row_num, row_data in enumerate(cursor.fetchall()):
-                self.suppliers_table.insertRow(row_num)
-                for col_num, data in enumerate(row_data):
-                    item = QTableWidgetItem(str(data))
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                    self.suppliers_table.setItem(row_num, col_num, item)
+            self.populate_table(cursor.fetchall())
         
         except Exception as e:
             QMessageBox.critical(self, "Database Error", f"Error loading suppliers: {e}")
     
+    def on_replica_synced(self, result):
+        if not result.get("ok"):
+            return
+        if result["pulled"].get("Suppliers") or result["deleted"].get("Suppliers") or result["conflicts"]:
+            self.load_suppliers()
+        if result["conflicts"]:
+            QMessageBox.warning(
+                self,
+                "Sync Conflict",
+                f"{result['conflicts']} offline change(s) could not be saved because the supplier was "
+                "changed on the server in the meantime. The server version is shown.",
+            )
+    
+    def refresh_after_server_write(self):
+        # The replica picks up the change on the next sync, which reloads the table
+        if self.replica and not self.replica.is_empty():
+            self.replica_sync.request_sync()
+        else:
+            self.load_suppliers()
+    
     def search_suppliers(self):
         search_text = self.search_input.text().strip()
         
         if not search_text:
             self.load_suppliers()
             return
+        
+        # The replica holds every supplier, so the loaded rows are complete
+        if self.replica and not self.replica.is_empty():
+            self.apply_filter()
+            return
             
         try:
             cursor = self.db_connection.cursor()
@@ -390,16 +548,8 @@ class SupplierManagementTab(QWidget):
                 ORDER BY CompanyName
             """, (f'%{search_text}%', f'%{search_text}%'))
             
-            # Clear table
-            self.suppliers_table.setRowCount(0)
-            
             # Populate table with search results
-            for row_num, row_data in enumerate(cursor.fetchall()):
-                self.suppliers_table.insertRow(row_num)
-                for col_num, data in enumerate(row_data):
-                    item = QTableWidgetItem(str(data))
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)  # Make read-only
-                    self.suppliers_table.setItem(row_num, col_num, item)
+            self.populate_table(cursor.fetchall())
         
         except Exception as e:
             QMessageBox.critical(self, "Database Error", f"Error searching suppliers: {e}")
@@ -413,7 +563,7 @@ class SupplierManagementTab(QWidget):
         result = dialog.exec_()
         
         if result == QDialog.Accepted:
-            self.load_suppliers()
+            self.refresh_after_server_write()
     
     def edit_supplier(self):
         if not self.is_admin:
@@ -433,7 +583,7 @@ class SupplierManagementTab(QWidget):
         result = dialog.exec_()
         
         if result == QDialog.Accepted:
-            self.load_suppliers()
+            self.refresh_after_server_write()
     
     def toggle_supplier_status(self):
         if not self.is_admin:
@@ -463,7 +613,13 @@ class SupplierManagementTab(QWidget):
             QMessageBox.No
         )
         
-        if reply == QMessageBox.Yes:
+        if reply == QMessageBox.Yes and self.replica and not self.replica.is_empty():
+            # Apply locally and let the sync push it (works offline)
+            self.replica.queue_update("Suppliers", supplier_id, {"Status": new_status})
+            self.replica_sync.request_sync()
+            self.load_suppliers()
+            QMessageBox.information(self, "Status Updated", f"Supplier status changed to {new_status}.")
+        elif reply == QMessageBox.Yes:
             try:
                 # Update status
                 cursor = self.db_connection.cursor()
@@ -0,0 +1,481 @@
+"""
+Local SQLite replica of Suppliers, Products and supplier prices for the
+desktop client.
+
+The client reads lists from the replica, which answers instantly and works
+offline, while ReplicaSync keeps it up to date in a background thread:
+
+  - Pull: only rows whose RowVer (a SQL Server rowversion, see
+    mssql_schema.sql) is above the table's last sync watermark are fetched.
+    Reads stop at MIN_ACTIVE_ROWVERSION() so rows of transactions still in
+    flight are not skipped. Deleted rows are found by comparing key lists
+    every RECONCILE_EVERY syncs.
+  - Push: local edits are applied to the replica at once and queued in
+    PendingChanges with the RowVer they were based on; further edits of a
+    row that is still queued are merged into its entry. They are sent as
+    UPDATE ... WHERE RowVer = base, and the RowVer the server assigns
+    becomes the base of the next edit. When the server row changed in the
+    meantime, the server version is kept and the local values are saved in
+    SyncConflicts for the user to re-apply or discard.
+
+    replica = ReplicaCache()  # default_path(), or pass a path
+    sync = ReplicaSync(replica, connect=lambda: pyodbc.connect(conn_str))
+    sync.start(interval=30)
+    rows = replica.suppliers()
+"""
+import datetime
+import decimal
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Replicated tables: key column and columns, in the order the client shows them.
+TABLES = {
+    "Suppliers": (
+        "SupplierID",
+        ["SupplierID", "TIN", "CompanyName", "DateCreated", "DateUpdated", "Status"],
+    ),
+    "Products": (
+        "ProductID",
+        ["ProductID", "ProductName", "ProductDescription", "Category", "UnitOfMeasure",
+         "DataEntryDate", "Status"],
+    ),
+    "SupplierProductCatalog": (
+        "SupplierProductCatalogID",
+        ["SupplierProductCatalogID", "SupplierID", "ProductID", "DealersPrice", "PriceEntryDate",
+         "SupplierProductCode", "Notes"],
+    ),
+}
+
+APP_DIR_NAME = "Epicerie"
+REPLICA_FILE_NAME = "replica_cache.sqlite3"
+
+FETCH_SIZE = 5000
+RECONCILE_EVERY = 20
+
+LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Suppliers (
+    SupplierID INTEGER PRIMARY KEY, TIN TEXT, CompanyName TEXT, DateCreated TEXT,
+    DateUpdated TEXT, Status TEXT, RowVer INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS IX_Suppliers_CompanyName ON Suppliers(CompanyName);
+
+CREATE TABLE IF NOT EXISTS Products (
+    ProductID INTEGER PRIMARY KEY, ProductName TEXT, ProductDescription TEXT, Category TEXT,
+    UnitOfMeasure TEXT, DataEntryDate TEXT, Status TEXT, RowVer INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS IX_Products_ProductName ON Products(ProductName);
+
+CREATE TABLE IF NOT EXISTS SupplierProductCatalog (
+    SupplierProductCatalogID INTEGER PRIMARY KEY, SupplierID INTEGER, ProductID INTEGER,
+    DealersPrice TEXT, PriceEntryDate TEXT, SupplierProductCode TEXT, Notes TEXT,
+    RowVer INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS IX_SPC_SupplierProduct
+    ON SupplierProductCatalog(SupplierID, ProductID, PriceEntryDate);
+
+-- Latest price of each product from each supplier.
+CREATE VIEW IF NOT EXISTS CurrentPrices AS
+SELECT spc.SupplierID, s.CompanyName, spc.ProductID, p.ProductName,
+       spc.DealersPrice, spc.PriceEntryDate, spc.SupplierProductCode
+FROM SupplierProductCatalog spc
+JOIN Suppliers s ON s.SupplierID = spc.SupplierID
+JOIN Products p ON p.ProductID = spc.ProductID
+WHERE spc.PriceEntryDate = (
+    SELECT MAX(latest.PriceEntryDate) FROM SupplierProductCatalog latest
+    WHERE latest.SupplierID = spc.SupplierID AND latest.ProductID = spc.ProductID
+);
+
+CREATE TABLE IF NOT EXISTS SyncState (
+    TableName TEXT PRIMARY KEY,
+    Watermark INTEGER NOT NULL DEFAULT 0,
+    LastSync TEXT,
+    Syncs INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS PendingChanges (
+    ChangeID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TableName TEXT NOT NULL,
+    RowKey INTEGER NOT NULL,
+    Changes TEXT NOT NULL,
+    BaseRowVer INTEGER NOT NULL,
+    CreatedAt TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS SyncConflicts (
+    ConflictID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TableName TEXT NOT NULL,
+    RowKey INTEGER NOT NULL,
+    LocalChanges TEXT NOT NULL,
+    ServerValues TEXT,
+    DetectedAt TEXT NOT NULL
+);
+"""
+
+
+def _local_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def _rowver_int(value):
+    return int.from_bytes(value, "big") if isinstance(value, (bytes, bytearray)) else int(value or 0)
+
+
+def _rowver_bytes(value):
+    return int(value).to_bytes(8, "big")
+
+
+def _now():
+    return datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def default_path():
+    """
+    The replica file in the user's application data directory (%LOCALAPPDATA%
+    on Windows, $XDG_DATA_HOME or ~/.local/share elsewhere), so it does not
+    depend on the directory the client was started from.
+    """
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or os.getenv("APPDATA") or Path.home() / "AppData" / "Local"
+    else:
+        base = os.getenv("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / APP_DIR_NAME / REPLICA_FILE_NAME
+
+
+class ReplicaCache:
+    """
+    The SQLite replica. Each thread gets its own connection; WAL mode lets the
+    UI read while the sync thread writes.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else default_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(LOCAL_SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def is_empty(self):
+        return self.connection().execute("SELECT COUNT(*) FROM SyncState").fetchone()[0] == 0
+
+    # Reads
+
+    def suppliers(self, search=None):
+        columns = ", ".join(TABLES["Suppliers"][1])
+        if search:
+            pattern = f"%{search}%"
+            return self.connection().execute(
+                f"SELECT {columns} FROM Suppliers WHERE CompanyName LIKE ? OR TIN LIKE ? "
+                "ORDER BY CompanyName",
+                (pattern, pattern),
+            ).fetchall()
+        return self.connection().execute(f"SELECT {columns} FROM Suppliers ORDER BY CompanyName").fetchall()
+
+    def products(self, search=None):
+        columns = ", ".join(TABLES["Products"][1])
+        if search:
+            return self.connection().execute(
+                f"SELECT {columns} FROM Products WHERE ProductName LIKE ? ORDER BY ProductName",
+                (f"%{search}%",),
+            ).fetchall()
+        return self.connection().execute(f"SELECT {columns} FROM Products ORDER BY ProductName").fetchall()
+
+    def current_prices(self, product_id=None, supplier_id=None):
+        query = "SELECT * FROM CurrentPrices WHERE 1 = 1"
+        params = []
+        if product_id is not None:
+            query += " AND ProductID = ?"
+            params.append(product_id)
+        if supplier_id is not None:
+            query += " AND SupplierID = ?"
+            params.append(supplier_id)
+        return self.connection().execute(query + " ORDER BY ProductName, CompanyName", params).fetchall()
+
+    # Local edits
+
+    def queue_update(self, table, key, changes):
+        """
+        Apply ``changes`` (column -> value) to a replicated row now and queue
+        them for the server. A row with unsent edits keeps one queued entry
+        and its base RowVer: a second entry based on the same version would
+        conflict with the first once that was pushed.
+        """
+        key_column, columns = TABLES[table]
+        unknown = set(changes) - set(columns) - {key_column}
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {', '.join(sorted(unknown))}")
+        conn = self.connection()
+        with conn:
+            row = conn.execute(f"SELECT RowVer FROM {table} WHERE {key_column} = ?", (key,)).fetchone()
+            if row is None:
+                raise KeyError(f"{table} {key} is not in the replica")
+            assignments = ", ".join(f"{column} = ?" for column in changes)
+            conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE {key_column} = ?",
+                [_local_value(value) for value in changes.values()] + [key],
+            )
+            queued = conn.execute(
+                "SELECT ChangeID, Changes FROM PendingChanges WHERE TableName = ? AND RowKey = ?", (table, key)
+            ).fetchone()
+            if queued is not None:
+                merged = {**json.loads(queued[1]), **changes}
+                conn.execute(
+                    "UPDATE PendingChanges SET Changes = ? WHERE ChangeID = ?",
+                    (json.dumps(merged, default=str), queued[0]),
+                )
+                return
+            conn.execute(
+                "INSERT INTO PendingChanges (TableName, RowKey, Changes, BaseRowVer, CreatedAt) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (table, key, json.dumps(changes, default=str), row[0], _now()),
+            )
+
+    def pending_changes(self):
+        return self.connection().execute(
+            "SELECT ChangeID, TableName, RowKey, Changes, BaseRowVer FROM PendingChanges ORDER BY ChangeID"
+        ).fetchall()
+
+    def conflicts(self):
+        return self.connection().execute(
+            "SELECT ConflictID, TableName, RowKey, LocalChanges, ServerValues, DetectedAt "
+            "FROM SyncConflicts ORDER BY ConflictID"
+        ).fetchall()
+
+    def resolve_conflict(self, conflict_id, keep):
+        """
+        keep="server" discards the local values; keep="local" queues them
+        again on top of the current server version.
+        """
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT TableName, RowKey, LocalChanges FROM SyncConflicts WHERE ConflictID = ?", (conflict_id,)
+        ).fetchone()
+        if row is None:
+            return
+        with conn:
+            conn.execute("DELETE FROM SyncConflicts WHERE ConflictID = ?", (conflict_id,))
+        if keep == "local":
+            self.queue_update(row[0], row[1], json.loads(row[2]))
+
+    # Sync bookkeeping
+
+    def watermark(self, table):
+        row = self.connection().execute(
+            "SELECT Watermark, Syncs FROM SyncState WHERE TableName = ?", (table,)
+        ).fetchone()
+        return row if row else (0, 0)
+
+
+class ReplicaSync:
+    """
+    Pushes queued edits and pulls changed rows. ``connect`` returns a new
+    pyodbc connection; the sync thread uses its own.
+    """
+
+    def __init__(self, replica, connect, on_synced=None):
+        self.replica = replica
+        self.connect = connect
+        self.on_synced = on_synced
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # Background thread
+
+    def start(self, interval=30):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="replica-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def request_sync(self):
+        """
+        Sync now instead of waiting for the next interval (e.g. after an edit).
+        """
+        self._wake.set()
+
+    def _run(self, interval):
+        server = None
+        while not self._stop.is_set():
+            try:
+                if server is None:
+                    server = self.connect()
+                result = self.sync(server)
+            except Exception as exc:  # offline or server error: keep serving the replica
+                result = {"ok": False, "error": str(exc)}
+                if server is not None:
+                    try:
+                        server.close()
+                    except Exception:
+                        pass
+                server = None
+            if self.on_synced:
+                self.on_synced(result)
+            self._wake.wait(interval)
+            self._wake.clear()
+        if server is not None:
+            server.close()
+
+    # One sync round
+
+    def sync(self, server):
+        with self._lock:
+            started = time.perf_counter()
+            result = {"ok": True, "pushed": 0, "conflicts": 0, "pulled": {}, "deleted": {}}
+            pushed, conflicts = self.push(server)
+            result["pushed"], result["conflicts"] = pushed, conflicts
+            for table in TABLES:
+                pulled, deleted = self.pull(server, table)
+                result["pulled"][table] = pulled
+                result["deleted"][table] = deleted
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            return result
+
+    def push(self, server):
+        pushed = conflicts = 0
+        local = self.replica.connection()
+        for change_id, table, key, changes_json, base_rowver in self.replica.pending_changes():
+            key_column, columns = TABLES[table]
+            changes = json.loads(changes_json)
+            assignments = ", ".join(f"{column} = ?" for column in changes)
+            cursor = server.cursor()
+            cursor.execute(
+                f"UPDATE {table} SET {assignments} WHERE {key_column} = ? AND RowVer = ?",
+                list(changes.values()) + [key, _rowver_bytes(base_rowver)],
+            )
+            if cursor.rowcount == 1:
+                cursor.execute(f"SELECT RowVer FROM {table} WHERE {key_column} = ?", (key,))
+                new_rowver = _rowver_int(cursor.fetchone()[0])
+                server.commit()
+                pushed += 1
+                with local:
+                    # Edits merged into the entry while it was being sent stay
+                    # queued, now based on the version just written
+                    merged = local.execute(
+                        "UPDATE PendingChanges SET BaseRowVer = ? WHERE ChangeID = ? AND Changes <> ?",
+                        (new_rowver, change_id, changes_json),
+                    ).rowcount
+                    if not merged:
+                        local.execute("DELETE FROM PendingChanges WHERE ChangeID = ?", (change_id,))
+                    local.execute(f"UPDATE {table} SET RowVer = ? WHERE {key_column} = ?", (new_rowver, key))
+                continue
+
+            # The row changed (or was deleted) on the server since the edit.
+            server.rollback()
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE {key_column} = ?", (key,))
+            server_row = cursor.fetchone()
+            server_values = (
+                json.dumps(dict(zip(columns, map(_local_value, server_row))), default=str)
+                if server_row else None
+            )
+            with local:
+                # Including any edits merged into the entry meanwhile
+                changes_json = local.execute(
+                    "SELECT Changes FROM PendingChanges WHERE ChangeID = ?", (change_id,)
+                ).fetchone()[0]
+                local.execute("DELETE FROM PendingChanges WHERE ChangeID = ?", (change_id,))
+                local.execute(
+                    "INSERT INTO SyncConflicts (TableName, RowKey, LocalChanges, ServerValues, DetectedAt) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (table, key, changes_json, server_values, _now()),
+                )
+                # The pull skipped this row while the edit was pending; move the
+                # watermark back so the server version is fetched again.
+                local.execute(
+                    "UPDATE SyncState SET Watermark = MIN(Watermark, ?) WHERE TableName = ?",
+                    (max(base_rowver - 1, 0), table),
+                )
+            conflicts += 1
+        return pushed, conflicts
+
+    def pull(self, server, table):
+        key_column, columns = TABLES[table]
+        watermark, syncs = self.replica.watermark(table)
+        cursor = server.cursor()
+        cursor.execute("SELECT MIN_ACTIVE_ROWVERSION()")
+        bound = _rowver_int(cursor.fetchone()[0])
+
+        cursor.execute(
+            f"SELECT {', '.join(columns)}, RowVer FROM {table} "
+            f"WHERE RowVer > ? AND RowVer < ? ORDER BY RowVer",
+            (_rowver_bytes(watermark), _rowver_bytes(bound)),
+        )
+        pending = {
+            row[0] for row in self.replica.connection().execute(
+                "SELECT RowKey FROM PendingChanges WHERE TableName = ?", (table,)
+            )
+        }
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        local = self.replica.connection()
+        pulled = 0
+        with local:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                # Rows with unsent local edits keep the local values until the
+                # push decides between them.
+                values = [
+                    [_local_value(value) for value in row[:-1]] + [_rowver_int(row[-1])]
+                    for row in rows
+                    if row[0] not in pending
+                ]
+                local.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}, RowVer) VALUES ({placeholders})",
+                    values,
+                )
+                pulled += len(values)
+
+        deleted = 0
+        if syncs % RECONCILE_EVERY == 0:
+            deleted = self.reconcile_deletes(server, table)
+
+        with local:
+            local.execute(
+                "INSERT INTO SyncState (TableName, Watermark, LastSync, Syncs) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(TableName) DO UPDATE SET Watermark = excluded.Watermark, "
+                "LastSync = excluded.LastSync, Syncs = Syncs + 1",
+                (table, max(bound - 1, watermark), _now()),
+            )
+        return pulled, deleted
+
+    def reconcile_deletes(self, server, table):
+        """
+        Remove rows deleted on the server; a watermark only sees live rows.
+        """
+        key_column, _ = TABLES[table]
+        cursor = server.cursor()
+        cursor.execute(f"SELECT {key_column} FROM {table}")
+        server_keys = {row[0] for row in cursor.fetchall()}
+        local = self.replica.connection()
+        stale = [
+            (key,) for (key,) in local.execute(f"SELECT {key_column} FROM {table}") if key not in server_keys
+        ]
+        if stale:
+            with local:
+                local.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", stale)
+        return len(stale)
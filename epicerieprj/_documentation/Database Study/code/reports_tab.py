@@ -0,0 +1,135 @@
+"""
+Reports tab of the desktop client: price trends for the "View Price History"
+use case.
+
+The whole price history is loaded once into a PriceHistory (the columnar
+NumPy copy shared with the web reports, library/price_history.py) when the
+tab is first opened; "Refresh" fetches only prices entered since the last
+load, and "Reload All" starts over, which is needed after back-dated prices
+were entered. Statistics for every product come from a few vectorized calls
+instead of one query per product.
+"""
+import sys
+from pathlib import Path
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QComboBox, QHBoxLayout, QHeaderView, QLabel, QMessageBox, QPushButton,
+    QSpinBox, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+)
+
+# library/ lives in the Django project folder, three levels up
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from library.price_history import MAX_PERIODS, PriceHistory  # noqa: E402
+
+PERIODS = [("Month", "M"), ("Week", "W"), ("Day", "D"), ("Year", "Y")]
+
+COLUMNS = [
+    "Product ID", "Product Name", "Prices", "Min Price", "Max Price", "Avg Price",
+    "Suppliers", "Current Spread", "Change %", "Moving Avg"
+]
+
+
+def _amount(value):
+    return "" if value != value else f"{value:,.2f}"  # NaN -> blank
+
+
+class ReportsTab(QWidget):
+    def __init__(self, db_connection):
+        super().__init__()
+        self.db_connection = db_connection
+        # pyodbc uses "?" placeholders
+        self.history = PriceHistory(db_connection)
+        self.product_names = {}
+        self.setup_ui()
+        self.load(reload=True)
+
+    def setup_ui(self):
+        main_layout = QVBoxLayout()
+
+        # Control panel
+        control_panel = QHBoxLayout()
+        self.period_combo = QComboBox()
+        for label, code in PERIODS:
+            self.period_combo.addItem(label, code)
+        self.period_combo.currentIndexChanged.connect(self.show_trends)
+
+        self.window_spin = QSpinBox()
+        self.window_spin.setRange(1, MAX_PERIODS)
+        self.window_spin.setValue(3)
+        self.window_spin.valueChanged.connect(self.show_trends)
+
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(lambda: self.load(reload=False))
+        reload_button = QPushButton("Reload All")
+        reload_button.clicked.connect(lambda: self.load(reload=True))
+        self.status_label = QLabel("")
+
+        control_panel.addWidget(QLabel("Period:"))
+        control_panel.addWidget(self.period_combo)
+        control_panel.addWidget(QLabel("Moving average over:"))
+        control_panel.addWidget(self.window_spin)
+        control_panel.addWidget(self.status_label)
+        control_panel.addStretch()
+        control_panel.addWidget(refresh_button)
+        control_panel.addWidget(reload_button)
+
+        # Trends table
+        self.trends_table = QTableWidget()
+        self.trends_table.setColumnCount(len(COLUMNS))
+        self.trends_table.setHorizontalHeaderLabels(COLUMNS)
+        self.trends_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        main_layout.addLayout(control_panel)
+        main_layout.addWidget(self.trends_table)
+        self.setLayout(main_layout)
+
+    def load(self, reload):
+        try:
+            if reload:
+                self.history.reload()
+            else:
+                self.history.refresh()
+            cursor = self.db_connection.cursor()
+            cursor.execute("SELECT ProductID, ProductName FROM Products")
+            self.product_names = dict(cursor.fetchall())
+        except Exception as e:
+            QMessageBox.critical(self, "Database Error", f"Error loading price history: {e}")
+            return
+        self.show_trends()
+
+    def show_trends(self):
+        period = self.period_combo.currentData()
+        window = self.window_spin.value()
+
+        # Every result has one row per product, in product id order; only the
+        # periods the latest change and moving average need are computed
+        stats = self.history.product_stats()
+        spreads = self.history.supplier_spreads()
+        changes = self.history.period_over_period(period, periods=2)
+        moving = self.history.moving_average(window, period, periods=window)
+
+        latest = changes["period"]
+        self.status_label.setText(
+            f"{len(self.history)} prices, latest period {latest[-1]}" if len(latest) else "No prices"
+        )
+
+        self.trends_table.setRowCount(0)
+        for row, product_id in enumerate(stats["product_id"]):
+            values = [
+                str(product_id),
+                self.product_names.get(int(product_id), ""),
+                str(stats["count"][row]),
+                _amount(stats["min"][row]),
+                _amount(stats["max"][row]),
+                _amount(stats["avg"][row]),
+                str(spreads["suppliers"][row]),
+                _amount(spreads["spread"][row]),
+                _amount(changes["change_pct"][row, -1]),
+                _amount(moving["moving_avg"][row, -1]),
+            ]
+            self.trends_table.insertRow(row)
+            for col_num, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)  # Make read-only
+                self.trends_table.setItem(row, col_num, item)
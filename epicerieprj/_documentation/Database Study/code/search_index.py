@@ -0,0 +1,154 @@
+"""
+In-memory search index for filter-as-you-type over the rows a list has loaded.
+
+Text is normalized (accents removed, case folded) and split into word tokens.
+A row matches a query when every query token is a prefix of one of the row's
+tokens, so "san ana" finds "Santa Ana Trading" and "jose" finds "José".
+
+Two structures answer a prefix:
+
+- short prefixes (up to SHORT_PREFIX characters, the first keystrokes, which
+  match the most rows) have precomputed postings, so they cost one dict lookup;
+- longer prefixes are looked up in the sorted vocabulary with bisect, which
+  only unions the postings of the few tokens that start with them.
+
+Rows are added, changed and removed one at a time (``set_row`` and
+``remove_row``), or reconciled with a fresh list by ``sync``, which only
+re-indexes the rows whose text changed.
+"""
+import bisect
+import re
+import unicodedata
+
+SHORT_PREFIX = 3
+
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(char for char in text if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text):
+    return _TOKEN.findall(normalize(text))
+
+
+class SearchIndex:
+    def __init__(self):
+        self.row_text = {}      # key -> indexed text
+        self.row_tokens = {}    # key -> set of tokens
+        self.postings = {}      # token -> set of keys
+        self.short = {}         # prefix of up to SHORT_PREFIX chars -> set of keys
+        self.vocabulary = []    # sorted tokens
+        self.dirty = False      # vocabulary needs re-sorting
+
+    def __len__(self):
+        return len(self.row_tokens)
+
+    def keys(self):
+        return self.row_tokens.keys()
+
+    # Updates
+
+    def set_row(self, key, *values):
+        text = " ".join("" if value is None else str(value) for value in values)
+        if self.row_text.get(key) == text:
+            return
+        tokens = set(tokenize(text))
+        old_tokens = self.row_tokens.get(key, set())
+        for token in old_tokens - tokens:
+            self._unpost(key, token, tokens)
+        for token in tokens - old_tokens:
+            self._post(key, token)
+        self.row_text[key] = text
+        self.row_tokens[key] = tokens
+
+    def remove_row(self, key):
+        for token in self.row_tokens.pop(key, ()):
+            self._unpost(key, token, ())
+        self.row_text.pop(key, None)
+
+    def sync(self, rows):
+        """
+        Make the index hold exactly ``rows``, given as (key, value, ...)
+        tuples. Returns the number of rows added, changed or removed.
+        """
+        changed = 0
+        seen = set()
+        for key, *values in rows:
+            seen.add(key)
+            before = self.row_text.get(key)
+            self.set_row(key, *values)
+            changed += self.row_text[key] != before
+        for key in set(self.row_tokens) - seen:
+            self.remove_row(key)
+            changed += 1
+        # Sort now rather than on the first keystroke
+        self.sorted_vocabulary()
+        return changed
+
+    def _post(self, key, token):
+        keys = self.postings.get(token)
+        if keys is None:
+            keys = self.postings[token] = set()
+            self.dirty = True
+        keys.add(key)
+        for length in range(1, min(len(token), SHORT_PREFIX) + 1):
+            self.short.setdefault(token[:length], set()).add(key)
+
+    def _unpost(self, key, token, remaining):
+        keys = self.postings[token]
+        keys.discard(key)
+        if not keys:
+            del self.postings[token]
+            self.dirty = True
+        # A prefix stays posted while a token the row keeps shares it
+        for length in range(1, min(len(token), SHORT_PREFIX) + 1):
+            prefix = token[:length]
+            if any(other.startswith(prefix) for other in remaining):
+                continue
+            keys = self.short.get(prefix)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.short[prefix]
+
+    # Queries
+
+    def sorted_vocabulary(self):
+        if self.dirty:
+            self.vocabulary = sorted(self.postings)
+            self.dirty = False
+        return self.vocabulary
+
+    def prefix_keys(self, prefix):
+        if len(prefix) <= SHORT_PREFIX:
+            return self.short.get(prefix, set())
+        vocabulary = self.sorted_vocabulary()
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + "\U0010ffff", start)
+        if end - start == 1:
+            return self.postings[vocabulary[start]]
+        keys = set()
+        for token in vocabulary[start:end]:
+            keys |= self.postings[token]
+        return keys
+
+    def search(self, query):
+        """
+        Keys of the rows matching every token of ``query``, or None for an
+        empty query (no filter). The returned set may be the index's own
+        and must not be modified.
+        """
+        tokens = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not tokens:
+            return None
+        # Longest token first: it usually has the fewest matches
+        result = None
+        for token in tokens:
+            keys = self.prefix_keys(token)
+            result = keys if result is None else result & keys
+            if not result:
+                break
+        return result
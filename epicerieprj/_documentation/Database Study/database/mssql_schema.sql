@@ -5,6 +5,9 @@
 EXEC sp_msforeachtable 'ALTER TABLE ? CHECK CONSTRAINT ALL'
 
 -- Drop tables if they exist (in reverse order of creation to avoid FK constraint issues)
+IF OBJECT_ID('dbo.ConsumerOffsets', 'U') IS NOT NULL DROP TABLE dbo.ConsumerOffsets;
+IF OBJECT_ID('dbo.ChangeLog', 'U') IS NOT NULL DROP TABLE dbo.ChangeLog;
+IF OBJECT_ID('dbo.TableVersions', 'U') IS NOT NULL DROP TABLE dbo.TableVersions;
 IF OBJECT_ID('dbo.SupplierProductCatalog', 'U') IS NOT NULL DROP TABLE dbo.SupplierProductCatalog;
 IF OBJECT_ID('dbo.Products', 'U') IS NOT NULL DROP TABLE dbo.Products;
 IF OBJECT_ID('dbo.ContactPersons', 'U') IS NOT NULL DROP TABLE dbo.ContactPersons;
@@ -20,7 +23,8 @@ CREATE TABLE dbo.Suppliers (
     CompanyName VARCHAR(255) NOT NULL,
     DateCreated DATETIME2 NOT NULL DEFAULT GETDATE(),
     DateUpdated DATETIME2 NOT NULL DEFAULT GETDATE(),
-    Status VARCHAR(10) NOT NULL DEFAULT 'Active' CHECK (Status IN ('Active', 'Inactive'))
+    Status VARCHAR(10) NOT NULL DEFAULT 'Active' CHECK (Status IN ('Active', 'Inactive')),
+    MinimumOrderValue DECIMAL(12, 2) NOT NULL DEFAULT 0
 );
 
 -- Create index on CompanyName
@@ -96,6 +100,7 @@ CREATE INDEX IX_ContactPersons_SupplierID ON dbo.ContactPersons(SupplierID);
 CREATE TABLE dbo.Products (
     ProductID INT IDENTITY(1,1) PRIMARY KEY,
     ProductName VARCHAR(255) NOT NULL UNIQUE,
+    SKU VARCHAR(64) NULL,
     ProductDescription TEXT NULL,
     Category VARCHAR(100) NULL,
     UnitOfMeasure VARCHAR(50) NULL,
@@ -106,6 +111,8 @@ CREATE TABLE dbo.Products (
 -- Create index on ProductName
 CREATE INDEX IX_Products_ProductName ON dbo.Products(ProductName);
 CREATE INDEX IX_Products_Category ON dbo.Products(Category);
+-- Barcode/SKU scanned at the POS; unique when present
+CREATE UNIQUE INDEX UX_Products_SKU ON dbo.Products(SKU) WHERE SKU IS NOT NULL;
 
 -- Create SupplierProductCatalog table (junction table)
 CREATE TABLE dbo.SupplierProductCatalog (
@@ -152,6 +159,155 @@ BEGIN
     INNER JOIN inserted i ON cp.ContactPersonID = i.ContactPersonID;
 END;
 
+-- Change versions per table, used to invalidate cached reports
+CREATE TABLE dbo.TableVersions (
+    TableName VARCHAR(128) NOT NULL PRIMARY KEY,
+    Version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO dbo.TableVersions (TableName, Version)
+VALUES ('Suppliers', 0), ('SupplierAddresses', 0), ('SupplierContactNumbers', 0),
+       ('SupplierEmailAddresses', 0), ('ContactPersons', 0), ('Products', 0),
+       ('SupplierProductCatalog', 0);
+
+CREATE TRIGGER trg_Suppliers_Version
+ON dbo.Suppliers
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE dbo.TableVersions SET Version = Version + 1 WHERE TableName = 'Suppliers';
+END;
+
+CREATE TRIGGER trg_SupplierAddresses_Version
+ON dbo.SupplierAddresses
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE dbo.TableVersions SET Version = Version + 1 WHERE TableName = 'SupplierAddresses';
+END;
+
+CREATE TRIGGER trg_SupplierContactNumbers_Version
+ON dbo.SupplierContactNumbers
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE dbo.TableVersions SET Version = Version + 1 WHERE TableName = 'SupplierContactNumbers';
+END;
+
+CREATE TRIGGER trg_SupplierEmailAddresses_Version
+ON dbo.SupplierEmailAddresses
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE dbo.TableVersions SET Version = Version + 1 WHERE TableName = 'SupplierEmailAddresses';
+END;
+
+CREATE TRIGGER trg_ContactPersons_Version
+ON dbo.ContactPersons
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE dbo.TableVersions SET Version = Version + 1 WHERE TableName = 'ContactPersons';
+END;
+
+CREATE TRIGGER trg_Products_Version
+ON dbo.Products
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE dbo.TableVersions SET Version = Version + 1 WHERE TableName = 'Products';
+END;
+
+CREATE TRIGGER trg_SupplierProductCatalog_Version
+ON dbo.SupplierProductCatalog
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE dbo.TableVersions SET Version = Version + 1 WHERE TableName = 'SupplierProductCatalog';
+END;
+
+-- Row versions for the desktop client's replica cache (code/replica_cache.py):
+-- changed rows are fetched with RowVer greater than the last sync watermark.
+-- Products and SupplierProductCatalog have no DateUpdated column, and a
+-- rowversion also catches updates that do not touch DateUpdated.
+ALTER TABLE dbo.Suppliers ADD RowVer ROWVERSION;
+ALTER TABLE dbo.Products ADD RowVer ROWVERSION;
+ALTER TABLE dbo.SupplierProductCatalog ADD RowVer ROWVERSION;
+
+CREATE INDEX IX_Suppliers_RowVer ON dbo.Suppliers(RowVer);
+CREATE INDEX IX_Products_RowVer ON dbo.Products(RowVer);
+CREATE INDEX IX_SupplierProductCatalog_RowVer ON dbo.SupplierProductCatalog(RowVer);
+
+-- Change log of the catalog tables, read by the web application's change
+-- consumers (epicerieapp/cdc.py) to update caches and indexes incrementally.
+-- One row per inserted, updated or deleted row; consumers re-read current
+-- data by RowID, so the extra entry written when trg_Suppliers_Update touches
+-- DateUpdated is harmless.
+CREATE TABLE dbo.ChangeLog (
+    ChangeID BIGINT IDENTITY(1,1) PRIMARY KEY,
+    TableName VARCHAR(128) NOT NULL,
+    RowID INT NOT NULL,
+    Operation CHAR(1) NOT NULL CHECK (Operation IN ('I', 'U', 'D')),
+    ChangedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+);
+
+CREATE INDEX IX_ChangeLog_TableName ON dbo.ChangeLog(TableName, ChangeID);
+
+CREATE TABLE dbo.ConsumerOffsets (
+    Consumer VARCHAR(100) NOT NULL PRIMARY KEY,
+    LastChangeID BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+);
+
+CREATE TRIGGER trg_Suppliers_ChangeLog
+ON dbo.Suppliers
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    INSERT INTO dbo.ChangeLog (TableName, RowID, Operation)
+    SELECT 'Suppliers',
+           COALESCE(i.SupplierID, d.SupplierID),
+           CASE WHEN d.SupplierID IS NULL THEN 'I' WHEN i.SupplierID IS NULL THEN 'D' ELSE 'U' END
+    FROM inserted i
+    FULL OUTER JOIN deleted d ON i.SupplierID = d.SupplierID;
+END;
+
+CREATE TRIGGER trg_Products_ChangeLog
+ON dbo.Products
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    INSERT INTO dbo.ChangeLog (TableName, RowID, Operation)
+    SELECT 'Products',
+           COALESCE(i.ProductID, d.ProductID),
+           CASE WHEN d.ProductID IS NULL THEN 'I' WHEN i.ProductID IS NULL THEN 'D' ELSE 'U' END
+    FROM inserted i
+    FULL OUTER JOIN deleted d ON i.ProductID = d.ProductID;
+END;
+
+CREATE TRIGGER trg_SupplierProductCatalog_ChangeLog
+ON dbo.SupplierProductCatalog
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    INSERT INTO dbo.ChangeLog (TableName, RowID, Operation)
+    SELECT 'SupplierProductCatalog',
+           COALESCE(i.SupplierProductCatalogID, d.SupplierProductCatalogID),
+           CASE WHEN d.SupplierProductCatalogID IS NULL THEN 'I' WHEN i.SupplierProductCatalogID IS NULL THEN 'D' ELSE 'U' END
+    FROM inserted i
+    FULL OUTER JOIN deleted d ON i.SupplierProductCatalogID = d.SupplierProductCatalogID;
+END;
+
 -- Stored Procedure to ensure only one primary address/contact/email per supplier
 CREATE PROCEDURE dbo.SetPrimaryAddress
     @AddressID INT,
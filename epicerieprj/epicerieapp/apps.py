@@ -3,4 +3,9 @@ from django.apps import AppConfig
 
 class HomeappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'homeapp'
+    name = 'epicerieapp'
+
+    def ready(self):
+        from .signals import connect_signals
+
+        connect_signals()
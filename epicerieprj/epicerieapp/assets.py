@@ -0,0 +1,70 @@
+"""
+Build output of the asset commands (build_css, ...) and the manifests that
+templates read to find it.
+
+Built files live under static/dist/<kind>/ next to a manifest.json, and are
+referenced by their static path (dist/css/site.<hash>.css) so they are served
+and collected like any other static file.
+"""
+import json
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+DIST_PREFIX = "dist"
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def static_dir():
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+def dist_dir(kind):
+    return static_dir() / DIST_PREFIX / kind
+
+
+def static_path(path):
+    """
+    Static path (as passed to {% static %}) of a file under static/.
+    """
+    return Path(path).relative_to(static_dir()).as_posix()
+
+
+def write_manifest(kind, manifest):
+    path = dist_dir(kind) / "manifest.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return path
+
+
+def read_manifest(kind):
+    """
+    The manifest of one asset kind, or None when it has not been built.
+    Re-read whenever the file changes, so a rebuild needs no restart.
+    """
+    path = dist_dir(kind) / "manifest.json"
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _manifests_lock:
+        cached = _manifests.get(kind)
+        if cached is None or cached[0] != mtime:
+            cached = _manifests[kind] = (mtime, json.loads(path.read_text(encoding="utf-8")))
+    return cached[1]
+
+
+def read_built_file(path):
+    """
+    Contents of a built file by static path, cached with the manifest.
+    """
+    with _manifests_lock:
+        cached = _manifests.get(("file", path))
+    if cached is None:
+        cached = (static_dir() / path).read_text(encoding="utf-8")
+        with _manifests_lock:
+            _manifests[("file", path)] = cached
+    return cached
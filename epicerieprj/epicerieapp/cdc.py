@@ -0,0 +1,218 @@
+"""
+Change data capture for the catalog tables.
+
+Every insert, update and delete of a Suppliers, Products or
+SupplierProductCatalog row appends an entry (table, primary key, I/U/D) to
+the ChangeLog table: from model signals for ORM writes, from
+record_changes_from_query() for the price-list importer's set-based SQL,
+and from triggers in mssql_schema.sql for the desktop client. Entries carry
+no row data; consumers re-read the rows they need, so processing an entry
+twice (signals and triggers can both fire) is harmless.
+
+A consumer keeps a durable offset in ConsumerOffsets and reads changes after
+it in batches, committing once a batch has been applied:
+
+    consumer = Consumer("sku-index", tables=["Products"])
+    for batch in consumer.batches():
+        for table, rows in collapse(batch).items():
+            ...   # rows: {row_id: last operation}
+        consumer.commit()
+
+Settings (CHANGE_LOG):
+
+    CHANGE_LOG = {
+        "BATCH_SIZE": 500,
+        "GAP_GRACE_SECONDS": 30,   # see Consumer.poll
+        "RETENTION_DAYS": 7,       # prune() keeps at least this much history
+    }
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import ChangeLog, ConsumerOffset, Product, Supplier, SupplierProductCatalog
+
+INSERT = "I"
+UPDATE = "U"
+DELETE = "D"
+
+CAPTURED_MODELS = [Supplier, Product, SupplierProductCatalog]
+
+DEFAULTS = {
+    "BATCH_SIZE": 500,
+    "GAP_GRACE_SECONDS": 30,
+    "RETENTION_DAYS": 7,
+}
+
+
+def change_log_settings():
+    return {**DEFAULTS, **getattr(settings, "CHANGE_LOG", {})}
+
+
+# Producing
+
+def record_change(table_name, row_id, operation):
+    ChangeLog.objects.create(table_name=table_name, row_id=row_id, operation=operation)
+
+
+def record_changes_from_query(cursor, table_name, operation, query, params=()):
+    """
+    Log one change per row id returned by ``query`` (a SELECT of a single
+    column), in the same transaction. For raw SQL writes that bypass model
+    signals.
+    """
+    log = ChangeLog._meta.db_table
+    cursor.execute(
+        f"INSERT INTO {log} (TableName, RowID, Operation, ChangedAt) "
+        f"SELECT %s, ids.RowID, %s, %s FROM ({query}) ids",
+        [table_name, operation, timezone.now(), *params],
+    )
+    return max(cursor.rowcount, 0)
+
+
+def log_save(sender, instance, created, raw=False, **kwargs):
+    record_change(sender._meta.db_table, instance.pk, INSERT if created else UPDATE)
+
+
+def log_delete(sender, instance, **kwargs):
+    record_change(sender._meta.db_table, instance.pk, DELETE)
+
+
+# Consuming
+
+class Change:
+    __slots__ = ("change_id", "table_name", "row_id", "operation", "changed_at")
+
+    def __init__(self, change_id, table_name, row_id, operation, changed_at):
+        self.change_id = change_id
+        self.table_name = table_name
+        self.row_id = row_id
+        self.operation = operation
+        self.changed_at = changed_at
+
+    def __repr__(self):
+        return f"<Change {self.change_id} {self.operation} {self.table_name}#{self.row_id}>"
+
+
+def collapse(changes):
+    """
+    {table: {row_id: last operation}} for a batch of changes: a row changed
+    several times only needs its final state applied.
+    """
+    tables = {}
+    for change in changes:
+        tables.setdefault(change.table_name, {})[change.row_id] = change.operation
+    return tables
+
+
+class Consumer:
+    def __init__(self, name, tables=None, batch_size=None):
+        self.name = name
+        self.tables = list(tables) if tables else None
+        self.batch_size = batch_size or change_log_settings()["BATCH_SIZE"]
+        # Offset the last poll started from, and the last change id it covered
+        self.polled_from = None
+        self.position = None
+
+    def offset(self):
+        return (
+            ConsumerOffset.objects.filter(consumer=self.name).values_list("last_change_id", flat=True).first()
+            or 0
+        )
+
+    def poll(self, after=None, limit=None):
+        """
+        Changes after the committed offset (or ``after``), oldest first.
+
+        Change ids are allocated when a write happens but become visible
+        when it commits, so on SQL Server a lower id can appear after a
+        higher one was read. A batch therefore stops before a gap in the ids
+        until the change after the gap is GAP_GRACE_SECONDS old; after that
+        the gap is taken to be a rolled-back write.
+        """
+        after = self.offset() if after is None else after
+        changes = ChangeLog.objects.filter(change_id__gt=after).order_by("change_id")
+        rows = changes.values_list("change_id", "table_name", "row_id", "operation", "changed_at")
+        rows = list(rows[:limit or self.batch_size])
+
+        grace = timezone.now() - timedelta(seconds=change_log_settings()["GAP_GRACE_SECONDS"])
+        batch = []
+        self.polled_from = after
+        expected = after + 1
+        for row in rows:
+            if row[0] != expected and row[4] > grace:
+                break
+            expected = row[0] + 1
+            batch.append(Change(*row))
+        self.position = batch[-1].change_id if batch else after
+        if self.tables is not None:
+            batch = [change for change in batch if change.table_name in self.tables]
+        return batch
+
+    def commit(self, change_id=None):
+        """
+        Durably record that changes up to ``change_id`` (by default, the end
+        of the last polled batch, including changes to other tables) are done.
+        """
+        change_id = self.position if change_id is None else change_id
+        if change_id is None:
+            return
+        with transaction.atomic():
+            offset, _ = ConsumerOffset.objects.select_for_update().get_or_create(consumer=self.name)
+            if change_id > offset.last_change_id:
+                offset.last_change_id = change_id
+                offset.save(update_fields=["last_change_id", "updated_at"])
+
+    def batches(self):
+        """
+        Yield batches until caught up. Stops early if a yielded batch was
+        not committed, so the next call yields it again.
+        """
+        while True:
+            batch = self.poll()
+            if self.position == self.polled_from:
+                return
+            if not batch:
+                # Only other tables' changes: skip past them
+                self.commit()
+                continue
+            yield batch
+            if self.offset() < self.position:
+                return
+
+    def process(self, handler):
+        """
+        Apply ``handler(batch)`` to every pending batch, committing after
+        each. Returns the number of changes handled.
+        """
+        handled = 0
+        for batch in self.batches():
+            handler(batch)
+            self.commit()
+            handled += len(batch)
+        return handled
+
+    def lag(self):
+        """
+        (changes pending, age in seconds of the oldest pending change).
+        """
+        pending = ChangeLog.objects.filter(change_id__gt=self.offset())
+        if self.tables is not None:
+            pending = pending.filter(table_name__in=self.tables)
+        oldest = pending.order_by("change_id").values_list("changed_at", flat=True).first()
+        age = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+        return pending.count(), age
+
+
+def prune():
+    """
+    Delete changes every consumer has processed that are older than
+    RETENTION_DAYS. Returns the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=change_log_settings()["RETENTION_DAYS"])
+    processed = ConsumerOffset.objects.aggregate(low=Min("last_change_id"))["low"] or 0
+    deleted, _ = ChangeLog.objects.filter(change_id__lte=processed, changed_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,22 @@
+# Navigation state for includes/header.html: the top-level menu section and
+# the menu item of the current page, derived from the URL name.
+NAV_ITEMS = {
+    "home": ("home", "home"),
+    "about": ("about", "about"),
+    "mission": ("about", "mission"),
+    "vision": ("about", "vision"),
+    "contact": ("contact", "contact"),
+    "clientdataentry": ("contact", "clientdataentry"),
+    "apps": ("apps", "apps"),
+    "attendance": ("apps", "attendance"),
+    "payroll": ("apps", "payroll"),
+    "tasks": ("apps", "tasks"),
+    "inventory": ("apps", "inventory"),
+    "grocery": ("apps", "grocery"),
+}
+
+
+def navigation(request):
+    match = getattr(request, "resolver_match", None)
+    section, item = NAV_ITEMS.get(match.url_name if match else None, ("", ""))
+    return {"nav_section": section, "nav_item": item}
@@ -0,0 +1,382 @@
+"""
+Template-aware CSS purging and critical-CSS extraction for build_css.
+
+Stylesheets listed inside a {% stylesheets %} block are bundled in order and
+purged of every rule whose selectors name a class, id or element that never
+appears in the templates or the site's JavaScript (the token extractor is
+deliberately loose, so anything that looks like it could be used is kept).
+For each page template, the rules needed by the markup above the fold (the
+page chrome plus the first ``fold_chars`` characters of its content) are kept
+again as that page's critical CSS, which base.html inlines while the full
+bundle loads asynchronously.
+"""
+import gzip
+import hashlib
+import posixpath
+import re
+from pathlib import Path
+
+from django.templatetags.static import static
+
+# Parsing
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_LICENSE_COMMENT = re.compile(r"/\*!.*?\*/", re.DOTALL)
+
+# At-rules whose block contains further rules rather than declarations.
+NESTED_AT_RULES = {"media", "supports", "layer", "container", "document"}
+
+
+class Rule:
+    __slots__ = ("selectors", "body")
+
+    def __init__(self, selectors, body):
+        self.selectors = selectors
+        self.body = body
+
+
+class AtRule:
+    __slots__ = ("name", "prelude", "body", "children")
+
+    def __init__(self, name, prelude, body=None, children=None):
+        self.name = name
+        self.prelude = prelude
+        self.body = body
+        self.children = children
+
+
+def _scan_to(css, pos, stops):
+    """
+    Index of the first character in ``stops`` at or after ``pos`` that is not
+    inside a string or parentheses (data: URLs contain ';' and '{').
+    """
+    depth = 0
+    quote = None
+    while pos < len(css):
+        char = css[pos]
+        if quote:
+            if char == "\\":
+                pos += 1
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth <= 0 and char in stops:
+            return pos
+        pos += 1
+    return pos
+
+
+def _read_block(css, pos):
+    """
+    Text of the block whose opening brace is just before ``pos``, and the
+    position after its closing brace.
+    """
+    depth = 1
+    start = pos
+    while pos < len(css):
+        pos = _scan_to(css, pos, "{}")
+        if pos >= len(css):
+            break
+        depth += 1 if css[pos] == "{" else -1
+        pos += 1
+        if depth == 0:
+            return css[start:pos - 1], pos
+    return css[start:], pos
+
+
+def parse_css(css, pos=0):
+    """
+    Parse stylesheet text (comments already removed) into Rule and AtRule
+    nodes. Returns (nodes, position after the closing brace of the block).
+    """
+    nodes = []
+    while pos < len(css):
+        while pos < len(css) and css[pos].isspace():
+            pos += 1
+        if pos >= len(css):
+            break
+        if css[pos] == "}":
+            return nodes, pos + 1
+
+        end = _scan_to(css, pos, ";{}" if css[pos] == "@" else "{}")
+        prelude = css[pos:end].strip()
+        if end >= len(css) or css[end] == "}":
+            pos = end
+            continue
+        if css[end] == ";":
+            nodes.append(AtRule(prelude[1:].split(None, 1)[0].lower(), prelude))
+            pos = end + 1
+            continue
+
+        if prelude.startswith("@"):
+            name = re.split(r"[\s({]", prelude[1:], maxsplit=1)[0].lower()
+            if name in NESTED_AT_RULES:
+                children, pos = parse_css(css, end + 1)
+                nodes.append(AtRule(name, prelude, children=children))
+            else:
+                body, pos = _read_block(css, end + 1)
+                nodes.append(AtRule(name, prelude, body=body))
+        else:
+            body, pos = _read_block(css, end + 1)
+            nodes.append(Rule(split_selectors(prelude), body))
+    return nodes, pos
+
+
+def split_selectors(prelude):
+    selectors = []
+    pos = 0
+    while pos < len(prelude):
+        end = _scan_to(prelude, pos, ",")
+        selectors.append(" ".join(prelude[pos:end].split()))
+        pos = end + 1
+    return [selector for selector in selectors if selector]
+
+
+# Usage
+
+_TOKEN = re.compile(r"[A-Za-z0-9_-]+")
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_TEMPLATE_COMMENT = re.compile(r"{#.*?#}|{%\s*comment\s*%}.*?{%\s*endcomment\s*%}", re.DOTALL)
+
+_PSEUDO = re.compile(r"::?[-\w]+(\((?:[^()]|\([^()]*\))*\))?")
+_ATTRIBUTE = re.compile(r"\[[^\]]*\]")
+_CLASS_OR_ID = re.compile(r"([.#])((?:[-\w]|\\.)+)")
+_ELEMENT = re.compile(r"(?:^|(?<=[\s>+~]))([a-zA-Z][-\w]*)")
+
+
+def extract_tokens(text):
+    """
+    Every word-like token in markup or script; a class, id or element name
+    used anywhere shows up as one of them.
+    """
+    text = _TEMPLATE_COMMENT.sub(" ", _HTML_COMMENT.sub(" ", text))
+    return set(_TOKEN.findall(text))
+
+
+def selector_used(selector, tokens):
+    """
+    True when every class, id and element named by ``selector`` is in
+    ``tokens``. Pseudo-classes and attribute conditions are ignored, so
+    state selectors (:hover, [disabled]) survive with their base selector.
+    """
+    stripped = _ATTRIBUTE.sub("", _PSEUDO.sub("", selector))
+    for _, name in _CLASS_OR_ID.findall(stripped):
+        if name.replace("\\", "") not in tokens:
+            return False
+    for element in _ELEMENT.findall(_CLASS_OR_ID.sub("", stripped)):
+        if element.lower() not in tokens:
+            return False
+    return True
+
+
+def purge(nodes, tokens):
+    """
+    Copy of ``nodes`` keeping only used selectors; @font-face and @keyframes
+    are kept when the remaining CSS refers to their font family or name.
+    """
+    kept = _purge_rules(nodes, tokens)
+    referenced = serialize(_without_definitions(kept))
+    return _purge_definitions(kept, referenced)
+
+
+def _is_definition(node):
+    return isinstance(node, AtRule) and (node.name == "font-face" or node.name.endswith("keyframes"))
+
+
+def _without_definitions(nodes):
+    kept = []
+    for node in nodes:
+        if isinstance(node, AtRule) and node.children is not None:
+            node = AtRule(node.name, node.prelude, children=_without_definitions(node.children))
+        if not _is_definition(node):
+            kept.append(node)
+    return kept
+
+
+def _purge_rules(nodes, tokens):
+    kept = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            selectors = [selector for selector in node.selectors if selector_used(selector, tokens)]
+            if selectors:
+                kept.append(Rule(selectors, node.body))
+        elif node.children is not None:
+            children = _purge_rules(node.children, tokens)
+            if children:
+                kept.append(AtRule(node.name, node.prelude, children=children))
+        else:
+            kept.append(node)
+    return kept
+
+
+_FONT_FAMILY = re.compile(r"font-family\s*:\s*([^;]+)", re.IGNORECASE)
+
+
+def _purge_definitions(nodes, referenced):
+    kept = []
+    for node in nodes:
+        if isinstance(node, AtRule):
+            if node.children is not None:
+                children = _purge_definitions(node.children, referenced)
+                if not children:
+                    continue
+                node = AtRule(node.name, node.prelude, children=children)
+            elif node.name.endswith("keyframes"):
+                name = node.prelude.split(None, 1)[-1].strip()
+                if re.search(rf"animation[^;}}]*\b{re.escape(name)}\b", referenced) is None:
+                    continue
+            elif node.name == "font-face":
+                family = _FONT_FAMILY.search(node.body or "")
+                if family and family.group(1).strip().strip("\"'") not in referenced:
+                    continue
+        kept.append(node)
+    return kept
+
+
+# Output
+
+_URL = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)")
+_STATIC_TAG = re.compile(r"{%\s*static\s+['\"]([^'\"]+)['\"]\s*%}")
+
+
+def rewrite_urls(css, source, target):
+    """
+    Make relative url() references in ``source`` (a static path such as
+    css/all.min.css) resolve from ``target``, or become static URLs when
+    ``target`` is None (CSS inlined into a page). {% static %} tags left in
+    plain .css files are resolved to their static URL.
+    """
+
+    def replace(match):
+        url = match.group(2).strip()
+        tag = _STATIC_TAG.fullmatch(url)
+        if tag:
+            return f'url("{static(tag.group(1))}")'
+        if not url or re.match(r"^(data:|[a-z]+://|/|#)", url, re.IGNORECASE):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        if target is None:
+            return f'url("{static(resolved)}")'
+        return f'url("{posixpath.relpath(resolved, posixpath.dirname(target))}")'
+
+    return _URL.sub(replace, css)
+
+
+def serialize(nodes):
+    parts = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            parts.append(f"{','.join(node.selectors)}{{{' '.join(node.body.split())}}}")
+        elif node.children is not None:
+            parts.append(f"{node.prelude}{{{serialize(node.children)}}}")
+        elif node.body is not None:
+            parts.append(f"{node.prelude}{{{' '.join(node.body.split())}}}")
+        else:
+            parts.append(f"{node.prelude};")
+    return "".join(parts)
+
+
+def strip_comments(css):
+    return _COMMENT.sub("", css)
+
+
+def load_stylesheet(path, source, target):
+    """
+    Parse one stylesheet, keeping its /*! license */ comments aside.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    licenses = _LICENSE_COMMENT.findall(text)
+    nodes, _ = parse_css(rewrite_urls(strip_comments(text), source, target))
+    return nodes, licenses
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+
+
+def sizes(text):
+    data = text.encode("utf-8")
+    return {"bytes": len(data), "gzip_bytes": len(gzip.compress(data, 9))}
+
+
+# Templates
+
+_EXTENDS = re.compile(r"{%\s*extends\s+['\"]([^'\"]+)['\"]\s*%}")
+_INCLUDE = re.compile(r"{%\s*(?:cached_)?include\s+['\"]([^'\"]+)['\"][^%]*%}")
+_BLOCK = re.compile(r"{%\s*block\s+(\w+)\s*%}(.*?){%\s*endblock(?:\s+\w+)?\s*%}", re.DOTALL)
+_STYLESHEETS = re.compile(r"{%\s*stylesheets\s*%}(.*?){%\s*endstylesheets\s*%}", re.DOTALL)
+
+# Marks where the page content starts in a flattened template.
+CONTENT_MARKER = "\x00content\x00"
+
+
+def find_template(name, template_dirs):
+    if name.startswith("../"):
+        name = name.lstrip("./")
+    for directory in template_dirs:
+        path = Path(directory) / name
+        if path.is_file():
+            return path
+    return None
+
+
+def flatten_template(name, template_dirs, depth=0):
+    """
+    Template source with {% extends %} blocks filled in and {% include %}s
+    expanded. The content block, or the first include in a page with no
+    content block (the header), is followed by CONTENT_MARKER.
+    """
+    path = find_template(name, template_dirs)
+    if path is None or depth > 10:
+        return ""
+    source = path.read_text(encoding="utf-8")
+
+    parent = _EXTENDS.search(source)
+    if parent:
+        blocks = {block: body for block, body in _BLOCK.findall(source)}
+        source = flatten_template(parent.group(1), template_dirs, depth + 1)
+        source = _BLOCK.sub(
+            lambda match: (CONTENT_MARKER if match.group(1) == "content" else "")
+            + blocks.get(match.group(1), match.group(2)),
+            source,
+        )
+    elif depth == 0:
+        source = _BLOCK.sub(
+            lambda match: (CONTENT_MARKER if match.group(1) == "content" else "") + match.group(2),
+            source,
+        )
+
+    def include(match):
+        return flatten_template(match.group(1), template_dirs, depth + 1)
+
+    if depth == 0 and CONTENT_MARKER not in source:
+        body = source.find("<body")
+        first = _INCLUDE.search(source, max(body, 0))
+        if first:
+            source = source[:first.end()] + CONTENT_MARKER + source[first.end():]
+    return _INCLUDE.sub(include, source)
+
+
+def above_the_fold(flattened, fold_chars):
+    """
+    Markup up to ``fold_chars`` characters into the page content.
+    """
+    marker = flattened.find(CONTENT_MARKER)
+    if marker < 0:
+        return flattened
+    return flattened[:marker + len(CONTENT_MARKER) + fold_chars]
+
+
+def stylesheet_paths(flattened):
+    """
+    Static paths of the stylesheets inside the {% stylesheets %} block.
+    """
+    block = _STYLESHEETS.search(flattened)
+    if block is None:
+        return None
+    return [path for path in _STATIC_TAG.findall(block.group(1)) if path.endswith(".css")]
@@ -0,0 +1,267 @@
+"""
+Duplicate-supplier detection.
+
+Suppliers are normalized (company name with legal-form suffixes unified and
+punctuation removed, TIN reduced to its digits) and grouped into blocks by
+cheap keys: the 9-digit TIN base, a phonetic code of the leading name words
+and MinHash bands of the name's character trigrams. Only suppliers sharing a
+block are scored against each other, which keeps the number of comparisons
+close to linear instead of n^2.
+"""
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+
+# Legal forms and common words spelled several ways in supplier names.
+NAME_SYNONYMS = {
+    "INCORPORATED": "INC",
+    "CORPORATION": "CORP",
+    "CORPO": "CORP",
+    "COMPANY": "CO",
+    "LIMITED": "LTD",
+    "ENTERPRISES": "ENT",
+    "ENTERPRISE": "ENT",
+    "INTERNATIONAL": "INTL",
+    "PHILIPPINES": "PHILS",
+    "PHIL": "PHILS",
+    "TRADING": "TRDG",
+    "MANUFACTURING": "MFG",
+    "DISTRIBUTORS": "DIST",
+    "DISTRIBUTOR": "DIST",
+    "AND": "&",
+}
+# Words dropped from the "core" name used for matching.
+LEGAL_FORMS = {"INC", "CORP", "CO", "LTD", "OPC", "ENT", "THE", "&"}
+
+TIN_BASE_DIGITS = 9
+MINHASH_BANDS = 4
+MINHASH_ROWS = 3
+MINHASH_CHUNK = 50000
+MAX_BLOCK_SIZE = 100
+NEIGHBOUR_WINDOW = 5
+
+_PUNCTUATION = re.compile(r"[^A-Z0-9& ]+")
+_SPLIT_INITIALS = re.compile(r"\b[A-Z](?: +[A-Z]\b)+")
+_HASH_PRIME = (1 << 31) - 1
+
+_SOUNDEX_CODES = {
+    letter: digit
+    for letters, digit in (
+        ("BFPV", "1"), ("CGJKQSXZ", "2"), ("DT", "3"), ("L", "4"), ("MN", "5"), ("R", "6")
+    )
+    for letter in letters
+}
+
+
+def normalize_name(name):
+    """
+    Upper-case, accent-free name with punctuation removed and legal forms
+    spelled one way, e.g. "Juan's Trading, Incorporated" -> "JUANS TRDG INC".
+    """
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii")
+    text = _PUNCTUATION.sub(" ", text.upper().replace("&", " & ").replace("'", ""))
+    # Rejoin initials split by punctuation: "A.B.C." -> "A B C" -> "ABC".
+    text = _SPLIT_INITIALS.sub(lambda match: match.group(0).replace(" ", ""), text)
+    return " ".join(NAME_SYNONYMS.get(word, word) for word in text.split())
+
+
+def core_name(normalized_name):
+    """
+    Normalized name without legal forms, used for scoring and blocking.
+    """
+    words = [word for word in normalized_name.split() if word not in LEGAL_FORMS]
+    return " ".join(words) or normalized_name
+
+
+def normalize_tin(tin):
+    """
+    Digits of a TIN, so "123-456-789-000" and "123456789000" compare equal.
+    """
+    return re.sub(r"\D", "", tin or "")
+
+
+def soundex(word):
+    """
+    American Soundex code of a word ("" for words without letters).
+    """
+    letters = [c for c in word.upper() if c.isalpha()]
+    if not letters:
+        return ""
+    result = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, "")
+        if digit and digit != previous:
+            result += digit
+        if letter not in "HW":
+            previous = digit
+    return (result + "000")[:4]
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SupplierRecord:
+    __slots__ = ("supplier_id", "tin", "company_name", "name", "core", "tin_digits")
+
+    def __init__(self, supplier_id, tin, company_name):
+        self.supplier_id = supplier_id
+        self.tin = tin
+        self.company_name = company_name
+        self.name = normalize_name(company_name)
+        self.core = core_name(self.name)
+        self.tin_digits = normalize_tin(tin)
+
+
+# Blocking
+
+def _minhash_band_keys(records):
+    """
+    MinHash LSH band keys over name trigrams, computed with NumPy in chunks
+    so memory stays bounded on large supplier tables.
+    """
+    num_hashes = MINHASH_BANDS * MINHASH_ROWS
+    rng = np.random.default_rng(20250516)
+    a = rng.integers(1, _HASH_PRIME, size=num_hashes, dtype=np.int64)
+    b = rng.integers(0, _HASH_PRIME, size=num_hashes, dtype=np.int64)
+
+    keys = []
+    for start in range(0, len(records), MINHASH_CHUNK):
+        chunk = records[start:start + MINHASH_CHUNK]
+        gram_hashes = []
+        lengths = []
+        for record in chunk:
+            grams = trigrams(record.core)
+            gram_hashes.extend(zlib.crc32(gram.encode("ascii")) % _HASH_PRIME for gram in grams)
+            lengths.append(len(grams))
+
+        # Universal hashing (a * h + b) mod p; all terms are below 2**31, so
+        # the products fit in int64.
+        hashes = np.array(gram_hashes, dtype=np.int64)
+        permuted = (np.outer(a, hashes) + b[:, None]) % _HASH_PRIME
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.intp)
+        signatures = np.minimum.reduceat(permuted, starts, axis=1).T
+
+        for record, signature in zip(chunk, signatures):
+            bands = signature.reshape(MINHASH_BANDS, MINHASH_ROWS)
+            keys.append([f"mh{band}:{row.tobytes().hex()}" for band, row in enumerate(bands)])
+    return keys
+
+
+def blocking_keys(record, band_keys):
+    keys = list(band_keys)
+    if len(record.tin_digits) >= TIN_BASE_DIGITS:
+        keys.append("tin:" + record.tin_digits[:TIN_BASE_DIGITS])
+    words = record.core.split()
+    if words:
+        keys.append("ph:" + "".join(soundex(word) for word in words[:2]))
+    return keys
+
+
+def candidate_pairs(records):
+    """
+    Index pairs of records sharing at least one blocking key. Oversized blocks
+    (very common names) are compared only within a sorted window.
+    """
+    blocks = defaultdict(list)
+    for index, (record, band_keys) in enumerate(zip(records, _minhash_band_keys(records))):
+        for key in blocking_keys(record, band_keys):
+            blocks[key].append(index)
+
+    pairs = set()
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) <= MAX_BLOCK_SIZE:
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    pairs.add((left, right))
+        else:
+            members = sorted(members, key=lambda index: records[index].core)
+            for i, left in enumerate(members):
+                for right in members[i + 1:i + 1 + NEIGHBOUR_WINDOW]:
+                    pairs.add((min(left, right), max(left, right)))
+    return pairs
+
+
+# Scoring
+
+def score_pair(left, right):
+    """
+    Similarity between two suppliers in [0, 1] with the reasons behind it.
+    """
+    reasons = []
+    name_score = SequenceMatcher(None, left.core, right.core).ratio()
+    if left.core == right.core:
+        reasons.append("same name")
+    elif name_score >= 0.85:
+        reasons.append("similar name")
+
+    if left.tin_digits and left.tin_digits == right.tin_digits:
+        reasons.append("same TIN")
+        return 0.5 + 0.5 * name_score, reasons
+    if (
+        len(left.tin_digits) >= TIN_BASE_DIGITS
+        and left.tin_digits[:TIN_BASE_DIGITS] == right.tin_digits[:TIN_BASE_DIGITS]
+    ):
+        reasons.append("same TIN base")
+        return 0.4 + 0.6 * name_score, reasons
+    # Different TINs make an exact name match slightly less certain.
+    return 0.95 * name_score, reasons
+
+
+def find_duplicates(rows, threshold=0.85):
+    """
+    Score candidate pairs from ``rows`` of (SupplierID, TIN, CompanyName).
+
+    Returns (matches, stats): matches are dicts, each with a ``group``
+    number shared by all suppliers linked together, sorted by group and by
+    descending score within a group.
+    """
+    records = [SupplierRecord(*row) for row in rows]
+    pairs = candidate_pairs(records)
+
+    matches = []
+    parent = list(range(len(records)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for left_index, right_index in pairs:
+        left, right = records[left_index], records[right_index]
+        score, reasons = score_pair(left, right)
+        if score < threshold:
+            continue
+        parent[find(left_index)] = find(right_index)
+        matches.append({
+            "left": left,
+            "right": right,
+            "left_index": left_index,
+            "score": round(score, 4),
+            "reasons": reasons,
+        })
+
+    groups = {}
+    for match in matches:
+        root = find(match.pop("left_index"))
+        match["group"] = groups.setdefault(root, len(groups) + 1)
+    matches.sort(key=lambda match: (match["group"], -match["score"]))
+
+    total = len(records)
+    stats = {
+        "suppliers": total,
+        "candidate_pairs": len(pairs),
+        "all_pairs": total * (total - 1) // 2,
+        "matches": len(matches),
+        "groups": len(groups),
+    }
+    return matches, stats
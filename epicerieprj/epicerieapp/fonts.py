@@ -0,0 +1,194 @@
+"""
+Web font subsetting for build_fonts.
+
+The @font-face rules of each stylesheet in FONT_STYLESHEETS are read, and
+every woff2 file they reference is cut down to the characters the site can
+display: the text of the templates plus FONT_SUBSET_RANGES (Basic Latin,
+Latin-1 for Filipino and Spanish names, typographic punctuation, the peso
+sign) for product and supplier names that come from the database. The
+rewritten rules carry the exact unicode-range of each subset, so a browser
+only downloads a file when the page uses one of its characters, and
+font-display so text renders in a fallback font while the file loads.
+
+build_css then bundles the rewritten stylesheet in place of the original,
+and {% font_preloads %} preloads the faces named in FONT_PRELOAD.
+"""
+import hashlib
+import io
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+from . import assets, cssbuild
+
+DEFAULT_STYLESHEETS = ["homeapp/css/fonts.css", "css/css2.css"]
+DEFAULT_RANGES = "U+0020-007E, U+00A0-00FF, U+2013-2014, U+2018-201E, U+2022, U+2026, U+20AC, U+20B1"
+DEFAULT_DISPLAY = "swap"
+DEFAULT_PRELOAD = ["Poppins:400"]
+
+_TEMPLATE_SYNTAX = re.compile(r"{%.*?%}|{{.*?}}|{#.*?#}|<!--.*?-->|<[^>]*>", re.DOTALL)
+_DECLARATION = re.compile(r"([-\w]+)\s*:\s*([^;]+)")
+_SRC_URL = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)")
+
+
+class FontBuildError(Exception):
+    pass
+
+
+def _fonttools():
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError as exc:
+        raise FontBuildError(
+            "Subsetting fonts requires fontTools and brotli (pip install fonttools brotli)."
+        ) from exc
+    return subset, TTFont
+
+
+# Unicode ranges
+
+def parse_unicode_range(text):
+    """
+    Code points of a CSS unicode-range value such as "U+0000-00FF, U+0131".
+    """
+    codepoints = set()
+    for part in text.replace("u+", "U+").split(","):
+        part = part.strip().removeprefix("U+")
+        if not part:
+            continue
+        if "?" in part:
+            start, end = int(part.replace("?", "0"), 16), int(part.replace("?", "F"), 16)
+        elif "-" in part:
+            start, end = (int(value, 16) for value in part.split("-", 1))
+        else:
+            start = end = int(part, 16)
+        codepoints.update(range(start, end + 1))
+    return codepoints
+
+
+def format_unicode_range(codepoints):
+    parts = []
+    ordered = sorted(codepoints)
+    index = 0
+    while index < len(ordered):
+        start = end = ordered[index]
+        while index + 1 < len(ordered) and ordered[index + 1] == end + 1:
+            index += 1
+            end = ordered[index]
+        parts.append(f"U+{start:04X}" if start == end else f"U+{start:04X}-{end:04X}")
+        index += 1
+    return ", ".join(parts)
+
+
+def used_codepoints(template_dirs):
+    """
+    Characters in the text of the templates plus FONT_SUBSET_RANGES.
+    """
+    codepoints = parse_unicode_range(getattr(settings, "FONT_SUBSET_RANGES", DEFAULT_RANGES))
+    for directory in template_dirs:
+        for path in Path(directory).rglob("*.html"):
+            text = _TEMPLATE_SYNTAX.sub(" ", path.read_text(encoding="utf-8"))
+            codepoints.update(ord(char) for char in text if char.isprintable())
+    return codepoints
+
+
+# @font-face rules
+
+class FontFace:
+    __slots__ = ("family", "weight", "style", "source", "path", "unicode_range", "declarations")
+
+    def __init__(self, family, weight, style, source, path, unicode_range, declarations):
+        self.family = family
+        self.weight = weight
+        self.style = style
+        self.source = source
+        self.path = path
+        self.unicode_range = unicode_range
+        self.declarations = declarations
+
+    @property
+    def key(self):
+        return f"{self.family}:{self.weight}"
+
+
+def read_font_faces(stylesheet):
+    """
+    FontFace for every woff2 @font-face rule of a stylesheet (static path),
+    and the stylesheet's other rules. ``path`` is None when the font file is
+    missing.
+    """
+    stylesheet_file = finders.find(stylesheet)
+    if stylesheet_file is None:
+        raise FontBuildError(f"Stylesheet not found: {stylesheet}")
+    text = cssbuild.rewrite_urls(
+        cssbuild.strip_comments(Path(stylesheet_file).read_text(encoding="utf-8")), stylesheet, stylesheet
+    )
+    nodes, _ = cssbuild.parse_css(text)
+
+    faces, others = [], []
+    for node in nodes:
+        if not (isinstance(node, cssbuild.AtRule) and node.name == "font-face"):
+            others.append(node)
+            continue
+        declarations = {name.lower(): value.strip() for name, value in _DECLARATION.findall(node.body)}
+        url = _SRC_URL.search(declarations.get("src", ""))
+        if url is None or not url.group(2).endswith(".woff2"):
+            others.append(node)
+            continue
+        source = url.group(2)
+        if source.startswith(settings.STATIC_URL) or source.startswith("/" + settings.STATIC_URL):
+            source = source.split(settings.STATIC_URL.strip("/") + "/", 1)[1]
+        else:
+            source = posixpath.normpath(posixpath.join(posixpath.dirname(stylesheet), source))
+        faces.append(FontFace(
+            family=declarations.get("font-family", "").strip("\"'"),
+            weight=declarations.get("font-weight", "400"),
+            style=declarations.get("font-style", "normal"),
+            source=source,
+            path=finders.find(source),
+            unicode_range=parse_unicode_range(declarations.get("unicode-range", "U+0-10FFFF")),
+            declarations=declarations,
+        ))
+    return faces, others
+
+
+def subset_face(face, codepoints, out_dir):
+    """
+    Write the subset of one face's file covering ``codepoints`` and return
+    (static path, code points it covers, bytes), or None when the face has no
+    glyph the site uses.
+    """
+    subset, TTFont = _fonttools()
+    font = TTFont(face.path)
+    wanted = set(font.getBestCmap()) & face.unicode_range & codepoints
+    if not wanted:
+        return None
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=wanted)
+    subsetter.subset(font)
+
+    buffer = io.BytesIO()
+    font.flavor = "woff2"
+    font.save(buffer)
+    data = buffer.getvalue()
+    stem = f"{face.family.replace(' ', '')}-{face.weight}-{face.style}"
+    target = out_dir / f"{stem}.{hashlib.sha1(data).hexdigest()[:10]}.woff2"
+    target.write_bytes(data)
+    return assets.static_path(target), wanted, len(data)
+
+
+def font_face_css(face, url, codepoints, display):
+    declarations = dict(face.declarations)
+    declarations["src"] = f'url("{url}") format("woff2")'
+    declarations["unicode-range"] = format_unicode_range(codepoints)
+    declarations["font-display"] = display
+    body = ";".join(f"{name}:{value}" for name, value in declarations.items())
+    return f"@font-face{{{body}}}"
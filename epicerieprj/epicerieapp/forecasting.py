@@ -0,0 +1,226 @@
+"""
+Demand forecasts and reorder points for every product of a branch.
+
+`manage.py forecast_orders` (run nightly, or queued as the "forecast-orders"
+job) forecasts each branch's demand from its sale movements and replaces
+the branch's SuggestedOrders with the products at or below their reorder
+point. The inventory page lists them.
+
+Active products are processed in blocks of PRODUCT_BLOCK ids. For a block,
+the sale movements of the last HISTORY_DAYS days are streamed in CHUNK_ROWS
+batches into a (products x days) demand matrix, so memory depends on the
+block size, not on the catalog or the sales history. The rest is array
+arithmetic over the whole block:
+
+- seasonality: each product's day-of-week profile (average demand on that
+  weekday over its average day), shrunk towards flat for products with few
+  sales;
+- demand rate: exponentially weighted average of the deseasonalized daily
+  demand, SMOOTHING being the weight of the latest day;
+- forecasts: the rate times the profile over the lead time, and over the
+  lead time plus the review period;
+- safety stock: SERVICE_LEVEL_Z x the standard deviation of the daily
+  forecast error x sqrt(lead time + review period);
+- reorder point: lead time forecast + safety stock. A product at or below
+  it is suggested up to its lead time + review forecast plus safety stock.
+
+Configured with the FORECAST setting:
+
+    FORECAST = {
+        "HISTORY_DAYS": 56,
+        "LEAD_TIME_DAYS": 3,
+        "REVIEW_DAYS": 7,            # days until the next order is placed
+        "SERVICE_LEVEL_Z": 1.65,     # about 95% of review periods without a stock-out
+        "SMOOTHING": 0.1,
+        "SEASONAL_PRIOR_UNITS": 28,  # units sold before the weekday profile counts fully
+        "PRODUCT_BLOCK": 20000,
+        "CHUNK_ROWS": 50000,
+    }
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import sharding
+from .models import Product, StockMovement, SuggestedOrder
+
+DEFAULTS = {
+    "HISTORY_DAYS": 56,
+    "LEAD_TIME_DAYS": 3,
+    "REVIEW_DAYS": 7,
+    "SERVICE_LEVEL_Z": 1.65,
+    "SMOOTHING": 0.1,
+    "SEASONAL_PRIOR_UNITS": 28,
+    "PRODUCT_BLOCK": 20000,
+    "CHUNK_ROWS": 50000,
+}
+
+SECONDS_PER_DAY = 86400
+
+# Weekday profile values below this are treated as "never sells that day"
+MIN_PROFILE = 1e-6
+
+
+def forecast_settings():
+    return {**DEFAULTS, **getattr(settings, "FORECAST", {})}
+
+
+# Loading
+
+def demand_matrix(alias, product_ids, start, days, chunk_rows):
+    """
+    Units sold per product (rows, in ``product_ids`` order; ids sorted) and
+    day since ``start`` (columns), read from the branch's sale movements
+    ``chunk_rows`` at a time.
+    """
+    demand = np.zeros(len(product_ids) * days)
+    movements = (
+        StockMovement.objects.using(alias)
+        .filter(
+            reason="Sale",
+            moved_at__gte=start,
+            moved_at__lt=start + timedelta(days=days),
+            product_id__gte=int(product_ids[0]),
+            product_id__lte=int(product_ids[-1]),
+        )
+        .values_list("product_id", "moved_at", "quantity")
+        .iterator(chunk_size=chunk_rows)
+    )
+    origin = start.timestamp()
+    while True:
+        chunk = list(islice(movements, chunk_rows))
+        if not chunk:
+            break
+        ids, moments, quantities = zip(*chunk)
+        ids = np.array(ids, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(product_ids, ids), len(product_ids) - 1)
+        day = (np.array([moment.timestamp() for moment in moments]) - origin) // SECONDS_PER_DAY
+        # Ids in the range that are not active products are skipped
+        keep = (product_ids[rows] == ids) & (day >= 0) & (day < days)
+        cells = rows[keep] * days + day[keep].astype(np.int64)
+        # Sales are recorded as negative movements
+        demand -= np.bincount(cells, weights=np.array(quantities, dtype=float)[keep], minlength=demand.size)
+    return demand.reshape(len(product_ids), days)
+
+
+def stock_on_hand(alias, product_ids):
+    on_hand = np.zeros(len(product_ids))
+    totals = (
+        StockMovement.objects.using(alias)
+        .filter(product_id__gte=int(product_ids[0]), product_id__lte=int(product_ids[-1]))
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+    for product_id, total in totals:
+        row = np.searchsorted(product_ids, product_id)
+        if row < len(product_ids) and product_ids[row] == product_id:
+            on_hand[row] = float(total)
+    return on_hand
+
+
+# Forecasting
+
+def forecast(demand, first_weekday, on_hand, options=None):
+    """
+    Demand rates, forecasts, safety stock, reorder points and suggested
+    quantities for a (products x days) ``demand`` matrix whose first column
+    is a ``first_weekday`` (Monday = 0) and whose last is yesterday.
+    """
+    options = options or forecast_settings()
+    products, days = demand.shape
+    weekdays = (first_weekday + np.arange(days)) % 7
+
+    # Day-of-week profile, shrunk towards 1 for slow sellers
+    sold = demand.sum(axis=1)
+    average = sold / days
+    by_weekday = np.stack([demand[:, weekdays == weekday].mean(axis=1) for weekday in range(7)], axis=1)
+    raw_profile = np.divide(by_weekday, average[:, None], out=np.ones_like(by_weekday), where=average[:, None] > 0)
+    confidence = sold / (sold + options["SEASONAL_PRIOR_UNITS"])
+    profile = 1 + confidence[:, None] * (raw_profile - 1)
+
+    # Demand rate: weighted average of deseasonalized demand, recent days first
+    seasonal = profile[:, weekdays]
+    counted = seasonal > MIN_PROFILE
+    deseasonalized = np.divide(demand, seasonal, out=np.zeros_like(demand), where=counted)
+    smoothing = options["SMOOTHING"]
+    weights = counted * (1 - smoothing) ** np.arange(days - 1, -1, -1)
+    weight_totals = weights.sum(axis=1)
+    rate = np.divide(
+        (deseasonalized * weights).sum(axis=1), weight_totals, out=np.zeros(products), where=weight_totals > 0
+    )
+    error = np.sqrt(((demand - rate[:, None] * seasonal) ** 2).mean(axis=1))
+
+    # Forecasts over the days from today
+    lead_time = options["LEAD_TIME_DAYS"]
+    horizon = lead_time + options["REVIEW_DAYS"]
+    future = (first_weekday + days + np.arange(horizon)) % 7
+    lead_time_demand = rate * profile[:, future[:lead_time]].sum(axis=1)
+    horizon_demand = rate * profile[:, future].sum(axis=1)
+
+    safety_stock = options["SERVICE_LEVEL_Z"] * error * np.sqrt(horizon)
+    reorder_point = lead_time_demand + safety_stock
+    order_up_to = horizon_demand + safety_stock
+    suggested = np.where(on_hand <= reorder_point, np.ceil(np.maximum(order_up_to - on_hand, 0)), 0)
+    return {
+        "daily_demand": rate,
+        "lead_time_demand": lead_time_demand,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+        "on_hand": on_hand,
+        "suggested_quantity": suggested,
+    }
+
+
+def _quantity(value):
+    return Decimal(f"{value:.3f}")
+
+
+def forecast_branch(alias, now=None):
+    """
+    Forecast every active product of the branch at ``alias`` and replace
+    its SuggestedOrders. Returns a summary.
+    """
+    started = time.monotonic()
+    options = forecast_settings()
+    now = timezone.localtime(now)
+    days = options["HISTORY_DAYS"]
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    product_ids = np.array(
+        sorted(Product.objects.filter(status="Active").values_list("product_id", flat=True)), dtype=np.int64
+    )
+
+    suggestions = []
+    for offset in range(0, len(product_ids), options["PRODUCT_BLOCK"]):
+        block = product_ids[offset:offset + options["PRODUCT_BLOCK"]]
+        demand = demand_matrix(alias, block, start, days, options["CHUNK_ROWS"])
+        result = forecast(demand, start.weekday(), stock_on_hand(alias, block), options)
+        for row in np.flatnonzero(result["suggested_quantity"] > 0):
+            suggestions.append(SuggestedOrder(
+                product_id=int(block[row]),
+                computed_at=now,
+                **{field: _quantity(values[row]) for field, values in result.items()},
+            ))
+
+    with transaction.atomic(using=alias):
+        SuggestedOrder.objects.using(alias).all().delete()
+        SuggestedOrder.objects.using(alias).bulk_create(suggestions, batch_size=1000)
+    return {
+        "products": len(product_ids),
+        "suggested": len(suggestions),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def run_forecast(branch_list=None):
+    """
+    forecast_branch() for every branch in parallel; {branch: summary}.
+    """
+    return sharding.gather(forecast_branch, branch_list)
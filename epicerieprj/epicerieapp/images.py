@@ -0,0 +1,145 @@
+"""
+Resized WebP/JPEG variants of the site's raster images for build_images and
+the {% responsive_image %} tag.
+
+Each source image is resized to every configured breakpoint width no larger
+than the original (plus the original width itself) and encoded once per
+output format. Variant file names carry a hash of the source bytes, so an
+unchanged image is skipped on the next build and a changed one gets new URLs
+that can be cached forever.
+"""
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+
+from . import assets
+
+DEFAULT_BREAKPOINTS = [320, 480, 768, 1024, 1440, 1920]
+DEFAULT_FORMATS = ["webp", "jpeg"]
+DEFAULT_QUALITY = {"webp": 75, "jpeg": 80}
+
+SOURCE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+# File extension and Pillow save options per output format.
+FORMAT_OPTIONS = {
+    "webp": ("webp", {"method": 6}),
+    "jpeg": ("jpg", {"optimize": True, "progressive": True}),
+}
+
+
+class ImageBuildError(Exception):
+    pass
+
+
+def breakpoints():
+    return sorted(getattr(settings, "IMAGE_BREAKPOINTS", DEFAULT_BREAKPOINTS))
+
+
+def output_formats():
+    return list(getattr(settings, "IMAGE_FORMATS", DEFAULT_FORMATS))
+
+
+def quality(fmt):
+    return {**DEFAULT_QUALITY, **getattr(settings, "IMAGE_QUALITY", {})}[fmt]
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError as exc:
+        raise ImageBuildError("Building image variants requires Pillow (pip install Pillow).") from exc
+    return Image
+
+
+def source_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def find_sources():
+    """
+    Static paths and files of every raster image outside the build output.
+    """
+    root = assets.static_dir()
+    dist = root / assets.DIST_PREFIX
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() in SOURCE_SUFFIXES and dist not in path.parents:
+            yield assets.static_path(path), path
+
+
+def target_widths(original_width, widths):
+    return sorted({width for width in widths if width < original_width} | {original_width})
+
+
+def build_variants(static_path, path, widths, formats, previous=None, force=False):
+    """
+    Manifest entry for one source image, writing any variant that is missing.
+    ``previous`` is the entry from the last build, reused when the source
+    hash, widths and formats are unchanged and the files still exist.
+    """
+    digest = source_hash(path)
+    if previous and not force and previous["hash"] == digest and previous["formats"] == formats:
+        variants = [variant for group in previous["variants"].values() for variant in group]
+        expected = target_widths(previous["width"], widths)
+        if all((assets.static_dir() / variant["path"]).exists() for variant in variants) and all(
+            [variant["width"] for variant in group] == expected for group in previous["variants"].values()
+        ):
+            return previous, False
+
+    Image = _pillow()
+    out_dir = assets.dist_dir("images")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(static_path).with_suffix("").as_posix().replace("/", "-")
+
+    with Image.open(path) as image:
+        image.load()
+        original_width, original_height = image.size
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        entry = {
+            "hash": digest,
+            "width": original_width,
+            "height": original_height,
+            "source_bytes": path.stat().st_size,
+            "formats": formats,
+            "variants": {},
+        }
+        for fmt in formats:
+            extension, options = FORMAT_OPTIONS[fmt]
+            group = []
+            for width in target_widths(original_width, widths):
+                height = round(original_height * width / original_width)
+                resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+                if fmt == "jpeg" or not has_alpha:
+                    resized = resized.convert("RGB")
+                target = out_dir / f"{stem}.{digest}.{width}w.{extension}"
+                resized.save(target, fmt.upper(), quality=quality(fmt), **options)
+                group.append({
+                    "width": width,
+                    "height": height,
+                    "path": assets.static_path(target),
+                    "bytes": target.stat().st_size,
+                })
+            entry["variants"][fmt] = group
+    return entry, True
+
+
+def prune(manifest):
+    """
+    Delete variant files no longer referenced by ``manifest``.
+    """
+    referenced = {
+        variant["path"]
+        for entry in manifest["images"].values()
+        for group in entry["variants"].values()
+        for variant in group
+    }
+    removed = 0
+    for path in assets.dist_dir("images").glob("*.*"):
+        if path.name != "manifest.json" and assets.static_path(path) not in referenced:
+            path.unlink()
+            removed += 1
+    return removed
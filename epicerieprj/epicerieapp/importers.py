@@ -0,0 +1,359 @@
+"""
+Staged upsert importer for supplier price lists.
+
+A supplier's full price list is bulk-loaded into a temporary staging table and
+diffed against that supplier's latest price per product with set-based SQL.
+Only prices that changed produce a new SupplierProductCatalog row, so re-sending
+an unchanged list does not grow the price history. Unknown products are created
+in one INSERT ... SELECT, and the (SupplierID, ProductID, PriceEntryDate) unique
+key is respected by correcting same-day rows instead of inserting duplicates.
+"""
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cdc
+from .models import Product, SupplierProductCatalog
+from .report_cache import bump_versions
+
+STAGING_TABLE = "PriceListStaging"
+BATCH_SIZE = 1000
+MAX_REPORTED_REJECTS = 100
+
+# Digits before the point that DealersPrice (max_digits=12, decimal_places=2)
+# can hold
+PRICE_INTEGER_DIGITS = 10
+
+# Accepted header spellings per field, compared lower-case without spaces.
+COLUMN_ALIASES = {
+    "product_name": ["productname", "product", "description", "item", "itemname"],
+    "dealers_price": ["dealersprice", "cost", "price", "unitcost"],
+    "category": ["category"],
+    "unit_of_measure": ["unitofmeasure", "uom", "size", "unit"],
+    "supplier_product_code": ["supplierproductcode", "productcode", "code", "sku", "itemcode"],
+}
+
+
+class PriceListError(Exception):
+    pass
+
+
+# Reading
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        yield from csv.reader(file)
+
+
+def _read_xlsx(path):
+    try:
+        import openpyxl
+    except ImportError as exc:
+        raise PriceListError("Reading .xlsx price lists requires openpyxl (pip install openpyxl).") from exc
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ["" if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def read_rows(path):
+    """
+    Iterate the rows of a .csv or .xlsx price list, header row included.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return _read_csv(path)
+    if suffix in (".xlsx", ".xlsm"):
+        return _read_xlsx(path)
+    raise PriceListError(f"Unsupported price list format: {suffix}")
+
+
+def map_columns(header, overrides=None):
+    """
+    Column index per field from the header row; ``overrides`` maps a field to
+    an explicit header name.
+    """
+    normalized = [str(title).strip().lower().replace(" ", "").replace("_", "") for title in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        wanted = [(overrides or {}).get(field)] if (overrides or {}).get(field) else aliases
+        for alias in wanted:
+            alias = alias.strip().lower().replace(" ", "").replace("_", "")
+            if alias in normalized:
+                columns[field] = normalized.index(alias)
+                break
+
+    missing = [field for field in ("product_name", "dealers_price") if field not in columns]
+    if missing:
+        raise PriceListError(f"Price list header has no column for: {', '.join(missing)}")
+    return columns
+
+
+def _cell(row, columns, field):
+    index = columns.get(field)
+    if index is None or index >= len(row):
+        return None
+    value = str(row[index]).strip()
+    return value or None
+
+
+def parse_rows(rows, columns, rejects):
+    """
+    Yield staging tuples for valid rows, appending (row number, reason) to
+    ``rejects`` for the others.
+    """
+    for row_number, row in enumerate(rows, start=2):
+        name = _cell(row, columns, "product_name")
+        price = _cell(row, columns, "dealers_price")
+        if not name and not price:
+            continue  # blank line
+        if not name:
+            rejects.append((row_number, "missing product name"))
+            continue
+        try:
+            price = Decimal(str(price).replace(",", "")).quantize(Decimal("0.01"))
+        except (InvalidOperation, TypeError):
+            rejects.append((row_number, f"invalid price {price!r}"))
+            continue
+        # NaN survives quantize, and a price too long for the column would
+        # fail the whole batch insert
+        if not price.is_finite() or price.adjusted() >= PRICE_INTEGER_DIGITS:
+            rejects.append((row_number, f"invalid price {price}"))
+            continue
+        if price < 0:
+            rejects.append((row_number, f"negative price {price}"))
+            continue
+        yield (
+            row_number,
+            " ".join(name.split()),
+            str(price),
+            _cell(row, columns, "category"),
+            _cell(row, columns, "unit_of_measure"),
+            _cell(row, columns, "supplier_product_code"),
+        )
+
+
+# Set-based import
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_price_list(path, supplier, price_entry_date=None, column_overrides=None, create_products=True):
+    """
+    Import a supplier price list. Returns a summary dictionary with row counts
+    and per-phase timings.
+    """
+    price_entry_date = price_entry_date or timezone.localdate()
+    catalog = SupplierProductCatalog._meta.db_table
+    products = Product._meta.db_table
+
+    summary = {
+        "rows_read": 0,
+        "inserted": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "rejected": 0,
+        "products_created": 0,
+        "rejects": [],
+        "timings": {},
+    }
+    rejects = []
+    started = time.perf_counter()
+
+    def mark(phase, since):
+        now = time.perf_counter()
+        summary["timings"][phase] = round(now - since, 3)
+        return now
+
+    rows = read_rows(path)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise PriceListError("Price list is empty")
+    columns = map_columns(header, column_overrides)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                RowNumber INTEGER NOT NULL,
+                ProductName VARCHAR(255) NOT NULL,
+                DealersPrice DECIMAL(12, 2) NOT NULL,
+                Category VARCHAR(100) NULL,
+                UnitOfMeasure VARCHAR(50) NULL,
+                SupplierProductCode VARCHAR(100) NULL,
+                ProductID INTEGER NULL
+            )
+        """)
+
+        # 1. Bulk load.
+        phase = time.perf_counter()
+        insert_staging = (
+            f"INSERT INTO {STAGING_TABLE} (RowNumber, ProductName, DealersPrice, Category, "
+            "UnitOfMeasure, SupplierProductCode) VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+        for batch in _batches(parse_rows(rows, columns, rejects), BATCH_SIZE):
+            cursor.executemany(insert_staging, batch)
+            summary["rows_read"] += len(batch)
+        summary["rows_read"] += len(rejects)
+        cursor.execute(f"CREATE INDEX IX_{STAGING_TABLE}_ProductName ON {STAGING_TABLE} (ProductName)")
+
+        # A product listed twice keeps its first line.
+        cursor.execute(f"""
+            SELECT s.RowNumber FROM {STAGING_TABLE} s
+            WHERE EXISTS (
+                SELECT 1 FROM {STAGING_TABLE} d
+                WHERE d.ProductName = s.ProductName AND d.RowNumber < s.RowNumber
+            )
+        """)
+        rejects.extend((row_number, "duplicate product in price list") for (row_number,) in cursor.fetchall())
+        cursor.execute(f"""
+            DELETE FROM {STAGING_TABLE}
+            WHERE EXISTS (
+                SELECT 1 FROM {STAGING_TABLE} d
+                WHERE d.ProductName = {STAGING_TABLE}.ProductName
+                  AND d.RowNumber < {STAGING_TABLE}.RowNumber
+            )
+        """)
+        phase = mark("load", phase)
+
+        # 2. Unknown products.
+        if create_products:
+            created_at = timezone.now()
+            cursor.execute(
+                f"""
+                INSERT INTO {products} (ProductName, Category, UnitOfMeasure, DataEntryDate, Status)
+                SELECT s.ProductName, s.Category, s.UnitOfMeasure, %s, 'Active'
+                FROM {STAGING_TABLE} s
+                WHERE NOT EXISTS (SELECT 1 FROM {products} p WHERE p.ProductName = s.ProductName)
+                """,
+                [created_at],
+            )
+            summary["products_created"] = max(cursor.rowcount, 0)
+            if summary["products_created"]:
+                cdc.record_changes_from_query(
+                    cursor,
+                    products,
+                    cdc.INSERT,
+                    f"""
+                    SELECT p.ProductID AS RowID FROM {products} p
+                    JOIN {STAGING_TABLE} s ON s.ProductName = p.ProductName
+                    WHERE p.DataEntryDate = %s
+                    """,
+                    [created_at],
+                )
+
+        cursor.execute(f"""
+            UPDATE {STAGING_TABLE}
+            SET ProductID = (
+                SELECT p.ProductID FROM {products} p WHERE p.ProductName = {STAGING_TABLE}.ProductName
+            )
+        """)
+        cursor.execute(f"SELECT RowNumber FROM {STAGING_TABLE} WHERE ProductID IS NULL")
+        rejects.extend((row_number, "unknown product") for (row_number,) in cursor.fetchall())
+        cursor.execute(f"DELETE FROM {STAGING_TABLE} WHERE ProductID IS NULL")
+        phase = mark("products", phase)
+
+        # 3. Same-day corrections: the unique key allows one price per day.
+        #    The rows are logged before the update, which makes them match.
+        corrected = f"""
+            WHERE SupplierID = %s AND PriceEntryDate = %s
+              AND EXISTS (
+                SELECT 1 FROM {STAGING_TABLE} s
+                WHERE s.ProductID = {catalog}.ProductID AND s.DealersPrice <> {catalog}.DealersPrice
+              )
+        """
+        cdc.record_changes_from_query(
+            cursor,
+            catalog,
+            cdc.UPDATE,
+            f"SELECT SupplierProductCatalogID AS RowID FROM {catalog} {corrected}",
+            [supplier.pk, price_entry_date],
+        )
+        cursor.execute(
+            f"""
+            UPDATE {catalog}
+            SET DealersPrice = (
+                    SELECT s.DealersPrice FROM {STAGING_TABLE} s WHERE s.ProductID = {catalog}.ProductID
+                ),
+                SupplierProductCode = COALESCE((
+                    SELECT s.SupplierProductCode FROM {STAGING_TABLE} s
+                    WHERE s.ProductID = {catalog}.ProductID
+                ), SupplierProductCode)
+            {corrected}
+            """,
+            [supplier.pk, price_entry_date],
+        )
+        summary["updated"] = max(cursor.rowcount, 0)
+
+        # 4. New prices: no row for this date and different from the latest
+        #    earlier price (or no earlier price at all).
+        cursor.execute(f"SELECT COALESCE(MAX(SupplierProductCatalogID), 0) FROM {catalog}")
+        last_catalog_id = cursor.fetchone()[0]
+        cursor.execute(
+            f"""
+            INSERT INTO {catalog} (SupplierID, ProductID, DealersPrice, PriceEntryDate, SupplierProductCode)
+            SELECT %s, s.ProductID, s.DealersPrice, %s, s.SupplierProductCode
+            FROM {STAGING_TABLE} s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {catalog} c
+                WHERE c.SupplierID = %s AND c.ProductID = s.ProductID AND c.PriceEntryDate = %s
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM {catalog} c
+                WHERE c.SupplierID = %s AND c.ProductID = s.ProductID
+                  AND c.DealersPrice = s.DealersPrice
+                  AND c.PriceEntryDate = (
+                    SELECT MAX(l.PriceEntryDate) FROM {catalog} l
+                    WHERE l.SupplierID = c.SupplierID AND l.ProductID = c.ProductID
+                      AND l.PriceEntryDate < %s
+                  )
+            )
+            """,
+            [supplier.pk, price_entry_date, supplier.pk, price_entry_date, supplier.pk, price_entry_date],
+        )
+        summary["inserted"] = max(cursor.rowcount, 0)
+        if summary["inserted"]:
+            cdc.record_changes_from_query(
+                cursor,
+                catalog,
+                cdc.INSERT,
+                f"SELECT SupplierProductCatalogID AS RowID FROM {catalog} "
+                "WHERE SupplierID = %s AND SupplierProductCatalogID > %s",
+                [supplier.pk, last_catalog_id],
+            )
+
+        cursor.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}")
+        staged = cursor.fetchone()[0]
+        summary["unchanged"] = staged - summary["inserted"] - summary["updated"]
+        cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+        mark("diff", phase)
+
+        # Raw SQL bypasses model signals, so bump the report cache versions here.
+        changed_tables = []
+        if summary["products_created"]:
+            changed_tables.append(products)
+        if summary["inserted"] or summary["updated"]:
+            changed_tables.append(catalog)
+        bump_versions(*changed_tables)
+
+    rejects.sort()
+    summary["rejected"] = len(rejects)
+    summary["rejects"] = rejects[:MAX_REPORTED_REJECTS]
+    summary["timings"]["total"] = round(time.perf_counter() - started, 3)
+    return summary
@@ -0,0 +1,389 @@
+"""
+Database-backed background jobs.
+
+Long operations (price-list imports, report files) are queued as Job rows
+instead of running inside a request, and executed by `manage.py run_workers`,
+a pool of worker processes. No broker is needed: workers claim jobs from the
+Jobs table with a single conditional UPDATE, so two workers can never own the
+same job.
+
+A claimed job is leased for LEASE_SECONDS. While it runs, a thread of the
+worker renews the lease every third of that, so a task that blocks for a
+long time without reporting progress keeps its job; reporting progress
+renews it too. The renewal thread cannot write while the task holds a
+long transaction on SQLite, which locks the whole database, so a renewal
+that falls due is also made on the task's own connection, inside its
+transaction, before its next query. If a worker dies, its jobs become
+claimable again once the lease expires (the visibility timeout). A job that
+raises is retried with exponential backoff until it has been attempted
+max_attempts times.
+
+Tasks are functions registered by name in the TASK_MODULES (epicerieapp/
+tasks.py):
+
+    @jobs.task("import-price-list")
+    def import_price_list(context, path, supplier_id):
+        context.progress(0, message="Reading")
+        ...
+        return summary   # stored in Job.result
+
+    jobs.enqueue("import-price-list", path=..., supplier_id=..., priority=5)
+
+Configured with the JOBS setting:
+
+    JOBS = {
+        "LEASE_SECONDS": 60,
+        "POLL_SECONDS": 1.0,       # idle wait between claims
+        "CLAIM_BATCH": 10,         # jobs claimed per UPDATE
+        "RETRY_BACKOFF_SECONDS": 30,
+        "TASK_MODULES": ["epicerieapp.tasks"],
+        "OUTPUT_DIR": BASE_DIR / "db/job_output",   # files written by tasks
+    }
+"""
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+QUEUED = "Queued"
+RUNNING = "Running"
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+
+DEFAULTS = {
+    "LEASE_SECONDS": 60,
+    "POLL_SECONDS": 1.0,
+    "CLAIM_BATCH": 10,
+    "RETRY_BACKOFF_SECONDS": 30,
+    "TASK_MODULES": ["epicerieapp.tasks"],
+}
+
+# Progress updates closer together than this are not written
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+# Renewals per lease period while a job runs, so that one slow or failed
+# renewal does not let the lease expire
+LEASE_RENEWALS = 3
+
+_tasks = {}
+_tasks_loaded = False
+
+
+class JobError(Exception):
+    pass
+
+
+def job_settings():
+    return {**DEFAULTS, **getattr(settings, "JOBS", {})}
+
+
+# Registry
+
+def task(name):
+    """
+    Register the decorated function as the task ``name``.
+    """
+
+    def register(func):
+        _tasks[name] = func
+        return func
+
+    return register
+
+
+def get_task(name):
+    global _tasks_loaded
+    if not _tasks_loaded:
+        for module in job_settings()["TASK_MODULES"]:
+            import_module(module)
+        _tasks_loaded = True
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise JobError(f"Unknown task {name!r}") from None
+
+
+def enqueue(task_name, priority=0, max_attempts=3, delay=None, **payload):
+    get_task(task_name)
+    return Job.objects.create(
+        task=task_name,
+        payload=payload,
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta(0)),
+    )
+
+
+# Leasing
+
+def _claimable(now):
+    return Q(status=QUEUED, run_after__lte=now) | Q(
+        status=RUNNING, lease_expires__lt=now, attempts__lt=F("max_attempts")
+    )
+
+
+def fail_abandoned(now=None):
+    """
+    Fail Running jobs whose lease expired on their last allowed attempt.
+    """
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=RUNNING, lease_expires__lt=now, attempts__gte=F("max_attempts")
+    ).update(status=FAILED, finished_at=now, lease_owner=None, error="Lease expired on the last attempt.")
+
+
+def claim(worker, limit):
+    """
+    Lease up to ``limit`` jobs to ``worker`` and return them, highest
+    priority first. The UPDATE re-checks that each job is still claimable,
+    so jobs taken by another worker in the meantime are skipped.
+    """
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(_claimable(now))
+        .order_by("-priority", "run_after", "job_id")
+        .values_list("job_id", flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+    lease = f"{worker}:{uuid.uuid4().hex[:8]}"
+    claimed = Job.objects.filter(_claimable(now), job_id__in=candidates).update(
+        status=RUNNING,
+        lease_owner=lease,
+        lease_expires=now + timedelta(seconds=job_settings()["LEASE_SECONDS"]),
+        attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return []
+    return list(Job.objects.filter(lease_owner=lease).order_by("-priority", "run_after", "job_id"))
+
+
+def _owned(job):
+    return Job.objects.filter(job_id=job.job_id, lease_owner=job.lease_owner)
+
+
+def _lease_expiry():
+    return timezone.now() + timedelta(seconds=job_settings()["LEASE_SECONDS"])
+
+
+def _renew_lease(context, stop, interval):
+    try:
+        while not stop.wait(interval):
+            try:
+                context.renew()
+            except DatabaseError:
+                # Tried again at the next interval, or by the task's next query
+                close_old_connections()
+            if context.lease_lost:
+                return
+    finally:
+        connections.close_all()
+
+
+def _renew_before_queries(context, interval):
+    """
+    Execute wrapper for the task's connection to the Jobs database: renews
+    a lease that is due before the query runs, in the task's transaction.
+    """
+    renewing = False
+
+    def wrapper(execute, sql, params, many, execute_context):
+        nonlocal renewing
+        if not renewing and time.monotonic() - context.renewed_at >= interval:
+            renewing = True
+            try:
+                # A savepoint, so a failed renewal leaves the task's transaction usable
+                with transaction.atomic(using=execute_context["connection"].alias):
+                    context.renew()
+            except DatabaseError:
+                pass
+            finally:
+                renewing = False
+        return execute(sql, params, many, execute_context)
+
+    return wrapper
+
+
+@contextmanager
+def keeping_lease(context):
+    """
+    Renew the lease of ``context``'s job while the block runs, whether or
+    not the task reports progress: from a background thread, and from the
+    task's own queries to the Jobs database when a renewal is due.
+    """
+    stop = threading.Event()
+    interval = job_settings()["LEASE_SECONDS"] / LEASE_RENEWALS
+    thread = threading.Thread(
+        target=_renew_lease, args=(context, stop, interval), name=f"job-{context.job_id}-lease", daemon=True
+    )
+    thread.start()
+    try:
+        with connections[router.db_for_write(Job)].execute_wrapper(_renew_before_queries(context, interval)):
+            yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+class JobContext:
+    """
+    Passed to a task as its first argument for progress reporting.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.lease_lost = False
+        self.renewed_at = time.monotonic()
+        self._last_write = 0.0
+
+    @property
+    def job_id(self):
+        return self.job.job_id
+
+    def renew(self):
+        """
+        Extend the job's lease from now.
+        """
+        updated = _owned(self.job).update(lease_expires=_lease_expiry())
+        self.renewed_at = time.monotonic()
+        self.lease_lost = not updated
+
+    def progress(self, done, total=None, message=""):
+        """
+        Record progress (``done`` of ``total``, or a percentage when total is
+        None) and renew the lease.
+        """
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+        percent = done * 100 / total if total else done
+        updated = _owned(self.job).update(
+            progress=round(min(percent, 100), 1),
+            progress_message=message[:255],
+            lease_expires=_lease_expiry(),
+        )
+        self.renewed_at = now
+        self.lease_lost = not updated
+
+
+def run_job(job):
+    """
+    Run one claimed job and record its outcome. Returns the final status, or
+    None when the lease was lost to another worker.
+    """
+    now = timezone.now()
+    options = job_settings()
+    # Jobs claimed in a batch wait their turn; renew the lease before starting
+    if not _owned(job).update(
+        started_at=now, lease_expires=now + timedelta(seconds=options["LEASE_SECONDS"])
+    ):
+        return None
+
+    context = JobContext(job)
+    try:
+        with keeping_lease(context):
+            result = get_task(job.task)(context, **job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        finished = timezone.now()
+        if job.attempts >= job.max_attempts:
+            updates = {"status": FAILED, "finished_at": finished}
+        else:
+            backoff = options["RETRY_BACKOFF_SECONDS"] * 2 ** (job.attempts - 1)
+            updates = {"status": QUEUED, "run_after": finished + timedelta(seconds=backoff)}
+        updated = _owned(job).update(lease_owner=None, lease_expires=None, error=error, **updates)
+        return updates["status"] if updated else None
+
+    updated = _owned(job).update(
+        status=SUCCEEDED,
+        result=result,
+        progress=100,
+        finished_at=timezone.now(),
+        lease_owner=None,
+        lease_expires=None,
+    )
+    return SUCCEEDED if updated else None
+
+
+def job_status(job):
+    return {
+        "id": job.job_id,
+        "task": job.task,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.progress_message,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": job.result,
+        "error": job.error.strip().splitlines()[-1] if job.error else "",
+    }
+
+
+# Workers
+
+def worker_name(index):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def work(index, stop, claim_batch=None, exit_when_idle=False):
+    """
+    Claim and run jobs until ``stop`` (a multiprocessing Event) is set, or,
+    with exit_when_idle, until no job is claimable. Returns the number of
+    jobs run.
+    """
+    options = job_settings()
+    name = worker_name(index)
+    batch = claim_batch or options["CLAIM_BATCH"]
+    done = 0
+    while not stop.is_set():
+        close_old_connections()
+        fail_abandoned()
+        jobs = claim(name, batch)
+        if not jobs:
+            if exit_when_idle:
+                break
+            stop.wait(options["POLL_SECONDS"])
+            continue
+        for job in jobs:
+            if stop.is_set():
+                # Unstarted jobs go back to the queue for the next worker
+                _owned(job).update(
+                    status=QUEUED, lease_owner=None, lease_expires=None, attempts=F("attempts") - 1
+                )
+                continue
+            run_job(job)
+            done += 1
+    connections.close_all()
+    return done
+
+
+def worker_process(index, stop, claim_batch=None, exit_when_idle=False):
+    """
+    Entry point of a worker process started by run_workers.
+    """
+    import django
+
+    # Ctrl+C reaches the whole process group; the parent sets ``stop`` so
+    # the current job can finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+    # Forked workers must not reuse the parent's connections
+    connections.close_all()
+    return work(index, stop, claim_batch, exit_when_idle)
@@ -0,0 +1,187 @@
+import asyncio
+import io
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from epicerieapp.models import Product
+from epicerieapp.perf import summarize
+
+HOST = "localhost"
+
+
+def wsgi_request(application, path, query=""):
+    """
+    Call a WSGI application directly and return (status code, body size).
+    """
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": HOST,
+        "SERVER_PORT": "80",
+        "HTTP_HOST": HOST,
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append(int(status_line.split(" ", 1)[0]))
+
+    body = application(environ, start_response)
+    try:
+        size = sum(len(chunk) for chunk in body)
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+    return status[0], size
+
+
+async def asgi_request(application, path, query=""):
+    """
+    Call an ASGI application directly and return (status code, body size).
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", HOST.encode())],
+        "client": ("127.0.0.1", 0),
+        "server": (HOST, 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status = []
+    size = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await application(scope, receive, send)
+    disconnected.set()
+    return status[0], size
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the same catalog workload against the project's WSGI and ASGI applications "
+        "in-process and report throughput and latency percentiles per concurrency level. "
+        "Server overhead (gunicorn/uvicorn) is not included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", default="1,8,32,64", help="Comma-separated concurrency levels."
+        )
+        parser.add_argument("--requests", type=int, default=500, help="Requests per level and server.")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to request (repeatable); defaults to the catalog endpoints.",
+        )
+
+    def default_workload(self):
+        product_id = Product.objects.order_by("pk").values_list("pk", flat=True).first()
+        workload = [
+            (reverse("catalog_products"), ""),
+            (reverse("catalog_products"), "q=rice"),
+        ]
+        if product_id is not None:
+            workload += [
+                (reverse("catalog_product_detail", args=[product_id]), ""),
+                (reverse("catalog_price_history", args=[product_id]), ""),
+            ]
+        return workload
+
+    def run_wsgi(self, application, workload, concurrency, total):
+        requests = list(itertools.islice(itertools.cycle(workload), total))
+        latencies = []
+        errors = 0
+        total_bytes = 0
+
+        def timed(item):
+            started = time.perf_counter()
+            status, size = wsgi_request(application, *item)
+            return time.perf_counter() - started, status, size
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for latency, status, size in pool.map(timed, requests):
+                latencies.append(latency)
+                errors += status >= 400
+                total_bytes += size
+        return summarize(latencies, time.perf_counter() - started, errors, total_bytes)
+
+    async def run_asgi(self, application, workload, concurrency, total):
+        requests = iter(list(itertools.islice(itertools.cycle(workload), total)))
+        latencies = []
+        counters = {"errors": 0, "bytes": 0}
+
+        async def worker():
+            for item in requests:
+                started = time.perf_counter()
+                status, size = await asgi_request(application, *item)
+                latencies.append(time.perf_counter() - started)
+                counters["errors"] += status >= 400
+                counters["bytes"] += size
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return summarize(latencies, time.perf_counter() - started, counters["errors"], counters["bytes"])
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options["concurrency"].split(",") if level.strip()]
+        workload = [(path, "") for path in options["paths"]] if options["paths"] else self.default_workload()
+        total = options["requests"]
+
+        wsgi_app = get_wsgi_application()
+        asgi_app = get_asgi_application()
+
+        # Warm up both stacks (URL resolver, middleware, DB connection).
+        for path, query in workload:
+            wsgi_request(wsgi_app, path, query)
+            asyncio.run(asgi_request(asgi_app, path, query))
+
+        self.stdout.write(f"Workload: {', '.join(path + ('?' + query if query else '') for path, query in workload)}")
+        self.stdout.write(f"{'server':<6} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for level in levels:
+            results = {
+                "WSGI": self.run_wsgi(wsgi_app, workload, level, total),
+                "ASGI": asyncio.run(self.run_asgi(asgi_app, workload, level, total)),
+            }
+            for server, result in results.items():
+                self.stdout.write(
+                    f"{server:<6} {level:>5} {result['req_per_s']:>9} {result['p50_ms']:>9} "
+                    f"{result['p99_ms']:>9} {result['errors']:>7}"
+                )
@@ -0,0 +1,65 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count, Max
+
+from epicerieapp import jobs
+from epicerieapp.models import Job
+
+BENCH_TASK = "noop"
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure job throughput: queue thousands of no-op jobs and drain them with each "
+        "combination of worker count and claim batch size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=5000, help="Jobs per run.")
+        parser.add_argument("--workers", type=_int_list, default=[1, 2, 4], help="Comma-separated worker counts.")
+        parser.add_argument("--batch", type=_int_list, default=[1, 10, 50], help="Comma-separated claim batch sizes.")
+        parser.add_argument("--seconds", type=float, default=0, help="Time each job sleeps.")
+
+    def handle(self, *args, **options):
+        if Job.objects.filter(task=BENCH_TASK).exclude(status__in=[jobs.SUCCEEDED, jobs.FAILED]).exists():
+            self.stderr.write("Unfinished noop jobs exist; stop other workers before benchmarking.")
+            return
+
+        self.stdout.write(f"{'Workers':>7} {'Batch':>6} {'Jobs':>7} {'Seconds':>8} {'Jobs/s':>8} {'Max tries':>9}")
+        for workers in options["workers"]:
+            for batch in options["batch"]:
+                Job.objects.filter(task=BENCH_TASK).delete()
+                Job.objects.bulk_create(
+                    [Job(task=BENCH_TASK, payload={"seconds": options["seconds"]}) for _ in range(options["jobs"])],
+                    batch_size=1000,
+                )
+
+                connections.close_all()
+                stop = multiprocessing.Event()
+                started = time.perf_counter()
+                processes = [
+                    multiprocessing.Process(target=jobs.worker_process, args=(index, stop, batch, True))
+                    for index in range(workers)
+                ]
+                for process in processes:
+                    process.start()
+                for process in processes:
+                    process.join()
+                elapsed = time.perf_counter() - started
+
+                # Every job should have run exactly once
+                stats = Job.objects.filter(task=BENCH_TASK, status=jobs.SUCCEEDED).aggregate(
+                    done=Count("pk"), max_attempts=Max("attempts")
+                )
+                self.stdout.write(
+                    f"{workers:>7} {batch:>6} {stats['done']:>7} {elapsed:>8.2f} "
+                    f"{stats['done'] / elapsed:>8.0f} {stats['max_attempts'] or 0:>9}"
+                )
+        Job.objects.filter(task=BENCH_TASK).delete()
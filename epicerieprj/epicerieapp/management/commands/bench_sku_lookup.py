@@ -0,0 +1,84 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from epicerieapp.skus import SkuIndex
+
+UNITS = ["pc", "pack", "kg", "box", "bottle", "can", "sachet", "dozen"]
+STATUSES = ["Active", "Active", "Active", "Inactive", "Discontinued"]
+
+
+def synthetic_products(count, seed):
+    # Distinct EAN-13 style barcodes in the Philippine (480) prefix
+    rng = random.Random(seed)
+    for product_id in range(1, count + 1):
+        yield (
+            product_id,
+            f"480{product_id * 7919 % 10 ** 10:010d}",
+            f"Product {product_id} {rng.choice(UNITS)} {rng.randrange(1000)}g",
+            rng.choice(UNITS),
+            rng.choice(STATUSES),
+        )
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the in-memory SKU index (epicerieapp/skus.py) on synthetic products: "
+        "memory footprint of the index and latency percentiles of single lookups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--skus", type=int, default=1_000_000, help="Products in the index.")
+        parser.add_argument("--lookups", type=int, default=200_000, help="Timed lookups.")
+        parser.add_argument(
+            "--miss-ratio", type=float, default=0.1, help="Share of lookups for unknown SKUs."
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        count = options["skus"]
+        rng = random.Random(options["seed"])
+
+        self.stdout.write(f"Building an index of {count:,} SKUs...")
+        started = time.perf_counter()
+        tracemalloc.start()
+        index = SkuIndex()
+        for row in synthetic_products(count, options["seed"]):
+            index.put(*row)
+        for product_id in range(1, count + 1):
+            index.set_price(product_id, rng.randrange(500, 500_000))
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"Built in {build_seconds:.1f}s (traced). {len(index):,} SKUs, "
+            f"{memory / 2 ** 20:.1f} MiB, {memory / max(len(index), 1):.0f} bytes/SKU"
+        )
+
+        known = index.skus
+        queries = [
+            f"999{rng.randrange(10 ** 10):010d}" if rng.random() < options["miss_ratio"] else rng.choice(known)
+            for _ in range(options["lookups"])
+        ]
+        timings = []
+        found = 0
+        clock = time.perf_counter_ns
+        for sku in queries:
+            begin = clock()
+            record = index.get(sku)
+            timings.append(clock() - begin)
+            found += record is not None
+        timings.sort()
+
+        self.stdout.write(f"{'Lookups':>10} {'Found':>10} {'p50 us':>8} {'p99 us':>8} {'p99.9 us':>9} {'Max us':>8}")
+        self.stdout.write(
+            f"{len(timings):>10,} {found:>10,} {percentile(timings, 0.50) / 1000:>8.2f} "
+            f"{percentile(timings, 0.99) / 1000:>8.2f} {percentile(timings, 0.999) / 1000:>9.2f} "
+            f"{timings[-1] / 1000:>8.1f}"
+        )
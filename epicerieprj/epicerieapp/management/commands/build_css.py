@@ -0,0 +1,149 @@
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+
+from epicerieapp import assets, cssbuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Bundle and purge the stylesheets of every page template, extract per-page critical CSS "
+        "for inlining, and report bytes and render-blocking requests before and after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fold-chars",
+            type=int,
+            default=getattr(settings, "CSS_CRITICAL_FOLD_CHARS", 1500),
+            help="Characters of page content, after the header, treated as above the fold.",
+        )
+        parser.add_argument(
+            "--safelist",
+            action="append",
+            default=list(getattr(settings, "CSS_PURGE_SAFELIST", [])),
+            help="Class, id or element name to always keep (repeatable).",
+        )
+
+    def template_dirs(self):
+        return [Path(directory) for directory in settings.TEMPLATES[0]["DIRS"]]
+
+    def page_templates(self):
+        for directory in self.template_dirs():
+            for path in sorted(directory.rglob("*.html")):
+                name = path.relative_to(directory).as_posix()
+                if not name.startswith("includes/"):
+                    yield name
+
+    def used_tokens(self, safelist):
+        tokens = set(safelist)
+        for directory in self.template_dirs():
+            for path in directory.rglob("*.html"):
+                tokens |= cssbuild.extract_tokens(path.read_text(encoding="utf-8"))
+        dist = assets.static_dir() / assets.DIST_PREFIX
+        for path in assets.static_dir().rglob("*.js"):
+            if dist not in path.parents:
+                tokens |= cssbuild.extract_tokens(path.read_text(encoding="utf-8", errors="ignore"))
+        return tokens
+
+    def build_bundle(self, sources, tokens, out_dir):
+        target = f"{assets.DIST_PREFIX}/css/site.css"
+        # Font stylesheets rewritten by build_fonts replace their originals.
+        replacements = (assets.read_manifest("fonts") or {}).get("stylesheets", {})
+        nodes, licenses = [], []
+        for source in sources:
+            source = replacements.get(source, source)
+            path = finders.find(source)
+            if path is None:
+                raise CommandError(f"Stylesheet not found: {source}")
+            source_nodes, source_licenses = cssbuild.load_stylesheet(path, source, target)
+            nodes += source_nodes
+            licenses += source_licenses
+
+        purged = cssbuild.purge(nodes, tokens)
+        text = "\n".join(licenses + [cssbuild.serialize(purged)])
+        path = out_dir / f"site.{cssbuild.content_hash(text)}.css"
+        path.write_text(text, encoding="utf-8")
+        return purged, assets.static_path(path), cssbuild.sizes(text)
+
+    def handle(self, *args, **options):
+        out_dir = assets.dist_dir("css")
+        if out_dir.exists():
+            shutil.rmtree(out_dir)
+        (out_dir / "critical").mkdir(parents=True)
+
+        template_dirs = self.template_dirs()
+        pages = {}
+        for name in self.page_templates():
+            flattened = cssbuild.flatten_template(name, template_dirs)
+            sources = cssbuild.stylesheet_paths(flattened)
+            if sources:
+                pages[name] = (flattened, tuple(sources))
+        if not pages:
+            raise CommandError("No templates with a {% stylesheets %} block found.")
+
+        tokens = self.used_tokens(options["safelist"])
+        bundles = {}
+        before = {}
+        for sources in sorted({sources for _, sources in pages.values()}):
+            nodes, bundle_path, bundle_sizes = self.build_bundle(sources, tokens, out_dir)
+            bundles[sources] = (nodes, bundle_path)
+            source_sizes = [
+                cssbuild.sizes(Path(finders.find(source)).read_text(encoding="utf-8")) for source in sources
+            ]
+            before[bundle_path] = {
+                "stylesheets": list(sources),
+                "blocking_requests": len(sources),
+                "bytes": sum(size["bytes"] for size in source_sizes),
+                "gzip_bytes": sum(size["gzip_bytes"] for size in source_sizes),
+                "purged": bundle_sizes,
+            }
+
+        manifest_pages = {}
+        self.stdout.write(
+            f"{'page':<40} {'critical B':>10} {'gz':>7} {'bundle B':>10} {'gz':>7} {'blocking':>9}"
+        )
+        for name, (flattened, sources) in sorted(pages.items()):
+            nodes, bundle_path = bundles[sources]
+            fold_tokens = cssbuild.extract_tokens(cssbuild.above_the_fold(flattened, options["fold_chars"]))
+            critical = cssbuild.rewrite_urls(
+                cssbuild.serialize(cssbuild.purge(nodes, fold_tokens | set(options["safelist"]))),
+                bundle_path,
+                None,
+            )
+            slug = name.removesuffix(".html").replace("/", "-").replace(" ", "_")
+            critical_path = out_dir / "critical" / f"{slug}.{cssbuild.content_hash(critical)}.css"
+            critical_path.write_text(critical, encoding="utf-8")
+            critical_sizes = cssbuild.sizes(critical)
+            manifest_pages[name] = {
+                "bundle": bundle_path,
+                "critical": assets.static_path(critical_path),
+                "critical_bytes": critical_sizes["bytes"],
+            }
+            bundle_sizes = before[bundle_path]["purged"]
+            self.stdout.write(
+                f"{name:<40} {critical_sizes['bytes']:>10} {critical_sizes['gzip_bytes']:>7} "
+                f"{bundle_sizes['bytes']:>10} {bundle_sizes['gzip_bytes']:>7} "
+                f"{len(sources):>4} -> 0"
+            )
+
+        for bundle_path, metrics in before.items():
+            purged = metrics["purged"]
+            self.stdout.write(
+                f"{bundle_path}: {metrics['blocking_requests']} render-blocking stylesheets, "
+                f"{metrics['bytes']} B ({metrics['gzip_bytes']} B gzip) -> "
+                f"{purged['bytes']} B ({purged['gzip_bytes']} B gzip) loaded asynchronously, "
+                f"{100 - purged['bytes'] * 100 // max(metrics['bytes'], 1)}% smaller"
+            )
+
+        path = assets.write_manifest("css", {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "fold_chars": options["fold_chars"],
+            "pages": manifest_pages,
+            "bundles": before,
+        })
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(manifest_pages)} pages to {path}"))
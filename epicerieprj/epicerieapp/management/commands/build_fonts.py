@@ -0,0 +1,107 @@
+import posixpath
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from epicerieapp import assets, cssbuild, fonts
+
+# A code point every page's body text uses: faces covering it are the ones a
+# browser downloads for a typical page.
+BODY_TEXT_CODEPOINT = ord("a")
+
+
+class Command(BaseCommand):
+    help = (
+        "Subset the woff2 fonts of FONT_STYLESHEETS to the characters the site uses, rewrite "
+        "their @font-face rules with unicode-range and font-display, and list the faces to "
+        "preload. Run before build_css, which bundles the rewritten stylesheets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--display",
+            default=getattr(settings, "FONT_DISPLAY", fonts.DEFAULT_DISPLAY),
+            choices=["auto", "block", "swap", "fallback", "optional"],
+            help="font-display value for the rewritten rules.",
+        )
+
+    def handle(self, *args, **options):
+        out_dir = assets.dist_dir("fonts")
+        if out_dir.exists():
+            shutil.rmtree(out_dir)
+        out_dir.mkdir(parents=True)
+
+        codepoints = fonts.used_codepoints(settings.TEMPLATES[0]["DIRS"])
+        preload_keys = set(getattr(settings, "FONT_PRELOAD", fonts.DEFAULT_PRELOAD))
+        stylesheets, preload, faces_report = {}, [], []
+        before_page = after_page = 0
+
+        for stylesheet in getattr(settings, "FONT_STYLESHEETS", fonts.DEFAULT_STYLESHEETS):
+            try:
+                faces, others = fonts.read_font_faces(stylesheet)
+            except fonts.FontBuildError as exc:
+                raise CommandError(str(exc)) from exc
+
+            rules = []
+            target_dir = assets.static_path(out_dir)
+            for face in faces:
+                label = f"{face.family} {face.weight} {face.style} ({face.source})"
+                if face.path is None:
+                    self.stderr.write(f"{stylesheet}: {label}: font file missing, rule dropped")
+                    continue
+                try:
+                    result = fonts.subset_face(face, codepoints, out_dir)
+                except fonts.FontBuildError as exc:
+                    raise CommandError(str(exc)) from exc
+                original = Path(face.path).stat().st_size
+                page_text = BODY_TEXT_CODEPOINT in face.unicode_range
+                before_page += original if page_text else 0
+                if result is None:
+                    self.stdout.write(f"{stylesheet}: {label}: no used glyphs, rule dropped")
+                    faces_report.append({"face": label, "bytes": original, "subset_bytes": 0})
+                    continue
+
+                path, covered, size = result
+                rules.append(fonts.font_face_css(
+                    face, posixpath.relpath(path, target_dir), covered, options["display"]
+                ))
+                faces_report.append({"face": label, "bytes": original, "subset_bytes": size})
+                if BODY_TEXT_CODEPOINT in covered:
+                    after_page += size
+                    if face.key in preload_keys and path not in preload:
+                        preload.append(path)
+                self.stdout.write(
+                    f"{stylesheet}: {label}: {original} B -> {size} B, {len(covered)} glyphs, "
+                    f"unicode-range {fonts.format_unicode_range(covered)}"
+                )
+
+            css = "".join(rules) + cssbuild.serialize(others)
+            built = out_dir / f"{Path(stylesheet).stem}.{cssbuild.content_hash(css)}.css"
+            built.write_text(css, encoding="utf-8")
+            stylesheets[stylesheet] = assets.static_path(built)
+
+        metrics = {
+            "font_bytes_before": sum(face["bytes"] for face in faces_report),
+            "font_bytes_after": sum(face["subset_bytes"] for face in faces_report),
+            "page_font_bytes_before": before_page,
+            "page_font_bytes_after": after_page,
+            "preloaded_faces": len(preload),
+        }
+        path = assets.write_manifest("fonts", {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "display": options["display"],
+            "stylesheets": stylesheets,
+            "preload": preload,
+            "faces": faces_report,
+            "metrics": metrics,
+        })
+
+        self.stdout.write(
+            f"All faces: {metrics['font_bytes_before']} B -> {metrics['font_bytes_after']} B. "
+            f"Latin text page: {before_page} B -> {after_page} B of fonts. "
+            f"{len(preload)} face(s) preloaded, fetched with the HTML instead of after the CSS is parsed."
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}; run build_css to bundle the subset fonts."))
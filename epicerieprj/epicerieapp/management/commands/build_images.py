@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from epicerieapp import assets, images
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized WebP/JPEG variants of the static images for each breakpoint, "
+        "for the {% responsive_image %} tag. Unchanged images are skipped by source hash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--width",
+            action="append",
+            type=int,
+            dest="widths",
+            help="Breakpoint width in pixels (repeatable); defaults to IMAGE_BREAKPOINTS.",
+        )
+        parser.add_argument(
+            "--format",
+            action="append",
+            dest="formats",
+            choices=sorted(images.FORMAT_OPTIONS),
+            help="Output format (repeatable); defaults to IMAGE_FORMATS.",
+        )
+        parser.add_argument("--force", action="store_true", help="Rebuild variants of unchanged images.")
+
+    def handle(self, *args, **options):
+        widths = sorted(options["widths"] or images.breakpoints())
+        formats = options["formats"] or images.output_formats()
+        previous = (assets.read_manifest("images") or {}).get("images", {})
+
+        entries = {}
+        built = 0
+        for static_path, path in images.find_sources():
+            try:
+                entry, changed = images.build_variants(
+                    static_path, path, widths, formats, previous.get(static_path), options["force"]
+                )
+            except images.ImageBuildError as exc:
+                raise CommandError(str(exc)) from exc
+            entries[static_path] = entry
+            built += changed
+
+            self.stdout.write(
+                f"{static_path} {entry['width']}x{entry['height']} {entry['source_bytes'] // 1024} KB"
+                f"{'' if changed else ' (unchanged)'}"
+            )
+            for fmt, group in entry["variants"].items():
+                sizes = ", ".join(
+                    f"{variant['width']}w {variant['bytes'] // 1024} KB "
+                    f"({variant['bytes'] * 100 // entry['source_bytes']}%)"
+                    for variant in group
+                )
+                self.stdout.write(f"  {fmt:<5} {sizes}")
+
+        manifest = {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "breakpoints": widths,
+            "images": entries,
+        }
+        path = assets.write_manifest("images", manifest)
+        removed = images.prune(manifest)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(entries)} images, {built} rebuilt, {removed} stale variants removed; manifest {path}"
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from epicerieapp import cdc
+from epicerieapp.models import ChangeLog, ConsumerOffset
+
+
+class Command(BaseCommand):
+    help = (
+        "Inspect and maintain the catalog change log (see epicerieapp/cdc.py): `status` "
+        "shows each consumer's offset and lag, `prune` deletes entries all consumers have "
+        "read, `reset <consumer>` makes a consumer start over."
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="action", required=True)
+        subcommands.add_parser("status", help="Show consumer offsets and lag.")
+        subcommands.add_parser("prune", help="Delete old entries every consumer has processed.")
+        reset = subcommands.add_parser("reset", help="Reset a consumer's offset.")
+        reset.add_argument("consumer")
+        reset.add_argument("--to", type=int, default=0, help="Change id to restart after (default: 0).")
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        if action == "prune":
+            self.stdout.write(f"Deleted {cdc.prune()} change log entries.")
+        elif action == "reset":
+            ConsumerOffset.objects.update_or_create(
+                consumer=options["consumer"], defaults={"last_change_id": options["to"]}
+            )
+            self.stdout.write(f"{options['consumer']} will resume after change {options['to']}.")
+        else:
+            latest = ChangeLog.objects.aggregate(latest=Max("change_id"))["latest"] or 0
+            self.stdout.write(f"Latest change: {latest}, entries kept: {ChangeLog.objects.count()}")
+            self.stdout.write(f"{'Consumer':<30} {'Offset':>10} {'Pending':>8} {'Oldest s':>9}")
+            for offset in ConsumerOffset.objects.order_by("consumer"):
+                pending, age = cdc.Consumer(offset.consumer).lag()
+                self.stdout.write(f"{offset.consumer:<30} {offset.last_change_id:>10} {pending:>8} {age:>9.0f}")
@@ -0,0 +1,53 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand
+
+from epicerieapp.dedup import find_duplicates
+from epicerieapp.models import Supplier
+
+
+class Command(BaseCommand):
+    help = "Find suppliers entered more than once and write a merge-candidate report (CSV)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="supplier_merge_candidates.csv", help="CSV report path.")
+        parser.add_argument(
+            "--threshold", type=float, default=0.85, help="Minimum similarity score (0-1) to report."
+        )
+        parser.add_argument(
+            "--active-only", action="store_true", help="Ignore suppliers with Inactive status."
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        suppliers = Supplier.objects.order_by("supplier_id")
+        if options["active_only"]:
+            suppliers = suppliers.filter(status="Active")
+        rows = suppliers.values_list("supplier_id", "tin", "company_name").iterator(chunk_size=5000)
+
+        matches, stats = find_duplicates(rows, threshold=options["threshold"])
+
+        with open(options["output"], "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow([
+                "Group", "Score", "Reasons",
+                "Keep SupplierID", "Keep TIN", "Keep Company Name",
+                "Merge SupplierID", "Merge TIN", "Merge Company Name",
+            ])
+            for match in matches:
+                # Suggest keeping the older (lower id) record.
+                keep, merge = sorted((match["left"], match["right"]), key=lambda record: record.supplier_id)
+                writer.writerow([
+                    match["group"], match["score"], "; ".join(match["reasons"]),
+                    keep.supplier_id, keep.tin, keep.company_name,
+                    merge.supplier_id, merge.tin, merge.company_name,
+                ])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Suppliers: {stats['suppliers']}\n"
+            f"Candidate pairs: {stats['candidate_pairs']} of {stats['all_pairs']} possible\n"
+            f"Merge candidates: {stats['matches']} in {stats['groups']} groups\n"
+            f"Report written to {options['output']} in {elapsed:.1f}s"
+        )
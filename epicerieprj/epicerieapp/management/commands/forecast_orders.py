@@ -0,0 +1,73 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from epicerieapp import forecasting, sharding
+
+
+def synthetic_demand(products, days, seed):
+    # Poisson sales around a per-product rate with a weekend peak
+    rng = np.random.default_rng(seed)
+    rates = rng.gamma(0.6, 4.0, size=products)
+    weekly = np.array([0.9, 0.85, 0.9, 1.0, 1.1, 1.3, 0.95])
+    return rng.poisson(rates[:, None] * weekly[np.arange(days) % 7]).astype(float)
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast demand for every active product of each branch and replace the branch's "
+        "suggested orders (see epicerieapp/forecasting.py). With --bench, times the forecast "
+        "on synthetic sales instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("branches", nargs="*", help="Branch codes; defaults to all of BRANCHES.")
+        parser.add_argument(
+            "--bench", type=int, metavar="PRODUCTS", help="Forecast this many synthetic products."
+        )
+
+    def handle(self, *args, **options):
+        if options["bench"]:
+            self.bench(options["bench"])
+            return
+        branch_list = options["branches"] or sharding.branches()
+        try:
+            for branch in branch_list:
+                sharding.branch_alias(branch)
+        except sharding.BranchError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(f"{'Branch':<12} {'Products':>9} {'Suggested':>10} {'Seconds':>8}")
+        for branch, summary in forecasting.run_forecast(branch_list).items():
+            self.stdout.write(
+                f"{branch:<12} {summary['products']:>9} {summary['suggested']:>10} {summary['seconds']:>8}"
+            )
+
+    def bench(self, products):
+        options = forecasting.forecast_settings()
+        days = options["HISTORY_DAYS"]
+        block = options["PRODUCT_BLOCK"]
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"{products:,} products x {days} days, blocks of {block:,}")
+
+        elapsed = 0.0
+        suggested = 0
+        peak = 0
+        for offset in range(0, products, block):
+            size = min(block, products - offset)
+            demand = synthetic_demand(size, days, seed=offset)
+            on_hand = rng.uniform(0, 60, size=size)
+            tracemalloc.start()
+            started = time.perf_counter()
+            result = forecasting.forecast(demand, 0, on_hand, options)
+            elapsed += time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            suggested += int(np.count_nonzero(result["suggested_quantity"]))
+
+        self.stdout.write(
+            f"Forecast in {elapsed:.2f}s ({products / elapsed:,.0f} products/s), "
+            f"peak {peak / 2 ** 20:.1f} MiB per block, {suggested:,} to reorder"
+        )
@@ -0,0 +1,68 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from epicerieapp.importers import COLUMN_ALIASES, PriceListError, import_price_list
+from epicerieapp.models import Supplier
+
+
+class Command(BaseCommand):
+    help = "Import a supplier price list (.csv or .xlsx), adding only prices that changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Price list file.")
+        parser.add_argument("--supplier", required=True, help="SupplierID or TIN of the supplier.")
+        parser.add_argument("--date", help="PriceEntryDate as YYYY-MM-DD (default: today).")
+        parser.add_argument(
+            "--no-create-products",
+            action="store_true",
+            help="Reject lines for unknown products instead of creating them.",
+        )
+        for field in COLUMN_ALIASES:
+            parser.add_argument(
+                f"--{field.replace('_', '-')}-column",
+                dest=f"{field}_column",
+                help=f"Header of the {field.replace('_', ' ')} column, if not auto-detected.",
+            )
+
+    def handle(self, *args, **options):
+        supplier_key = options["supplier"]
+        suppliers = Supplier.objects.filter(tin=supplier_key)
+        if supplier_key.isdigit():
+            suppliers = suppliers | Supplier.objects.filter(pk=int(supplier_key))
+        supplier = suppliers.first()
+        if supplier is None:
+            raise CommandError(f"Supplier '{supplier_key}' not found.")
+
+        price_entry_date = None
+        if options["date"]:
+            try:
+                price_entry_date = datetime.date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD.")
+
+        overrides = {
+            field: options[f"{field}_column"] for field in COLUMN_ALIASES if options[f"{field}_column"]
+        }
+        try:
+            summary = import_price_list(
+                options["path"],
+                supplier,
+                price_entry_date=price_entry_date,
+                column_overrides=overrides,
+                create_products=not options["no_create_products"],
+            )
+        except (OSError, PriceListError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f"\n--- Price List Import Summary ({supplier.company_name}) ---")
+        self.stdout.write(f"Rows Read: {summary['rows_read']}")
+        self.stdout.write(f"Prices Inserted: {summary['inserted']}")
+        self.stdout.write(f"Same-day Prices Updated: {summary['updated']}")
+        self.stdout.write(f"Unchanged: {summary['unchanged']}")
+        self.stdout.write(f"Products Created: {summary['products_created']}")
+        self.stdout.write(f"Rejected: {summary['rejected']}")
+        for row_number, reason in summary["rejects"]:
+            self.stdout.write(f"  row {row_number}: {reason}")
+        timings = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in summary["timings"].items())
+        self.stdout.write(f"Timings: {timings}")
@@ -0,0 +1,237 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from epicerieapp.perf import summarize
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "perf" / "loadtest_baseline.json"
+
+# Metrics compared against the baseline; a route fails when any of them grows
+# by more than the threshold.
+REGRESSION_METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+
+
+def discover_routes(patterns=None, namespace=""):
+    """
+    Yield (route name, pattern, parameter names) for every named URL pattern.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == "admin":
+                continue
+            child_namespace = f"{namespace}{pattern.namespace}:" if pattern.namespace else namespace
+            yield from discover_routes(pattern.url_patterns, child_namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f"{namespace}{pattern.name}", pattern, list(pattern.pattern.converters)
+
+
+def fetch(url, timeout):
+    """
+    GET ``url`` and return (latency seconds, status code, body bytes).
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": "epicerie-loadtest"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            size = len(response.read())
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        size = len(exc.read())
+        status = exc.code
+    except (urllib.error.URLError, OSError):
+        return time.perf_counter() - started, 0, 0
+    return time.perf_counter() - started, status, size
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test every named route against a local server, record latency percentiles, "
+        "req/s and bytes, and compare them with a stored JSON baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", help="Server to test, e.g. http://127.0.0.1:8000.")
+        parser.add_argument(
+            "--start-server",
+            action="store_true",
+            help="Start 'manage.py runserver' on a free port for the duration of the run.",
+        )
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per route.")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (s).")
+        parser.add_argument(
+            "--route", action="append", dest="routes", help="Only test these route names (repeatable)."
+        )
+        parser.add_argument(
+            "--route-args",
+            action="append",
+            default=[],
+            help="Arguments for a parameterized route: name=arg1,arg2 (repeatable).",
+        )
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file.")
+        parser.add_argument(
+            "--save-baseline", action="store_true", help="Write the results as the new baseline."
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=20.0,
+            help="Allowed latency growth over the baseline, in percent.",
+        )
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=5.0,
+            help="Ignore regressions smaller than this many milliseconds (noise floor).",
+        )
+        parser.add_argument("--output", help="Also write the results JSON to this file.")
+
+    def build_targets(self, options):
+        route_args = {}
+        for item in options["route_args"]:
+            name, _, args = item.partition("=")
+            route_args[name] = [arg for arg in args.split(",") if arg]
+
+        targets = []
+        for name, pattern, params in discover_routes():
+            if options["routes"] and name not in options["routes"]:
+                continue
+            if params and name not in route_args:
+                self.stdout.write(f"skip {name}: needs {', '.join(params)} (use --route-args {name}=...)")
+                continue
+            targets.append((name, reverse(name, args=route_args.get(name, []))))
+        if not targets:
+            raise CommandError("No routes to test.")
+        return targets
+
+    def start_server(self):
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, str(Path(settings.BASE_DIR) / "manage.py"), "runserver", "--noreload",
+             f"127.0.0.1:{port}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                return server, f"http://127.0.0.1:{port}"
+            except OSError:
+                if server.poll() is not None:
+                    break
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError("Local server did not start.")
+
+    def run_route(self, base_url, path, options):
+        """
+        Summary of ``options["requests"]`` GETs of ``path``, or None if the
+        route does not accept GET (POST-only views answer 405).
+        """
+        url = base_url.rstrip("/") + path
+        if fetch(url, options["timeout"])[1] == 405:  # warm-up
+            return None
+        latencies = []
+        errors = 0
+        total_bytes = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = pool.map(lambda _: fetch(url, options["timeout"]), range(options["requests"]))
+            for latency, status, size in results:
+                latencies.append(latency)
+                total_bytes += size
+                errors += not 200 <= status < 400
+        return summarize(latencies, time.perf_counter() - started, errors, total_bytes)
+
+    def compare(self, results, baseline, options):
+        regressions = []
+        for name, current in results.items():
+            previous = baseline.get("routes", {}).get(name)
+            if not previous:
+                continue
+            for metric in REGRESSION_METRICS:
+                before, after = previous.get(metric), current[metric]
+                if not before:
+                    continue
+                growth = (after - before) / before * 100
+                if growth > options["threshold"] and after - before > options["min_delta_ms"]:
+                    regressions.append(f"{name} {metric}: {before} -> {after} ms (+{growth:.0f}%)")
+        return regressions
+
+    def handle(self, *args, **options):
+        if not options["base_url"] and not options["start_server"]:
+            raise CommandError("Pass --base-url or --start-server.")
+        targets = self.build_targets(options)
+
+        server = None
+        base_url = options["base_url"]
+        if options["start_server"]:
+            server, base_url = self.start_server()
+
+        results = {}
+        try:
+            self.stdout.write(f"{'route':<28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KB':>8} {'err':>5}")
+            for name, path in targets:
+                result = self.run_route(base_url, path, options)
+                if result is None:
+                    self.stdout.write(f"skip {name}: does not accept GET")
+                    continue
+                result["path"] = path
+                results[name] = result
+                self.stdout.write(
+                    f"{name:<28} {result['req_per_s']:>8} {result['p50_ms']:>8} {result['p95_ms']:>8} "
+                    f"{result['p99_ms']:>8} {result['bytes'] // 1024:>8} {result['errors']:>5}"
+                )
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+        report = {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "concurrency": options["concurrency"],
+            "requests_per_route": options["requests"],
+            "routes": results,
+        }
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Baseline saved to {baseline_path}")
+            return
+
+        failed = [name for name, result in results.items() if result["errors"]]
+        if baseline_path.exists():
+            regressions = self.compare(results, json.loads(baseline_path.read_text()), options)
+            for line in regressions:
+                self.stderr.write(f"REGRESSION {line}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} latency regression(s) beyond {options['threshold']}%.")
+            self.stdout.write(f"No regressions against {baseline_path}")
+        else:
+            self.stdout.write(f"No baseline at {baseline_path}; run with --save-baseline to create one.")
+        if failed:
+            raise CommandError(f"Routes returned errors: {', '.join(failed)}")
@@ -0,0 +1,105 @@
+import csv
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from epicerieapp.purchasing import PLAN_TIME_LIMIT, TIME_LIMIT, PurchaseError, optimize, plan_purchase
+
+
+def synthetic_order(lines, suppliers, seed):
+    """
+    (costs, minimums) for a random order: each supplier prices about a third
+    of the products around a list price, and most have a minimum order value.
+    """
+    rng = np.random.default_rng(seed)
+    list_prices = rng.uniform(20, 2000, size=lines)
+    quantities = rng.integers(1, 50, size=lines)
+    offered = rng.random((lines, suppliers)) < 0.3
+    unit_prices = np.where(offered, list_prices[:, None] * rng.uniform(0.8, 1.25, size=(lines, suppliers)), np.inf)
+    costs = unit_prices * quantities[:, None]
+    order_value = costs.min(axis=1, initial=np.inf).sum()
+    minimums = np.where(rng.random(suppliers) < 0.8, rng.uniform(0, 0.05, size=suppliers) * order_value, 0)
+    return costs, minimums
+
+
+class Command(BaseCommand):
+    help = (
+        "Plan whom to order from (see epicerieapp/purchasing.py). Reads a CSV of "
+        "ProductID,Quantity lines and prints the cheapest supplier assignment that meets "
+        "every supplier's minimum order value. With --bench, times the solver on random "
+        "orders instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="CSV file with ProductID and Quantity columns.")
+        parser.add_argument(
+            "--time-limit", type=float,
+            help=f"Seconds for the whole plan (default {PLAN_TIME_LIMIT}), or for the solver "
+            f"with --bench (default {TIME_LIMIT}).",
+        )
+        parser.add_argument("--bench", action="store_true", help="Time the solver on synthetic orders.")
+        parser.add_argument("--lines", type=int, default=1000)
+        parser.add_argument("--suppliers", type=int, default=200)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options["bench"]:
+            self.bench(options)
+        elif options["path"]:
+            time_limit = options["time_limit"]
+            self.plan(options["path"], PLAN_TIME_LIMIT if time_limit is None else time_limit)
+        else:
+            raise CommandError("Give an order CSV, or --bench.")
+
+    def plan(self, path, time_limit):
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as file:
+                rows = [
+                    (row["ProductID"], row["Quantity"]) for row in csv.DictReader(file)
+                    if row.get("ProductID")
+                ]
+            plan = plan_purchase(rows, time_limit)
+        except (OSError, KeyError, ValueError, ArithmeticError, PurchaseError) as exc:
+            raise CommandError(f"Cannot plan {path}: {exc}") from exc
+
+        self.stdout.write(f"{'Supplier':<40} {'Lines':>6} {'Minimum':>12} {'Total':>14}")
+        for order in plan["suppliers"]:
+            self.stdout.write(
+                f"{order['company_name'][:40]:<40} {len(order['lines']):>6} "
+                f"{order['minimum_order_value']:>12,.2f} {order['total']:>14,.2f}"
+            )
+        self.stdout.write(
+            f"Total {plan['total']:,.2f} (cheapest per line, ignoring minimums: "
+            f"{plan['lower_bound']:,.2f}) in {plan['seconds']}s"
+        )
+        for line in plan["unavailable"]:
+            self.stdout.write(self.style.WARNING(
+                f"Product {line['product_id']} ({line['product_name']}): no active supplier can supply it "
+                f"within the minimum order values"
+            ))
+
+    def bench(self, options):
+        time_limit = TIME_LIMIT if options["time_limit"] is None else options["time_limit"]
+        self.stdout.write(
+            f"{options['lines']} lines x {options['suppliers']} suppliers, "
+            f"time limit {time_limit}s"
+        )
+        self.stdout.write(f"{'Run':>4} {'Seconds':>8} {'Suppliers':>10} {'Cost':>14} {'Over bound':>11}")
+        for run in range(options["runs"]):
+            costs, minimums = synthetic_order(options["lines"], options["suppliers"], seed=run)
+            started = time.perf_counter()
+            assignment = optimize(costs, minimums, time_limit)
+            seconds = time.perf_counter() - started
+
+            assigned = assignment >= 0
+            line_costs = costs[np.flatnonzero(assigned), assignment[assigned]]
+            cost = line_costs.sum()
+            spend = np.bincount(assignment[assigned], weights=line_costs, minlength=len(minimums))
+            if ((spend > 0) & (spend < minimums - 1e-6)).any():
+                raise CommandError(f"Run {run}: a supplier is below its minimum.")
+            bound = costs[assigned].min(axis=1).sum()
+            self.stdout.write(
+                f"{run:>4} {seconds:>8.3f} {np.count_nonzero(spend):>10} {cost:>14,.2f} "
+                f"{(cost / bound - 1) * 100:>10.2f}%"
+            )
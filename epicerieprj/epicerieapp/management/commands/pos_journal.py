@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from epicerieapp import pos_journal, sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Inspect and recover POS sale journals (see epicerieapp/pos_journal.py): `status` "
+        "lists each writer's journal with its pending sales, and sales the branch database "
+        "rejected; `upload` takes over journals left by processes that stopped and uploads "
+        "them to the branch databases."
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="action", required=True)
+        subcommands.add_parser("status", help="List the journals and their pending sales.")
+        upload = subcommands.add_parser("upload", help="Upload orphaned journals.")
+        upload.add_argument(
+            "branches", nargs="*", help="Branch codes to recover; defaults to all of BRANCHES."
+        )
+
+    def handle(self, *args, **options):
+        if options["action"] == "status":
+            self.show_status()
+        else:
+            self.upload(options["branches"] or sharding.branches())
+
+    def show_status(self):
+        root = pos_journal.journal_settings()["DIR"]
+        limit = pos_journal.journal_settings()["ORPHAN_SECONDS"]
+        self.stdout.write(f"{'Branch':<12} {'Writer':<48} {'Heartbeat':>10} {'Pending':>8}")
+        for branch in sharding.branches():
+            if not (root / branch).is_dir():
+                continue
+            for directory in sorted((root / branch).iterdir()):
+                age = pos_journal.heartbeat_age(directory)
+                if age is None:
+                    continue
+                state = f"{age:.0f}s" + (" (orphan)" if age > limit else "")
+                pending = pos_journal.count_pending(directory)
+                self.stdout.write(f"{branch:<12} {directory.name:<48} {state:>10} {pending:>8}")
+            rejected = pos_journal.count_dead_letters(branch)
+            if rejected:
+                self.stdout.write(self.style.WARNING(
+                    f"{branch}: {rejected} rejected sale(s) in {pos_journal.dead_letter_path(branch)}"
+                ))
+
+    def upload(self, branch_list):
+        capture = pos_journal.SaleCapture()
+        for branch in branch_list:
+            try:
+                sharding.branch_alias(branch)
+            except sharding.BranchError as exc:
+                raise CommandError(str(exc)) from exc
+            capture.adopt_orphans(branch)
+        journals = len(capture.adopted)
+        try:
+            inserted = capture.upload_all()
+        except DatabaseError as exc:
+            raise CommandError(f"Upload failed; the journals are kept for the next attempt: {exc}") from exc
+        self.stdout.write(self.style.SUCCESS(f"{journals} orphaned journal(s) uploaded, {inserted} new sale(s)."))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from epicerieapp import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default database into the report replica with the SQLite online backup "
+        "API. With --every, keep refreshing at that interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every", type=float, metavar="SECONDS", help="Refresh repeatedly, this many seconds apart."
+        )
+        parser.add_argument("--status", action="store_true", help="Show the replica's lag and exit.")
+
+    def handle(self, *args, **options):
+        if options["status"]:
+            status = replicas.replica_status()
+            if status["snapshot"] is None:
+                self.stdout.write(f"Replica {status['alias']!r} has not been refreshed yet.")
+            else:
+                self.stdout.write(
+                    f"Replica {status['alias']!r}: lag {status['lag_seconds']}s "
+                    f"(max {status['max_lag_seconds']}s), {status['snapshot']['bytes'] // 1024} KB, "
+                    f"copied in {status['snapshot']['seconds']}s"
+                )
+            return
+
+        while True:
+            try:
+                state = replicas.refresh_replica()
+            except replicas.ReplicaError as exc:
+                if not options["every"]:
+                    raise CommandError(str(exc)) from exc
+                # E.g. report queries kept the replica locked; the views fall
+                # back to the primary if the lag grows too large meanwhile
+                self.stderr.write(f"{exc}; retrying in {options['every']}s")
+                time.sleep(options["every"])
+                continue
+            self.stdout.write(f"Replica refreshed: {state['bytes'] // 1024} KB in {state['seconds']}s")
+            if not options["every"]:
+                break
+            time.sleep(max(options["every"] - state["seconds"], 0))
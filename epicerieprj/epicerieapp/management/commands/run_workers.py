@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from epicerieapp import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs (see epicerieapp/jobs.py) in a pool of worker processes. "
+        "Ctrl+C or SIGTERM lets running jobs finish, then exits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 2, help="Worker processes (default: CPU count)."
+        )
+        parser.add_argument("--batch", type=int, help="Jobs claimed per UPDATE (default: JOBS['CLAIM_BATCH']).")
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        stop = multiprocessing.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write("Stopping after the current jobs...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        # Children must open their own database connections
+        connections.close_all()
+        processes = {}
+
+        def start(index):
+            process = multiprocessing.Process(
+                target=jobs.worker_process,
+                args=(index, stop, options["batch"], options["burst"]),
+                name=f"job-worker-{index}",
+            )
+            process.start()
+            processes[index] = process
+
+        for index in range(options["workers"]):
+            start(index)
+        self.stdout.write(f"Started {options['workers']} worker(s).")
+
+        while processes:
+            for index, process in list(processes.items()):
+                process.join(timeout=1)
+                if process.is_alive():
+                    continue
+                del processes[index]
+                if process.exitcode != 0 and not stop.is_set():
+                    # Its claimed jobs are retried once their leases expire
+                    self.stderr.write(f"Worker {index} exited with code {process.exitcode}; restarting.")
+                    start(index)
+        self.stdout.write(self.style.SUCCESS("All workers stopped."))
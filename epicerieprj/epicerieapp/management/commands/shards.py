@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+from epicerieapp import sharding
+from epicerieapp.models import Sale, StockMovement
+
+
+def _database_file(alias):
+    settings_dict = connections[alias].settings_dict
+    if settings_dict["ENGINE"] != "django.db.backends.sqlite3":
+        return None
+    return Path(settings_dict["NAME"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage the per-branch databases (see epicerieapp/sharding.py): `list` shows each "
+        "branch's database, pending migrations and row counts; `migrate` creates missing "
+        "branch databases and applies migrations to them."
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="action", required=True)
+        subcommands.add_parser("list", help="Show the branch databases.")
+        migrate = subcommands.add_parser("migrate", help="Create and migrate branch databases.")
+        migrate.add_argument(
+            "branches", nargs="*", help="Branch codes to migrate; defaults to all of BRANCHES."
+        )
+
+    def handle(self, *args, **options):
+        if not sharding.branches():
+            raise CommandError("No branches configured; add branch codes to the BRANCHES setting.")
+        if options["action"] == "list":
+            self.list_branches()
+        else:
+            self.migrate_branches(options["branches"] or sharding.branches())
+
+    def list_branches(self):
+        self.stdout.write(f"{'Branch':<12} {'Alias':<20} {'Size':>10} {'Pending':>8} {'Sales':>8} {'Movements':>10}")
+        for branch in sharding.branches():
+            alias = sharding.branch_alias(branch)
+            path = _database_file(alias)
+            if path is not None and not path.exists():
+                self.stdout.write(f"{branch:<12} {alias:<20} {'missing':>10}")
+                continue
+            executor = MigrationExecutor(connections[alias])
+            pending = len(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+            size = f"{path.stat().st_size // 1024} KB" if path is not None else "-"
+            if pending:
+                counts = ("-", "-")
+            else:
+                counts = (Sale.objects.using(alias).count(), StockMovement.objects.using(alias).count())
+            self.stdout.write(f"{branch:<12} {alias:<20} {size:>10} {pending:>8} {counts[0]:>8} {counts[1]:>10}")
+
+    def migrate_branches(self, branch_list):
+        for branch in branch_list:
+            try:
+                alias = sharding.branch_alias(branch)
+            except sharding.BranchError as exc:
+                raise CommandError(str(exc)) from exc
+            path = _database_file(alias)
+            created = path is not None and not path.exists()
+            if created:
+                path.parent.mkdir(parents=True, exist_ok=True)
+            self.stdout.write(f"{branch}: {'creating' if created else 'migrating'} {alias}")
+            call_command("migrate", database=alias, interactive=False, verbosity=0)
+        self.stdout.write(self.style.SUCCESS(f"{len(branch_list)} branch database(s) up to date."))
@@ -0,0 +1,131 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends import django as django_backend
+
+from . import perf
+
+route_stats = perf.RouteStats(getattr(settings, "PERF_RING_SIZE", 500))
+
+_template_timing_installed = False
+
+
+def _install_template_timing():
+    """
+    Time every top-level template render. Included templates are rendered
+    inside the outer render, so they are not counted twice.
+    """
+    global _template_timing_installed
+    if _template_timing_installed:
+        return
+    original_render = django_backend.Template.render
+
+    def timed_render(self, context=None, request=None):
+        metrics = perf.current_metrics()
+        if metrics is None:
+            return original_render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+    django_backend.Template.render = timed_render
+    _template_timing_installed = True
+
+
+def _sql_timer(metrics):
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.sql_count += 1
+            metrics.sql_time += time.perf_counter() - started
+
+    return wrapper
+
+
+def _install_sql_timers(stack, metrics):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(_sql_timer(metrics)))
+
+
+class PerformanceMiddleware:
+    """
+    Records wall time, SQL query count/time, template render time, cache
+    hits/misses and response size for every request, aggregated per URL name
+    for the /__perf/ dashboard, and reports them in a Server-Timing header.
+
+    Sync and async: under ASGI, async views are awaited directly instead of
+    the chain being run in a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        _install_template_timing()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token = perf.start_request_metrics()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _install_sql_timers(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            perf.end_request_metrics(token)
+        return self.record(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics, token = perf.start_request_metrics()
+        started = time.perf_counter()
+        try:
+            # Connections belong to a thread, and an async request's ORM
+            # calls run in its thread-sensitive executor thread: the timers
+            # are installed and removed there
+            stack = ExitStack()
+            try:
+                await sync_to_async(_install_sql_timers)(stack, metrics)
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            perf.end_request_metrics(token)
+        return self.record(request, response, metrics, time.perf_counter() - started)
+
+    def record(self, request, response, metrics, wall):
+        size = None if response.streaming else len(response.content)
+        match = request.resolver_match
+        route_stats.add(
+            match.view_name if match else "<unresolved>",
+            {
+                "wall_ms": wall * 1000,
+                "sql_count": metrics.sql_count,
+                "sql_ms": metrics.sql_time * 1000,
+                "template_ms": metrics.template_time * 1000,
+                "cache_hits": metrics.cache_hits,
+                "cache_misses": metrics.cache_misses,
+                "fragment_saved_ms": metrics.fragment_saved_time * 1000,
+                "bytes": size,
+                "status": response.status_code,
+            },
+        )
+        response["Server-Timing"] = ", ".join([
+            f"app;dur={wall * 1000:.1f}",
+            f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries"',
+            f"tpl;dur={metrics.template_time * 1000:.1f}",
+            f'chrome;dur={metrics.fragment_saved_time * 1000:.1f};desc="render time saved"',
+            f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+        ])
+        return response
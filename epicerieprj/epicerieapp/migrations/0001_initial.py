@@ -0,0 +1,123 @@
+# Generated by Django 5.1.6 on 2026-10-19 14:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('product_id', models.AutoField(db_column='ProductID', primary_key=True, serialize=False)),
+                ('product_name', models.CharField(db_column='ProductName', max_length=255, unique=True)),
+                ('product_description', models.TextField(blank=True, db_column='ProductDescription', null=True)),
+                ('category', models.CharField(blank=True, db_column='Category', db_index=True, max_length=100, null=True)),
+                ('unit_of_measure', models.CharField(blank=True, db_column='UnitOfMeasure', max_length=50, null=True)),
+                ('data_entry_date', models.DateTimeField(auto_now_add=True, db_column='DataEntryDate')),
+                ('status', models.CharField(choices=[('Active', 'Active'), ('Inactive', 'Inactive'), ('Discontinued', 'Discontinued')], db_column='Status', default='Active', max_length=15)),
+            ],
+            options={
+                'db_table': 'Products',
+            },
+        ),
+        migrations.CreateModel(
+            name='Supplier',
+            fields=[
+                ('supplier_id', models.AutoField(db_column='SupplierID', primary_key=True, serialize=False)),
+                ('tin', models.CharField(db_column='TIN', max_length=20, unique=True)),
+                ('company_name', models.CharField(db_column='CompanyName', db_index=True, max_length=255)),
+                ('date_created', models.DateTimeField(auto_now_add=True, db_column='DateCreated')),
+                ('date_updated', models.DateTimeField(auto_now=True, db_column='DateUpdated')),
+                ('status', models.CharField(choices=[('Active', 'Active'), ('Inactive', 'Inactive')], db_column='Status', default='Active', max_length=10)),
+            ],
+            options={
+                'db_table': 'Suppliers',
+            },
+        ),
+        migrations.CreateModel(
+            name='ContactPerson',
+            fields=[
+                ('contact_person_id', models.AutoField(db_column='ContactPersonID', primary_key=True, serialize=False)),
+                ('first_name', models.CharField(db_column='FirstName', max_length=100)),
+                ('last_name', models.CharField(db_column='LastName', max_length=100)),
+                ('position', models.CharField(blank=True, db_column='Position', max_length=100, null=True)),
+                ('email_address', models.CharField(blank=True, db_column='EmailAddress', max_length=255, null=True)),
+                ('contact_number', models.CharField(blank=True, db_column='ContactNumber', max_length=50, null=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True, db_column='DateCreated')),
+                ('date_updated', models.DateTimeField(auto_now=True, db_column='DateUpdated')),
+                ('status', models.CharField(choices=[('Active', 'Active'), ('Inactive', 'Inactive')], db_column='Status', default='Active', max_length=10)),
+                ('supplier', models.ForeignKey(db_column='SupplierID', on_delete=django.db.models.deletion.CASCADE, related_name='contact_persons', to='epicerieapp.supplier')),
+            ],
+            options={
+                'db_table': 'ContactPersons',
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierAddress',
+            fields=[
+                ('address_id', models.AutoField(db_column='AddressID', primary_key=True, serialize=False)),
+                ('address_line1', models.CharField(db_column='AddressLine1', max_length=255)),
+                ('address_line2', models.CharField(blank=True, db_column='AddressLine2', max_length=255, null=True)),
+                ('barangay', models.CharField(blank=True, db_column='Barangay', max_length=100, null=True)),
+                ('city_municipality', models.CharField(db_column='CityMunicipality', max_length=100)),
+                ('province', models.CharField(db_column='Province', max_length=100)),
+                ('postal_code', models.CharField(blank=True, db_column='PostalCode', max_length=10, null=True)),
+                ('address_type', models.CharField(blank=True, db_column='AddressType', max_length=50, null=True)),
+                ('is_primary', models.BooleanField(db_column='IsPrimary', default=False)),
+                ('supplier', models.ForeignKey(db_column='SupplierID', on_delete=django.db.models.deletion.CASCADE, related_name='addresses', to='epicerieapp.supplier')),
+            ],
+            options={
+                'db_table': 'SupplierAddresses',
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierContactNumber',
+            fields=[
+                ('contact_number_id', models.AutoField(db_column='ContactNumberID', primary_key=True, serialize=False)),
+                ('contact_number', models.CharField(db_column='ContactNumber', max_length=50)),
+                ('number_type', models.CharField(blank=True, db_column='NumberType', max_length=50, null=True)),
+                ('is_primary', models.BooleanField(db_column='IsPrimary', default=False)),
+                ('supplier', models.ForeignKey(db_column='SupplierID', on_delete=django.db.models.deletion.CASCADE, related_name='contact_numbers', to='epicerieapp.supplier')),
+            ],
+            options={
+                'db_table': 'SupplierContactNumbers',
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierEmailAddress',
+            fields=[
+                ('email_address_id', models.AutoField(db_column='EmailAddressID', primary_key=True, serialize=False)),
+                ('email_address', models.CharField(db_column='EmailAddress', max_length=255)),
+                ('email_type', models.CharField(blank=True, db_column='EmailType', max_length=50, null=True)),
+                ('is_primary', models.BooleanField(db_column='IsPrimary', default=False)),
+                ('supplier', models.ForeignKey(db_column='SupplierID', on_delete=django.db.models.deletion.CASCADE, related_name='email_addresses', to='epicerieapp.supplier')),
+            ],
+            options={
+                'db_table': 'SupplierEmailAddresses',
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierProductCatalog',
+            fields=[
+                ('supplier_product_catalog_id', models.AutoField(db_column='SupplierProductCatalogID', primary_key=True, serialize=False)),
+                ('dealers_price', models.DecimalField(db_column='DealersPrice', decimal_places=2, max_digits=12)),
+                ('price_entry_date', models.DateField(db_column='PriceEntryDate', db_index=True)),
+                ('supplier_product_code', models.CharField(blank=True, db_column='SupplierProductCode', max_length=100, null=True)),
+                ('notes', models.TextField(blank=True, db_column='Notes', null=True)),
+                ('product', models.ForeignKey(db_column='ProductID', on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='epicerieapp.product')),
+                ('supplier', models.ForeignKey(db_column='SupplierID', on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='epicerieapp.supplier')),
+            ],
+            options={
+                'db_table': 'SupplierProductCatalog',
+                'indexes': [models.Index(fields=['supplier', 'product'], name='IX_SPC_SupplierProduct')],
+                'constraints': [models.UniqueConstraint(fields=('supplier', 'product', 'price_entry_date'), name='UK_SupplierProductCatalog')],
+            },
+        ),
+    ]
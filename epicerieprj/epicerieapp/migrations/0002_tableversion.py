@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table_name', models.CharField(db_column='TableName', max_length=128, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(db_column='Version', default=0)),
+            ],
+            options={
+                'db_table': 'TableVersions',
+            },
+        ),
+    ]
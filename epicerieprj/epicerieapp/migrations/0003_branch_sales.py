@@ -0,0 +1,53 @@
+# Generated by Django 5.1.6 on 2026-10-19 14:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0002_tableversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sale',
+            fields=[
+                ('sale_id', models.AutoField(db_column='SaleID', primary_key=True, serialize=False)),
+                ('sold_at', models.DateTimeField(db_column='SoldAt', db_index=True, default=django.utils.timezone.now)),
+                ('total', models.DecimalField(db_column='Total', decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'db_table': 'Sales',
+            },
+        ),
+        migrations.CreateModel(
+            name='SaleLine',
+            fields=[
+                ('sale_line_id', models.AutoField(db_column='SaleLineID', primary_key=True, serialize=False)),
+                ('product_id', models.IntegerField(db_column='ProductID', db_index=True)),
+                ('quantity', models.DecimalField(db_column='Quantity', decimal_places=3, max_digits=12)),
+                ('unit_price', models.DecimalField(db_column='UnitPrice', decimal_places=2, max_digits=12)),
+                ('sale', models.ForeignKey(db_column='SaleID', on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='epicerieapp.sale')),
+            ],
+            options={
+                'db_table': 'SaleLines',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('stock_movement_id', models.AutoField(db_column='StockMovementID', primary_key=True, serialize=False)),
+                ('product_id', models.IntegerField(db_column='ProductID', db_index=True)),
+                ('quantity', models.DecimalField(db_column='Quantity', decimal_places=3, max_digits=12)),
+                ('reason', models.CharField(choices=[('Receipt', 'Receipt'), ('Sale', 'Sale'), ('Adjustment', 'Adjustment'), ('Transfer', 'Transfer')], db_column='Reason', max_length=20)),
+                ('moved_at', models.DateTimeField(db_column='MovedAt', db_index=True, default=django.utils.timezone.now)),
+                ('sale', models.ForeignKey(blank=True, db_column='SaleID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='epicerieapp.sale')),
+            ],
+            options={
+                'db_table': 'StockMovements',
+            },
+        ),
+    ]
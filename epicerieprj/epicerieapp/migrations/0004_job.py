@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0003_branch_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('job_id', models.BigAutoField(db_column='JobID', primary_key=True, serialize=False)),
+                ('task', models.CharField(db_column='Task', max_length=100)),
+                ('payload', models.JSONField(db_column='Payload', default=dict)),
+                ('status', models.CharField(choices=[('Queued', 'Queued'), ('Running', 'Running'), ('Succeeded', 'Succeeded'), ('Failed', 'Failed')], db_column='Status', default='Queued', max_length=10)),
+                ('priority', models.IntegerField(db_column='Priority', default=0)),
+                ('attempts', models.PositiveIntegerField(db_column='Attempts', default=0)),
+                ('max_attempts', models.PositiveIntegerField(db_column='MaxAttempts', default=3)),
+                ('run_after', models.DateTimeField(db_column='RunAfter', default=django.utils.timezone.now)),
+                ('lease_owner', models.CharField(blank=True, db_column='LeaseOwner', max_length=100, null=True)),
+                ('lease_expires', models.DateTimeField(blank=True, db_column='LeaseExpires', null=True)),
+                ('progress', models.FloatField(db_column='Progress', default=0)),
+                ('progress_message', models.CharField(blank=True, db_column='ProgressMessage', default='', max_length=255)),
+                ('result', models.JSONField(blank=True, db_column='Result', null=True)),
+                ('error', models.TextField(blank=True, db_column='Error', default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='CreatedAt')),
+                ('started_at', models.DateTimeField(blank=True, db_column='StartedAt', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, db_column='FinishedAt', null=True)),
+            ],
+            options={
+                'db_table': 'Jobs',
+                'indexes': [models.Index(fields=['status', '-priority', 'run_after'], name='IX_Jobs_Claim')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0004_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumerOffset',
+            fields=[
+                ('consumer', models.CharField(db_column='Consumer', max_length=100, primary_key=True, serialize=False)),
+                ('last_change_id', models.BigIntegerField(db_column='LastChangeID', default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_column='UpdatedAt')),
+            ],
+            options={
+                'db_table': 'ConsumerOffsets',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('change_id', models.BigAutoField(db_column='ChangeID', primary_key=True, serialize=False)),
+                ('table_name', models.CharField(db_column='TableName', max_length=128)),
+                ('row_id', models.IntegerField(db_column='RowID')),
+                ('operation', models.CharField(choices=[('I', 'Insert'), ('U', 'Update'), ('D', 'Delete')], db_column='Operation', max_length=1)),
+                ('changed_at', models.DateTimeField(db_column='ChangedAt', default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'ChangeLog',
+                'indexes': [models.Index(fields=['table_name', 'change_id'], name='IX_ChangeLog_TableName')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0005_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, db_column='SKU', max_length=64, null=True, unique=True),
+        ),
+    ]
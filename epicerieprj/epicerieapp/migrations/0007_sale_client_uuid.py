@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0006_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, db_column='ClientUUID', null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0007_sale_client_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='minimum_order_value',
+            field=models.DecimalField(db_column='MinimumOrderValue', decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epicerieapp', '0008_supplier_minimum_order_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestedOrder',
+            fields=[
+                ('suggested_order_id', models.AutoField(db_column='SuggestedOrderID', primary_key=True, serialize=False)),
+                ('product_id', models.IntegerField(db_column='ProductID', unique=True)),
+                ('daily_demand', models.DecimalField(db_column='DailyDemand', decimal_places=3, max_digits=12)),
+                ('lead_time_demand', models.DecimalField(db_column='LeadTimeDemand', decimal_places=3, max_digits=12)),
+                ('safety_stock', models.DecimalField(db_column='SafetyStock', decimal_places=3, max_digits=12)),
+                ('reorder_point', models.DecimalField(db_column='ReorderPoint', decimal_places=3, max_digits=12)),
+                ('on_hand', models.DecimalField(db_column='OnHand', decimal_places=3, max_digits=12)),
+                ('suggested_quantity', models.DecimalField(db_column='SuggestedQuantity', decimal_places=3, max_digits=12)),
+                ('computed_at', models.DateTimeField(db_column='ComputedAt')),
+            ],
+            options={
+                'db_table': 'SuggestedOrders',
+            },
+        ),
+    ]
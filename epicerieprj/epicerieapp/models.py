@@ -1,3 +1,316 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+# Catalog models mirror the tables in
+# _documentation/Database Study/database/mssql_schema.sql (same table and
+# column names) so raw SQL written for the desktop client also runs here.
+
+SUPPLIER_STATUS_CHOICES = [
+    ("Active", "Active"),
+    ("Inactive", "Inactive"),
+]
+
+PRODUCT_STATUS_CHOICES = [
+    ("Active", "Active"),
+    ("Inactive", "Inactive"),
+    ("Discontinued", "Discontinued"),
+]
+
+JOB_STATUS_CHOICES = [
+    ("Queued", "Queued"),
+    ("Running", "Running"),
+    ("Succeeded", "Succeeded"),
+    ("Failed", "Failed"),
+]
+
+CHANGE_OPERATION_CHOICES = [
+    ("I", "Insert"),
+    ("U", "Update"),
+    ("D", "Delete"),
+]
+
+STOCK_MOVEMENT_REASON_CHOICES = [
+    ("Receipt", "Receipt"),
+    ("Sale", "Sale"),
+    ("Adjustment", "Adjustment"),
+    ("Transfer", "Transfer"),
+]
+
+
+class Supplier(models.Model):
+    supplier_id = models.AutoField(primary_key=True, db_column="SupplierID")
+    tin = models.CharField(max_length=20, unique=True, db_column="TIN")
+    company_name = models.CharField(max_length=255, db_index=True, db_column="CompanyName")
+    date_created = models.DateTimeField(auto_now_add=True, db_column="DateCreated")
+    date_updated = models.DateTimeField(auto_now=True, db_column="DateUpdated")
+    status = models.CharField(
+        max_length=10, choices=SUPPLIER_STATUS_CHOICES, default="Active", db_column="Status"
+    )
+    # Smallest order total the supplier accepts; 0 for no minimum
+    minimum_order_value = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, db_column="MinimumOrderValue"
+    )
+
+    class Meta:
+        db_table = "Suppliers"
+
+    def __str__(self):
+        return self.company_name
+
+
+class SupplierAddress(models.Model):
+    address_id = models.AutoField(primary_key=True, db_column="AddressID")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, related_name="addresses", db_column="SupplierID"
+    )
+    address_line1 = models.CharField(max_length=255, db_column="AddressLine1")
+    address_line2 = models.CharField(max_length=255, null=True, blank=True, db_column="AddressLine2")
+    barangay = models.CharField(max_length=100, null=True, blank=True, db_column="Barangay")
+    city_municipality = models.CharField(max_length=100, db_column="CityMunicipality")
+    province = models.CharField(max_length=100, db_column="Province")
+    postal_code = models.CharField(max_length=10, null=True, blank=True, db_column="PostalCode")
+    address_type = models.CharField(max_length=50, null=True, blank=True, db_column="AddressType")
+    is_primary = models.BooleanField(default=False, db_column="IsPrimary")
+
+    class Meta:
+        db_table = "SupplierAddresses"
+
+
+class SupplierContactNumber(models.Model):
+    contact_number_id = models.AutoField(primary_key=True, db_column="ContactNumberID")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, related_name="contact_numbers", db_column="SupplierID"
+    )
+    contact_number = models.CharField(max_length=50, db_column="ContactNumber")
+    number_type = models.CharField(max_length=50, null=True, blank=True, db_column="NumberType")
+    is_primary = models.BooleanField(default=False, db_column="IsPrimary")
+
+    class Meta:
+        db_table = "SupplierContactNumbers"
+
+
+class SupplierEmailAddress(models.Model):
+    email_address_id = models.AutoField(primary_key=True, db_column="EmailAddressID")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, related_name="email_addresses", db_column="SupplierID"
+    )
+    email_address = models.CharField(max_length=255, db_column="EmailAddress")
+    email_type = models.CharField(max_length=50, null=True, blank=True, db_column="EmailType")
+    is_primary = models.BooleanField(default=False, db_column="IsPrimary")
+
+    class Meta:
+        db_table = "SupplierEmailAddresses"
+
+
+class ContactPerson(models.Model):
+    contact_person_id = models.AutoField(primary_key=True, db_column="ContactPersonID")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, related_name="contact_persons", db_column="SupplierID"
+    )
+    first_name = models.CharField(max_length=100, db_column="FirstName")
+    last_name = models.CharField(max_length=100, db_column="LastName")
+    position = models.CharField(max_length=100, null=True, blank=True, db_column="Position")
+    email_address = models.CharField(max_length=255, null=True, blank=True, db_column="EmailAddress")
+    contact_number = models.CharField(max_length=50, null=True, blank=True, db_column="ContactNumber")
+    date_created = models.DateTimeField(auto_now_add=True, db_column="DateCreated")
+    date_updated = models.DateTimeField(auto_now=True, db_column="DateUpdated")
+    status = models.CharField(
+        max_length=10, choices=SUPPLIER_STATUS_CHOICES, default="Active", db_column="Status"
+    )
+
+    class Meta:
+        db_table = "ContactPersons"
+
+
+class Product(models.Model):
+    product_id = models.AutoField(primary_key=True, db_column="ProductID")
+    product_name = models.CharField(max_length=255, unique=True, db_column="ProductName")
+    # Barcode or store SKU scanned at the counter (see skus.py)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, db_column="SKU")
+    product_description = models.TextField(null=True, blank=True, db_column="ProductDescription")
+    category = models.CharField(max_length=100, null=True, blank=True, db_index=True, db_column="Category")
+    unit_of_measure = models.CharField(max_length=50, null=True, blank=True, db_column="UnitOfMeasure")
+    data_entry_date = models.DateTimeField(auto_now_add=True, db_column="DataEntryDate")
+    status = models.CharField(
+        max_length=15, choices=PRODUCT_STATUS_CHOICES, default="Active", db_column="Status"
+    )
+
+    class Meta:
+        db_table = "Products"
+
+    def __str__(self):
+        return self.product_name
+
+
+class SupplierProductCatalog(models.Model):
+    supplier_product_catalog_id = models.AutoField(primary_key=True, db_column="SupplierProductCatalogID")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, related_name="catalog_entries", db_column="SupplierID"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="catalog_entries", db_column="ProductID"
+    )
+    dealers_price = models.DecimalField(max_digits=12, decimal_places=2, db_column="DealersPrice")
+    price_entry_date = models.DateField(db_index=True, db_column="PriceEntryDate")
+    supplier_product_code = models.CharField(
+        max_length=100, null=True, blank=True, db_column="SupplierProductCode"
+    )
+    notes = models.TextField(null=True, blank=True, db_column="Notes")
+
+    class Meta:
+        db_table = "SupplierProductCatalog"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["supplier", "product", "price_entry_date"],
+                name="UK_SupplierProductCatalog",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["supplier", "product"], name="IX_SPC_SupplierProduct"),
+        ]
+
+
+class TableVersion(models.Model):
+    """
+    Change counter per table, bumped whenever rows in that table change.
+    Used to invalidate cached reports (see report_cache.py).
+    """
+
+    table_name = models.CharField(max_length=128, primary_key=True, db_column="TableName")
+    version = models.BigIntegerField(default=0, db_column="Version")
+
+    class Meta:
+        db_table = "TableVersions"
+
+
+class ChangeLog(models.Model):
+    """
+    One insert, update or delete of a Suppliers, Products or
+    SupplierProductCatalog row. Written by model signals and,
+    for the desktop client's writes, by the triggers in mssql_schema.sql;
+    read through cdc.Consumer.
+    """
+
+    change_id = models.BigAutoField(primary_key=True, db_column="ChangeID")
+    table_name = models.CharField(max_length=128, db_column="TableName")
+    row_id = models.IntegerField(db_column="RowID")
+    operation = models.CharField(max_length=1, choices=CHANGE_OPERATION_CHOICES, db_column="Operation")
+    changed_at = models.DateTimeField(default=timezone.now, db_column="ChangedAt")
+
+    class Meta:
+        db_table = "ChangeLog"
+        indexes = [
+            models.Index(fields=["table_name", "change_id"], name="IX_ChangeLog_TableName"),
+        ]
+
+
+class ConsumerOffset(models.Model):
+    """
+    The last ChangeLog entry a named consumer has processed.
+    """
+
+    consumer = models.CharField(max_length=100, primary_key=True, db_column="Consumer")
+    last_change_id = models.BigIntegerField(default=0, db_column="LastChangeID")
+    updated_at = models.DateTimeField(auto_now=True, db_column="UpdatedAt")
+
+    class Meta:
+        db_table = "ConsumerOffsets"
+
+
+class Job(models.Model):
+    """
+    A background job run by `manage.py run_workers` (see jobs.py). A worker
+    owns a Running job until LeaseExpires; after that another worker may
+    claim it again.
+    """
+
+    job_id = models.BigAutoField(primary_key=True, db_column="JobID")
+    task = models.CharField(max_length=100, db_column="Task")
+    payload = models.JSONField(default=dict, db_column="Payload")
+    status = models.CharField(max_length=10, choices=JOB_STATUS_CHOICES, default="Queued", db_column="Status")
+    priority = models.IntegerField(default=0, db_column="Priority")
+    attempts = models.PositiveIntegerField(default=0, db_column="Attempts")
+    max_attempts = models.PositiveIntegerField(default=3, db_column="MaxAttempts")
+    run_after = models.DateTimeField(default=timezone.now, db_column="RunAfter")
+    lease_owner = models.CharField(max_length=100, null=True, blank=True, db_column="LeaseOwner")
+    lease_expires = models.DateTimeField(null=True, blank=True, db_column="LeaseExpires")
+    progress = models.FloatField(default=0, db_column="Progress")
+    progress_message = models.CharField(max_length=255, blank=True, default="", db_column="ProgressMessage")
+    result = models.JSONField(null=True, blank=True, db_column="Result")
+    error = models.TextField(blank=True, default="", db_column="Error")
+    created_at = models.DateTimeField(auto_now_add=True, db_column="CreatedAt")
+    started_at = models.DateTimeField(null=True, blank=True, db_column="StartedAt")
+    finished_at = models.DateTimeField(null=True, blank=True, db_column="FinishedAt")
+
+    class Meta:
+        db_table = "Jobs"
+        indexes = [
+            models.Index(fields=["status", "-priority", "run_after"], name="IX_Jobs_Claim"),
+        ]
+
+
+# Branch transactional models. These live in each branch's own database, not
+# in the central one (see sharding.py), so they refer to catalog products by
+# ProductID rather than by foreign key.
+
+class Sale(models.Model):
+    sale_id = models.AutoField(primary_key=True, db_column="SaleID")
+    # Assigned by the counter when the sale is captured; makes uploads from
+    # the POS journal idempotent (see pos_journal.py)
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True, db_column="ClientUUID")
+    sold_at = models.DateTimeField(default=timezone.now, db_index=True, db_column="SoldAt")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_column="Total")
+
+    class Meta:
+        db_table = "Sales"
+
+
+class SaleLine(models.Model):
+    sale_line_id = models.AutoField(primary_key=True, db_column="SaleLineID")
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name="lines", db_column="SaleID")
+    product_id = models.IntegerField(db_index=True, db_column="ProductID")
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, db_column="Quantity")
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2, db_column="UnitPrice")
+
+    class Meta:
+        db_table = "SaleLines"
+
+
+class StockMovement(models.Model):
+    """
+    A change in a branch's stock of one product: positive quantities come
+    in, negative ones go out. On-hand stock is the sum per product.
+    """
+
+    stock_movement_id = models.AutoField(primary_key=True, db_column="StockMovementID")
+    product_id = models.IntegerField(db_index=True, db_column="ProductID")
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, db_column="Quantity")
+    reason = models.CharField(max_length=20, choices=STOCK_MOVEMENT_REASON_CHOICES, db_column="Reason")
+    sale = models.ForeignKey(
+        Sale, on_delete=models.SET_NULL, null=True, blank=True, related_name="stock_movements", db_column="SaleID"
+    )
+    moved_at = models.DateTimeField(default=timezone.now, db_index=True, db_column="MovedAt")
+
+    class Meta:
+        db_table = "StockMovements"
+
+
+class SuggestedOrder(models.Model):
+    """
+    A product a branch should reorder, written by the nightly forecast (see
+    forecasting.py). Quantities are in the product's unit of measure; demand
+    and forecasts are per day.
+    """
+
+    suggested_order_id = models.AutoField(primary_key=True, db_column="SuggestedOrderID")
+    product_id = models.IntegerField(unique=True, db_column="ProductID")
+    daily_demand = models.DecimalField(max_digits=12, decimal_places=3, db_column="DailyDemand")
+    lead_time_demand = models.DecimalField(max_digits=12, decimal_places=3, db_column="LeadTimeDemand")
+    safety_stock = models.DecimalField(max_digits=12, decimal_places=3, db_column="SafetyStock")
+    reorder_point = models.DecimalField(max_digits=12, decimal_places=3, db_column="ReorderPoint")
+    on_hand = models.DecimalField(max_digits=12, decimal_places=3, db_column="OnHand")
+    suggested_quantity = models.DecimalField(max_digits=12, decimal_places=3, db_column="SuggestedQuantity")
+    computed_at = models.DateTimeField(db_column="ComputedAt")
+
+    class Meta:
+        db_table = "SuggestedOrders"
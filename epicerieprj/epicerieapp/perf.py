@@ -0,0 +1,151 @@
+"""
+Latency statistics shared by the benchmark and load-test commands, and the
+per-request metrics collected by PerformanceMiddleware.
+"""
+import bisect
+import contextvars
+import math
+import threading
+from collections import deque
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list (``pct`` in 0-100).
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0, total_bytes=0):
+    """
+    Throughput and latency percentiles (milliseconds) for one run.
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "req_per_s": round(count / elapsed, 1) if elapsed else 0.0,
+        "bytes": total_bytes,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+# Per-request metrics
+
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+
+class RequestMetrics:
+    """
+    Counters filled in while one request is processed.
+    """
+
+    __slots__ = (
+        "sql_count", "sql_time", "template_time", "cache_hits", "cache_misses", "fragment_saved_time"
+    )
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.fragment_saved_time = 0.0
+
+
+_current_metrics = contextvars.ContextVar("perf_request_metrics", default=None)
+
+
+def start_request_metrics():
+    metrics = RequestMetrics()
+    return metrics, _current_metrics.set(metrics)
+
+
+def end_request_metrics(token):
+    _current_metrics.reset(token)
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+def record_cache_lookup(hit):
+    """
+    Count a cache hit or miss against the current request, if any.
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def record_fragment_saved(seconds):
+    """
+    Add the estimated render time saved by a cached template fragment.
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.fragment_saved_time += seconds
+
+
+class RouteStats:
+    """
+    Recent request samples per URL name, each kept in a bounded ring buffer.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, route, sample):
+        with self.lock:
+            ring = self.samples.get(route)
+            if ring is None:
+                ring = self.samples[route] = deque(maxlen=self.size)
+            ring.append(sample)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def snapshot(self):
+        """
+        Per-route aggregates and a latency histogram over the samples in the
+        ring buffers.
+        """
+        with self.lock:
+            rings = {route: list(ring) for route, ring in self.samples.items()}
+
+        routes = {}
+        for route, samples in sorted(rings.items()):
+            wall = sorted(sample["wall_ms"] for sample in samples)
+            count = len(samples)
+            histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+            for value in wall:
+                histogram[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, value)] += 1
+            routes[route] = {
+                "samples": count,
+                "p50_ms": round(percentile(wall, 50), 2),
+                "p95_ms": round(percentile(wall, 95), 2),
+                "p99_ms": round(percentile(wall, 99), 2),
+                "avg_sql_count": round(sum(s["sql_count"] for s in samples) / count, 1),
+                "avg_sql_ms": round(sum(s["sql_ms"] for s in samples) / count, 2),
+                "avg_template_ms": round(sum(s["template_ms"] for s in samples) / count, 2),
+                "avg_fragment_saved_ms": round(sum(s["fragment_saved_ms"] for s in samples) / count, 2),
+                "cache_hits": sum(s["cache_hits"] for s in samples),
+                "cache_misses": sum(s["cache_misses"] for s in samples),
+                "avg_bytes": round(sum(s["bytes"] or 0 for s in samples) / count),
+                "histogram": histogram,
+            }
+        return {"buckets_ms": HISTOGRAM_BUCKETS_MS, "routes": routes}
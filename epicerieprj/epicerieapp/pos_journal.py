@@ -0,0 +1,587 @@
+"""
+Sale capture for the POS counters that does not wait on the database.
+
+A completed sale is appended to a local journal file and acknowledged as
+soon as the journal is on disk; an uploader thread then copies journaled
+sales into the branch database in batches. A slow server or link delays
+the upload, not the checkout.
+
+Journal layout: POS_JOURNAL["DIR"]/<branch>/<writer>/ holds one process's
+segment files (segment-000001.log, ...) and a checkpoint.json recording how
+far the uploader has got. Each record is one line, "<crc32> <json>\\n".
+Appends are fsynced in groups: a caller waits for the next fsync, and every
+sale written while one is in progress shares the following one. A crash can
+leave a torn last line, which fails its checksum and is ignored.
+
+Uploads are idempotent: every sale carries a client UUID (Sale.client_uuid,
+unique), and a batch skips UUIDs the branch already has. A crash between
+committing a batch and saving the checkpoint therefore only causes the
+batch to be read again. Failed uploads are retried with exponential backoff.
+A sale the database rejects (a constraint or a value it cannot store) is
+moved to the branch's dead-letter.log instead, so one bad record does not
+hold up the sales journaled after it.
+
+Each writer touches a heartbeat file while its process runs. A writer
+directory whose heartbeat is older than ORPHAN_SECONDS belongs to a process
+that died; the next process to capture a sale on that branch (or
+`manage.py pos_journal upload`) takes it over, uploads what is left and
+deletes it.
+
+Configured with the POS_JOURNAL setting:
+
+    POS_JOURNAL = {
+        "DIR": BASE_DIR / "db/pos_journal",
+        "SYNC_DELAY_SECONDS": 0.002,   # wait for more appends before an fsync
+        "SEGMENT_BYTES": 4 * 1024 * 1024,
+        "UPLOAD_BATCH": 200,           # sales per upload transaction
+        "UPLOAD_INTERVAL_SECONDS": 0.5,
+        "RETRY_MAX_SECONDS": 60,
+        "ORPHAN_SECONDS": 60,
+    }
+"""
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+import zlib
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+from django.db import DatabaseError, DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import sharding
+from .models import Sale, SaleLine, StockMovement
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "DIR": None,
+    "SYNC_DELAY_SECONDS": 0.002,
+    "SEGMENT_BYTES": 4 * 1024 * 1024,
+    "UPLOAD_BATCH": 200,
+    "UPLOAD_INTERVAL_SECONDS": 0.5,
+    "RETRY_MAX_SECONDS": 60,
+    "ORPHAN_SECONDS": 60,
+}
+
+SEGMENT_PATTERN = "segment-*.log"
+CHECKPOINT_FILE = "checkpoint.json"
+HEARTBEAT_FILE = "heartbeat"
+DEAD_LETTER_FILE = "dead-letter.log"
+
+# Digits and decimal places of SaleLine.quantity, SaleLine.unit_price and
+# Sale.total
+QUANTITY_DIGITS = (12, 3)
+PRICE_DIGITS = (12, 2)
+
+# Errors saving a batch that come from its records rather than from the
+# database being unreachable
+REJECTED_ERRORS = (DataError, IntegrityError, ValidationError, ValueError, TypeError, KeyError, ArithmeticError)
+
+
+class JournalError(Exception):
+    pass
+
+
+def journal_settings():
+    options = {**DEFAULTS, **getattr(settings, "POS_JOURNAL", {})}
+    if options["DIR"] is None:
+        options["DIR"] = Path(settings.BASE_DIR) / "db/pos_journal"
+    return options
+
+
+def writer_name():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+# Records
+
+def _amount(value, digits, name):
+    """
+    ``value`` as a Decimal that fits a DecimalField of ``digits`` (max_digits,
+    decimal_places); NaN and infinities are rejected.
+    """
+    try:
+        amount = Decimal(str(value))
+        DecimalValidator(*digits)(amount)
+    except (ArithmeticError, ValidationError) as exc:
+        message = "; ".join(exc.messages) if isinstance(exc, ValidationError) else "not a number"
+        raise JournalError(f"Invalid {name} {value!r}: {message}") from exc
+    return amount
+
+
+def make_sale(lines, sale_id=None, sold_at=None):
+    """
+    A journal record for a sale of ``lines`` ((product_id, quantity,
+    unit_price) triples). Raises JournalError for values the branch database
+    could not store, so that nothing is acknowledged that cannot be uploaded.
+    """
+    lines = [
+        (
+            int(product_id),
+            _amount(quantity, QUANTITY_DIGITS, "quantity"),
+            _amount(unit_price, PRICE_DIGITS, "unit price"),
+        )
+        for product_id, quantity, unit_price in lines
+    ]
+    if not lines:
+        raise JournalError("A sale needs at least one line.")
+    total = _amount(
+        sum((quantity * unit_price for _, quantity, unit_price in lines), Decimal(0)).quantize(Decimal("0.01")),
+        PRICE_DIGITS,
+        "total",
+    )
+    return {
+        "id": str(uuid.UUID(str(sale_id))) if sale_id else str(uuid.uuid4()),
+        "sold_at": (sold_at or timezone.now()).isoformat(),
+        "total": str(total),
+        "lines": [[product_id, str(quantity), str(unit_price)] for product_id, quantity, unit_price in lines],
+    }
+
+
+def encode_record(sale):
+    payload = json.dumps(sale, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def read_records(path, offset=0):
+    """
+    Yield (end offset, sale) for the complete records of a segment after
+    ``offset``, stopping at the first torn or corrupt one.
+    """
+    with open(path, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b"\n") or len(line) < 10:
+                return
+            crc, payload = line[:8], line[9:-1]
+            try:
+                valid = int(crc, 16) == zlib.crc32(payload)
+            except ValueError:
+                valid = False
+            if not valid:
+                return
+            offset += len(line)
+            yield offset, json.loads(payload)
+
+
+def _segment_number(path):
+    return int(path.stem.split("-")[1])
+
+
+def _segments(directory):
+    return sorted(Path(directory).glob(SEGMENT_PATTERN), key=_segment_number)
+
+
+def _segment_path(directory, number):
+    return Path(directory) / f"segment-{number:06d}.log"
+
+
+# Writing
+
+class SaleJournal:
+    """
+    Append-only journal of one process's sales for one branch.
+    """
+
+    def __init__(self, directory, options=None):
+        self.directory = Path(directory)
+        self.options = options or journal_settings()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        touch_heartbeat(self.directory)
+
+        self._lock = threading.Lock()
+        self._synced = threading.Condition()
+        self._written = 0
+        self._durable = 0
+        self._syncing = False
+
+        segments = _segments(self.directory)
+        self._segment = _segment_number(segments[-1]) if segments else 1
+        self._open_segment()
+
+    def _open_segment(self):
+        self._file = open(_segment_path(self.directory, self._segment), "ab")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._segment += 1
+        self._open_segment()
+
+    def append(self, sale):
+        """
+        Write ``sale`` and return once it is on disk.
+        """
+        record = encode_record(sale)
+        with self._lock:
+            if self._size and self._size + len(record) > self.options["SEGMENT_BYTES"]:
+                self._rotate()
+            self._file.write(record)
+            self._file.flush()
+            self._size += len(record)
+            self._written += 1
+            sequence = self._written
+        self._wait_durable(sequence)
+        return sale["id"]
+
+    def _wait_durable(self, sequence):
+        # The first caller to find no fsync running does one for everybody
+        # written so far; the others wait for it.
+        with self._synced:
+            while self._durable < sequence and self._syncing:
+                self._synced.wait()
+            if self._durable >= sequence:
+                return
+            self._syncing = True
+        durable = self._durable
+        try:
+            time.sleep(self.options["SYNC_DELAY_SECONDS"])
+            with self._lock:
+                os.fsync(self._file.fileno())
+                durable = self._written
+        finally:
+            with self._synced:
+                self._durable = max(self._durable, durable)
+                self._syncing = False
+                self._synced.notify_all()
+
+    def close(self):
+        with self._lock:
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+def touch_heartbeat(directory):
+    (Path(directory) / HEARTBEAT_FILE).touch()
+
+
+def heartbeat_age(directory):
+    try:
+        return time.time() - (Path(directory) / HEARTBEAT_FILE).stat().st_mtime
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+# Uploading
+
+def load_checkpoint(directory):
+    try:
+        checkpoint = json.loads((Path(directory) / CHECKPOINT_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return (1, 0)
+    return (checkpoint["segment"], checkpoint["offset"])
+
+
+def save_checkpoint(directory, position):
+    path = Path(directory) / CHECKPOINT_FILE
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"segment": position[0], "offset": position[1]}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    # Segments before the checkpoint's are fully uploaded and closed
+    for segment in _segments(directory):
+        if _segment_number(segment) < position[0]:
+            segment.unlink()
+
+
+def pending_sales(directory, limit):
+    """
+    (sales, position after them) for up to ``limit`` journaled sales after
+    the checkpoint.
+    """
+    position = load_checkpoint(directory)
+    segments = [path for path in _segments(directory) if _segment_number(path) >= position[0]]
+    sales = []
+    for index, path in enumerate(segments):
+        number = _segment_number(path)
+        offset = position[1] if number == position[0] else 0
+        for offset, sale in read_records(path, offset):
+            sales.append(sale)
+            position = (number, offset)
+            if len(sales) >= limit:
+                return sales, position
+        # A later segment means this one was rotated and will not grow
+        if index + 1 < len(segments):
+            position = (_segment_number(segments[index + 1]), 0)
+    return sales, position
+
+
+def save_sales(sales, alias):
+    """
+    Insert the sales the branch database does not have yet, with their
+    lines and stock movements, in one transaction. Returns the number
+    inserted.
+    """
+    with transaction.atomic(using=alias):
+        sales_by_id = {}
+        for sale in sales:
+            sales_by_id.setdefault(uuid.UUID(sale["id"]), sale)
+        existing = Sale.objects.using(alias).filter(client_uuid__in=list(sales_by_id))
+        for client_uuid in existing.values_list("client_uuid", flat=True):
+            del sales_by_id[client_uuid]
+        if not sales_by_id:
+            return 0
+
+        Sale.objects.using(alias).bulk_create([
+            Sale(client_uuid=client_uuid, sold_at=parse_datetime(sale["sold_at"]), total=Decimal(sale["total"]))
+            for client_uuid, sale in sales_by_id.items()
+        ])
+        # Looked up rather than taken from bulk_create, which does not set
+        # primary keys on every backend
+        sale_ids = dict(
+            Sale.objects.using(alias)
+            .filter(client_uuid__in=list(sales_by_id))
+            .values_list("client_uuid", "sale_id")
+        )
+        lines = []
+        movements = []
+        for client_uuid, sale in sales_by_id.items():
+            sold_at = parse_datetime(sale["sold_at"])
+            for product_id, quantity, unit_price in sale["lines"]:
+                lines.append(SaleLine(
+                    sale_id=sale_ids[client_uuid],
+                    product_id=product_id,
+                    quantity=Decimal(quantity),
+                    unit_price=Decimal(unit_price),
+                ))
+                movements.append(StockMovement(
+                    sale_id=sale_ids[client_uuid],
+                    product_id=product_id,
+                    quantity=-Decimal(quantity),
+                    reason="Sale",
+                    moved_at=sold_at,
+                ))
+        SaleLine.objects.using(alias).bulk_create(lines)
+        StockMovement.objects.using(alias).bulk_create(movements)
+        return len(sales_by_id)
+
+
+def dead_letter_path(branch):
+    return journal_settings()["DIR"] / branch / DEAD_LETTER_FILE
+
+
+def write_dead_letter(branch, sale, error):
+    """
+    Append a sale the branch database rejected to the branch's dead-letter
+    file, with the error, for someone to correct and re-enter.
+    """
+    path = dead_letter_path(branch)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = encode_record({"failed_at": timezone.now().isoformat(), "error": str(error), "sale": sale})
+    with open(path, "ab") as file:
+        file.write(record)
+        file.flush()
+        os.fsync(file.fileno())
+    logger.error("POS sale %s rejected by branch %s, moved to %s: %s", sale.get("id"), branch, path, error)
+
+
+def count_dead_letters(branch):
+    path = dead_letter_path(branch)
+    return sum(1 for _ in read_records(path)) if path.is_file() else 0
+
+
+def save_batch(sales, alias, branch):
+    """
+    save_sales() for a batch; if a record in it is rejected, the sales are
+    saved one by one and the rejected ones moved to the dead-letter file.
+    Errors reaching the database still propagate.
+    """
+    try:
+        return save_sales(sales, alias)
+    except REJECTED_ERRORS:
+        pass
+    inserted = 0
+    for sale in sales:
+        try:
+            inserted += save_sales([sale], alias)
+        except REJECTED_ERRORS as exc:
+            write_dead_letter(branch, sale, exc)
+    return inserted
+
+
+def upload(directory, branch, batch_size=None):
+    """
+    Upload everything journaled in ``directory`` after its checkpoint.
+    Returns (sales read, sales inserted). Database errors propagate, with
+    the checkpoint left at the last committed batch.
+    """
+    alias = sharding.branch_alias(branch)
+    batch_size = batch_size or journal_settings()["UPLOAD_BATCH"]
+    read = inserted = 0
+    while True:
+        # A long backlog must not make the journal look orphaned
+        touch_heartbeat(directory)
+        sales, position = pending_sales(directory, batch_size)
+        if sales:
+            inserted += save_batch(sales, alias, branch)
+            read += len(sales)
+        if position != load_checkpoint(directory):
+            save_checkpoint(directory, position)
+        if len(sales) < batch_size:
+            return read, inserted
+
+
+def orphaned_writers(branch):
+    """
+    Writer directories of ``branch`` whose process stopped heartbeating.
+    """
+    root = journal_settings()["DIR"] / branch
+    if not root.is_dir():
+        return []
+    limit = journal_settings()["ORPHAN_SECONDS"]
+    orphans = []
+    for directory in root.iterdir():
+        age = heartbeat_age(directory) if directory.is_dir() else None
+        if age is not None and age > limit:
+            orphans.append(directory)
+    return orphans
+
+
+def adopt(directory, owner):
+    """
+    Take over an orphaned writer directory by renaming it under ``owner``.
+    Returns the new path, or None if another process got there first.
+    """
+    # A fresh suffix: journals adopted before and orphaned again all end in "-adopted"
+    target = directory.with_name(f"{owner}-{uuid.uuid4().hex[:6]}-adopted")
+    try:
+        os.rename(directory, target)
+    except OSError:
+        return None
+    touch_heartbeat(target)
+    return target
+
+
+def count_pending(directory):
+    position = load_checkpoint(directory)
+    count = 0
+    for path in _segments(directory):
+        number = _segment_number(path)
+        if number >= position[0]:
+            count += sum(1 for _ in read_records(path, position[1] if number == position[0] else 0))
+    return count
+
+
+# Capture service
+
+class SaleCapture:
+    """
+    This process's journals, one per branch, and the thread uploading them
+    and any orphaned journals it adopts.
+    """
+
+    def __init__(self):
+        self.name = writer_name()
+        self.journals = {}
+        self.adopted = {}
+        self.failures = 0
+        self.last_error = ""
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def journal(self, branch):
+        sharding.branch_alias(branch)
+        with self._lock:
+            journal = self.journals.get(branch)
+            if journal is None:
+                directory = journal_settings()["DIR"] / branch / self.name
+                journal = self.journals[branch] = SaleJournal(directory)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pos-journal-upload", daemon=True)
+                self._thread.start()
+        return journal
+
+    def capture(self, branch, lines, sale_id=None, sold_at=None):
+        """
+        Journal a sale for ``branch`` and return its id once it is durable.
+        """
+        sale = make_sale(lines, sale_id, sold_at)
+        return self.journal(branch).append(sale)
+
+    def adopt_orphans(self, branch):
+        for orphan in orphaned_writers(branch):
+            adopted = adopt(orphan, self.name)
+            if adopted is not None:
+                logger.info("Adopted POS journal %s", orphan.name)
+                self.adopted[adopted] = branch
+
+    def directories(self):
+        return [journal.directory for journal in self.journals.values()] + list(self.adopted)
+
+    def upload_all(self):
+        """
+        One upload pass: this process's journals, then any orphaned journals
+        of the same branches, which are deleted once uploaded. Returns the
+        number of sales inserted.
+        """
+        inserted = 0
+        for branch, journal in list(self.journals.items()):
+            touch_heartbeat(journal.directory)
+            inserted += upload(journal.directory, branch)[1]
+            self.adopt_orphans(branch)
+        for directory, branch in list(self.adopted.items()):
+            touch_heartbeat(directory)
+            inserted += upload(directory, branch)[1]
+            shutil.rmtree(directory)
+            del self.adopted[directory]
+        return inserted
+
+    def _run(self):
+        options = journal_settings()
+        interval = options["UPLOAD_INTERVAL_SECONDS"]
+        backoff = 0
+        next_upload = 0.0
+        while not self._stop.wait(interval):
+            # Heartbeats go on while uploads fail, so that other processes
+            # do not take these journals for orphans. Any error is retried:
+            # if this thread died, the journals would be adopted while this
+            # process still appends to them.
+            try:
+                for directory in self.directories():
+                    touch_heartbeat(directory)
+                if time.monotonic() < next_upload:
+                    continue
+                self.upload_all()
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = str(exc)
+                backoff = min(max(backoff * 2, interval * 2), options["RETRY_MAX_SECONDS"])
+                next_upload = time.monotonic() + backoff
+                logger.warning(
+                    "POS journal upload failed, retrying in %ss: %s", backoff, exc,
+                    exc_info=not isinstance(exc, (DatabaseError, OSError)),
+                )
+            else:
+                backoff = 0
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        journals = {}
+        for branch, journal in self.journals.items():
+            journals[branch] = {
+                "directory": str(journal.directory),
+                "pending": count_pending(journal.directory),
+                "dead_letters": count_dead_letters(branch),
+            }
+        return {"writer": self.name, "journals": journals, "failures": self.failures, "last_error": self.last_error}
+
+
+sale_capture = SaleCapture()
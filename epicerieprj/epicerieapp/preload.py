@@ -0,0 +1,225 @@
+"""
+Link: rel=preload headers and 103 Early Hints for the assets each page needs.
+
+The first successful HTML response of every route is scanned for the
+stylesheets, fonts and scripts it loads from STATIC_URL. From then on the
+route's responses carry those as a Link header, so the browser starts
+fetching them as soon as the headers arrive rather than when the parser
+reaches the tags (the scripts sit at the end of <body>). Under an ASGI
+server that supports the http.response.early_hint extension,
+EarlyHintsMiddleware (wrapped around the application in asgi.py) sends the
+same links as a 103 response before the view even runs, overlapping the
+asset fetches with HTML generation.
+
+The cached lists are dropped when the templates or the built asset
+manifests change. Configured with the PRELOAD_HINTS setting:
+
+    PRELOAD_HINTS = {
+        "ENABLED": True,
+        "MAX_LINKS": 12,      # links per route, in page order
+        "EARLY_HINTS": True,  # send 103 under ASGI when the server supports it
+    }
+"""
+import threading
+from html.parser import HTMLParser
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from . import assets
+from .templatetags.chrome import template_version
+
+DEFAULTS = {
+    "ENABLED": True,
+    "MAX_LINKS": 12,
+    "EARLY_HINTS": True,
+}
+
+EARLY_HINT_EXTENSION = "http.response.early_hint"
+
+FONT_TYPES = {".woff2": "font/woff2", ".woff": "font/woff", ".ttf": "font/ttf"}
+
+
+def hint_settings():
+    return {**DEFAULTS, **getattr(settings, "PRELOAD_HINTS", {})}
+
+
+class AssetCollector(HTMLParser):
+    """
+    Static assets referenced by a page, as (url, as) pairs in document order.
+    Stylesheets and preloads come first since they block or gate rendering.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.styles = []
+        self.scripts = []
+        self.in_noscript = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "noscript":
+            self.in_noscript = True
+        elif self.in_noscript:
+            return
+        elif tag == "link" and attrs.get("href"):
+            rel = (attrs.get("rel") or "").lower().split()
+            if "stylesheet" in rel:
+                self.styles.append((attrs["href"], "style"))
+            elif "preload" in rel and attrs.get("as"):
+                self.styles.append((attrs["href"], attrs["as"]))
+        elif tag == "script" and attrs.get("src"):
+            self.scripts.append((attrs["src"], "script"))
+
+    def handle_endtag(self, tag):
+        if tag == "noscript":
+            self.in_noscript = False
+
+    def assets(self):
+        static_url = "/" + settings.STATIC_URL.lstrip("/")
+        seen = set()
+        for url, kind in self.styles + self.scripts:
+            if url.startswith(static_url) and url not in seen:
+                seen.add(url)
+                yield url, kind
+
+
+def link_value(url, kind):
+    value = f"<{url}>; rel=preload; as={kind}"
+    if kind == "font":
+        suffix = url[url.rfind("."):]
+        value += f'; type="{FONT_TYPES.get(suffix, "font/woff2")}"; crossorigin'
+    return value
+
+
+def page_links(html, max_links):
+    collector = AssetCollector()
+    collector.feed(html)
+    collector.close()
+    return [link_value(url, kind) for url, kind in collector.assets()][:max_links]
+
+
+def asset_signature():
+    """
+    Changes whenever a template or a built asset manifest changes.
+    """
+    manifests = tuple(
+        (assets.read_manifest(kind) or {}).get("created") for kind in ("css", "fonts", "images")
+    )
+    return template_version(), manifests, getattr(settings, "CSS_BUNDLE_ENABLED", not settings.DEBUG)
+
+
+class HintStore:
+    """
+    Preload links per route name, valid for one asset signature.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.signature = None
+        self.links = {}
+
+    def get(self, route):
+        signature = asset_signature()
+        with self.lock:
+            if signature != self.signature:
+                self.signature = signature
+                self.links.clear()
+            return self.links.get(route)
+
+    def set(self, route, links):
+        with self.lock:
+            self.links[route] = links
+
+    def clear(self):
+        with self.lock:
+            self.links.clear()
+
+
+hint_store = HintStore()
+
+
+def _is_page(request, response):
+    return (
+        request.method in ("GET", "HEAD")
+        and response.status_code == 200
+        and not response.streaming
+        and response.get("Content-Type", "").startswith("text/html")
+    )
+
+
+class PreloadHintsMiddleware:
+    """
+    Adds the route's cached Link: rel=preload header to HTML responses,
+    learning the asset list from the first rendered page. Sync and async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.options = hint_settings()
+        if not self.options["ENABLED"]:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.add_links(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.add_links(request, await self.get_response(request))
+
+    def add_links(self, request, response):
+        match = request.resolver_match
+        if match is None or not _is_page(request, response):
+            return response
+
+        links = hint_store.get(match.view_name)
+        if links is None:
+            charset = response.charset or "utf-8"
+            links = page_links(response.content.decode(charset, errors="replace"), self.options["MAX_LINKS"])
+            hint_store.set(match.view_name, links)
+        if links and "Link" not in response:
+            response["Link"] = ", ".join(links)
+        return response
+
+
+class EarlyHintsMiddleware:
+    """
+    ASGI wrapper that sends a 103 Early Hints response with the route's
+    cached preload links before the application handles the request, when
+    the server advertises the http.response.early_hint extension.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = hint_settings()["ENABLED"] and hint_settings()["EARLY_HINTS"]
+
+    async def __call__(self, scope, receive, send):
+        if (
+            self.enabled
+            and scope["type"] == "http"
+            and scope["method"] in ("GET", "HEAD")
+            and EARLY_HINT_EXTENSION in scope.get("extensions", {})
+        ):
+            links = self.links_for(scope["path"])
+            if links:
+                await send({
+                    "type": EARLY_HINT_EXTENSION,
+                    "links": [link.encode("latin-1") for link in links],
+                })
+        await self.app(scope, receive, send)
+
+    def links_for(self, path):
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return None
+        return hint_store.get(match.view_name)
@@ -0,0 +1,432 @@
+"""
+Purchase planning: whom to order each product from.
+
+Given order lines (product, quantity), plan_purchase() picks a supplier for
+every line so the total cost is lowest, using only active suppliers' current
+prices (the latest price per supplier and product, as in
+vw_SupplierProductsCurrentPrices) and respecting each supplier's
+MinimumOrderValue: a supplier that gets any line must get at least that much.
+
+Cheapest-per-line is a lower bound that minimums usually break, and the
+exact problem is a facility-location ILP. optimize() solves it
+heuristically over a (lines x suppliers) cost matrix:
+
+1. Open every supplier that could reach its minimum on this order and give
+   each line to its cheapest open supplier.
+2. Repair: a supplier left short of its minimum is topped up with the lines
+   it can take most cheaply from suppliers that stay above theirs. Suppliers
+   that cannot be topped up are closed and step 1 runs again. Lines that
+   only closed suppliers offer are not given up yet: such a supplier is
+   reopened (alone, with the other closed ones or in place of an open one)
+   and lines are moved between suppliers until every minimum holds, keeping
+   the plan that serves the most lines.
+3. Local search: close a used supplier or open a closed one whenever the
+   repaired plan costs less, until no move helps or the time limit is
+   reached.
+
+Each evaluation is a vectorized argmin over the matrix, so a 1,000-line
+order over 200 suppliers is planned in well under a second. plan_purchase()
+keeps to PLAN_TIME_LIMIT in all: the search gets what loading the prices
+left of it, less TIME_MARGIN for building the plan afterwards.
+"""
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import OuterRef, Subquery
+
+from .models import Product, Supplier, SupplierProductCatalog
+
+# Seconds the local search may run before returning its best plan
+TIME_LIMIT = 0.8
+
+# Seconds plan_purchase() may take, loading and building the plan included
+PLAN_TIME_LIMIT = 1.0
+
+# Seconds kept back from the search for building the plan after it
+TIME_MARGIN = 0.1
+
+# Money compared as floats: differences below this are rounding
+EPSILON = 1e-6
+
+# First moves _rebalance() looks one move beyond
+LOOKAHEAD = 20
+
+# Products per price query, below SQLite's bound-parameter limit
+QUERY_CHUNK = 500
+
+
+class PurchaseError(Exception):
+    pass
+
+
+# Solver
+
+def _top_up(costs, assignment, values, minimums, supplier):
+    """
+    Move lines to ``supplier`` until it reaches its minimum, cheapest extra
+    cost per unit of value first, taking only lines whose supplier stays at
+    or above its own minimum (or ends up with nothing). Updates
+    ``assignment`` and ``values`` (lists, like ``minimums``: the loop is
+    scalar); returns False if the minimum is out of reach.
+    """
+    candidates = np.flatnonzero((assignment != supplier) & np.isfinite(costs[:, supplier]))
+    if not len(candidates):
+        return False
+    gained = costs[candidates, supplier]
+    donors = assignment[candidates]
+    given = costs[candidates, donors]
+    order = np.argsort((gained - given) / gained, kind="stable")
+
+    need = minimums[supplier] - values[supplier]
+    for line, donor, cost, gain in zip(
+        candidates[order].tolist(), donors[order].tolist(), given[order].tolist(), gained[order].tolist()
+    ):
+        remaining = values[donor] - cost
+        if remaining > EPSILON and remaining < minimums[donor] - EPSILON:
+            continue
+        assignment[line] = supplier
+        values[donor] = max(remaining, 0.0)
+        values[supplier] += gain
+        need -= gain
+        if need <= EPSILON:
+            return True
+    return False
+
+
+def _shortfall(values, minimums):
+    return np.where(values > EPSILON, np.maximum(minimums - values, 0), 0)
+
+
+def _move_deltas(masked, minimums, assignment):
+    """
+    Supplier values, their shortfalls and the (lines x suppliers) change in
+    total shortfall from moving each line to each supplier.
+    """
+    lines = np.arange(len(assignment))
+    given = masked[lines, assignment]
+    values = np.bincount(assignment, weights=given, minlength=masked.shape[1])
+    short = _shortfall(values, minimums)
+    # The donor loses the line, the taker gains it
+    donor_delta = _shortfall(values[assignment] - given, minimums[assignment]) - short[assignment]
+    delta = donor_delta[:, None] + _shortfall(values + masked, minimums) - short
+    delta[lines, assignment] = np.inf
+    delta[~np.isfinite(masked)] = np.inf
+    return values, short, delta
+
+
+def _rebalance(costs, open_suppliers, minimums, assignment):
+    """
+    Move a line (or two in a row), swap two lines between suppliers or
+    empty a short supplier (its lines going to their cheapest other
+    supplier), whichever lowers the total shortfall below the minimums of
+    the suppliers in use most, until none does. Updates ``assignment``;
+    returns True once no supplier is short.
+    """
+    masked = np.where(open_suppliers, costs, np.inf)
+    minimums = np.asarray(minimums)
+    lines = np.arange(len(assignment))
+    while True:
+        values, short, delta = _move_deltas(masked, minimums, assignment)
+        if short.sum() <= EPSILON:
+            return True
+        moves = []
+
+        # Moving a line, alone or followed by the best next move: a supplier
+        # giving a line to a short one may need a line from a third one
+        firsts = np.argsort(delta, axis=None)[:LOOKAHEAD]
+        for line, supplier in zip(*np.unravel_index(firsts, delta.shape)):
+            if not np.isfinite(delta[line, supplier]):
+                break
+            moves.append((delta[line, supplier], [line], [supplier]))
+            trial = assignment.copy()
+            trial[line] = supplier
+            after = _move_deltas(masked, minimums, trial)[2]
+            second, taker = np.unravel_index(after.argmin(), after.shape)
+            moves.append((delta[line, supplier] + after[second, taker], [line, second], [supplier, taker]))
+
+        # Swapping lines between their suppliers; one of them must be short
+        given = masked[lines, assignment]
+        first, second = np.meshgrid(np.flatnonzero(short[assignment] > 0), lines, indexing="ij")
+        a, b = assignment[first], assignment[second]
+        new_a = values[a] - given[first] + masked[second, a]
+        new_b = values[b] - given[second] + masked[first, b]
+        swap_delta = _shortfall(new_a, minimums[a]) - short[a] + _shortfall(new_b, minimums[b]) - short[b]
+        swap_delta[(a == b) | ~np.isfinite(new_a) | ~np.isfinite(new_b)] = np.inf
+        pair = np.unravel_index(swap_delta.argmin(), swap_delta.shape)
+        moves.append((swap_delta[pair], [first[pair], second[pair]], [b[pair], a[pair]]))
+
+        # Emptying a short supplier
+        for supplier in np.flatnonzero(short > 0):
+            moved = np.flatnonzero(assignment == supplier)
+            others = masked[moved]
+            others[:, supplier] = np.inf
+            takers = others.argmin(axis=1)
+            gained = others[np.arange(len(moved)), takers]
+            if not np.isfinite(gained).all():
+                continue
+            new_values = values + np.bincount(takers, weights=gained, minlength=len(values))
+            new_values[supplier] = 0
+            moves.append((_shortfall(new_values, minimums).sum() - short.sum(), moved, takers))
+
+        change, moved, takers = min(moves, key=lambda move: move[0])
+        if not change < -EPSILON:
+            return False
+        for line, supplier in zip(moved, takers):
+            assignment[line] = supplier
+
+
+def _evaluate(costs, open_suppliers, minimums, find_all=False, rebalance=False):
+    """
+    (assignment, total, []) for the repaired cheapest assignment to the open
+    suppliers; (None, inf, suppliers) when those suppliers' minimums cannot
+    be met (the first one found, or all with find_all), or (None, inf, [])
+    when a line has no open supplier. With ``rebalance``, failed top-ups
+    are retried by _rebalance().
+    """
+    masked = np.where(open_suppliers, costs, np.inf)
+    assignment = masked.argmin(axis=1)
+    line_costs = masked[np.arange(len(assignment)), assignment]
+    if not np.isfinite(line_costs).all():
+        return None, np.inf, []
+    values = np.bincount(assignment, weights=line_costs, minlength=costs.shape[1])
+
+    short = np.flatnonzero((values > 0) & (values < np.asarray(minimums) - EPSILON))
+    # Nearly full suppliers first: they are the cheapest to top up
+    short = short[np.argsort(values[short] - np.asarray(minimums)[short])[::-1]].tolist()
+    values = values.tolist()
+    failed = []
+    for supplier in short:
+        # An earlier top-up may have emptied or filled it
+        if values[supplier] <= 0 or values[supplier] >= minimums[supplier] - EPSILON:
+            continue
+        if not _top_up(costs, assignment, values, minimums, supplier):
+            failed.append(supplier)
+            if not find_all:
+                break
+    if failed and rebalance and _rebalance(costs, open_suppliers, minimums, assignment):
+        failed = []
+    if failed:
+        return None, np.inf, failed
+    return assignment, costs[np.arange(len(assignment)), assignment].sum(), []
+
+
+def _close_until_feasible(costs, offered, open_suppliers, minimums, keep=None):
+    """
+    Steps 1 and 2 for the lines some open supplier offers: close the
+    suppliers whose minimums cannot be met until the plan is feasible.
+    Returns (open_suppliers, rows, assignment, total), rows being the lines
+    served; None if that would close ``keep``, a reopened supplier (whose
+    plans are rebalanced).
+    """
+    rows = np.arange(len(costs))
+    while True:
+        rows = rows[(offered[rows] & open_suppliers).any(axis=1)]
+        if not len(rows):
+            return open_suppliers, rows, np.zeros(0, dtype=int), 0.0
+        assignment, total, failed = _evaluate(
+            costs[rows], open_suppliers, minimums, find_all=True, rebalance=keep is not None
+        )
+        if assignment is not None:
+            return open_suppliers, rows, assignment, total
+        if keep in failed:
+            return None
+        open_suppliers = open_suppliers.copy()
+        open_suppliers[failed] = False
+
+
+def _reopenings(candidates, open_suppliers, reachable):
+    """
+    (supplier, open suppliers) trials reopening each candidate supplier:
+    alone, then with every reachable supplier, then in place of one open
+    supplier, then with every reachable supplier but one.
+    """
+    for supplier in candidates:
+        trial = open_suppliers.copy()
+        trial[supplier] = True
+        yield supplier, trial
+    for supplier in candidates:
+        yield supplier, reachable
+    for base in (open_suppliers, reachable):
+        for supplier in candidates:
+            for other in np.flatnonzero(base):
+                if other == supplier:
+                    continue
+                trial = base.copy()
+                trial[supplier] = True
+                trial[other] = False
+                yield supplier, trial
+
+
+def optimize(costs, minimums, time_limit=TIME_LIMIT):
+    """
+    Assign each row (line) of ``costs`` (line cost at each supplier, inf
+    where not offered) to a supplier column. Returns an array of supplier
+    indexes, -1 for lines no feasible supplier offers.
+    """
+    started = time.monotonic()
+    lines, suppliers = costs.shape
+    offered = np.isfinite(costs)
+    # Suppliers that cannot reach their minimum even with every line they offer
+    reachable = np.where(offered, costs, 0).sum(axis=0) >= minimums - EPSILON
+    minimums = np.asarray(minimums, dtype=float).tolist()
+    open_suppliers = reachable & offered.any(axis=0)
+
+    result = np.full(lines, -1)
+
+    # Steps 1 and 2: close suppliers until the plan is feasible
+    open_suppliers, rows, assignment, total = _close_until_feasible(costs, offered, open_suppliers, minimums)
+
+    # Closing a supplier can leave lines that only it offers without one.
+    # Before giving up on them, reopen the closed suppliers that offer some
+    # of them, alone or with others (see _reopenings()), and keep the plan
+    # serving most lines. This shares TIME_LIMIT with step 3.
+    improved = True
+    while improved and len(rows) < lines:
+        improved = False
+        unserved = np.ones(lines, dtype=bool)
+        unserved[rows] = False
+        candidates = np.flatnonzero(reachable & ~open_suppliers & offered[unserved].any(axis=0))
+        trials = _reopenings(candidates, open_suppliers, reachable & offered.any(axis=0))
+        best = None
+        for number, (supplier, trial) in enumerate(trials):
+            # Once reopening a supplier alone helps, the rest is not tried
+            if time.monotonic() - started >= time_limit or (number >= len(candidates) and best is not None):
+                break
+            plan = _close_until_feasible(costs, offered, trial, minimums, keep=supplier)
+            if plan is not None and len(plan[1]) > (len(best[1]) if best else len(rows)):
+                best = plan
+        if best is not None:
+            open_suppliers, rows, assignment, total = best
+            improved = True
+    if not len(rows):
+        return result
+    costs = costs[rows]
+
+    # Step 3: local search over the set of open suppliers
+    improved = True
+    while improved and time.monotonic() - started < time_limit:
+        improved = False
+        used = np.unique(assignment)
+        line_costs = costs[np.arange(len(assignment)), assignment]
+        spend = np.bincount(assignment, weights=line_costs, minlength=suppliers)
+        closed = np.flatnonzero(reachable & ~open_suppliers)
+        # Opening: most possible savings first; closing: smallest suppliers first
+        savings = np.where(offered[rows][:, closed], line_costs[:, None] - costs[:, closed], 0).clip(0).sum(axis=0)
+        moves = [(closed[k], True) for k in np.argsort(-savings) if savings[k] > 0]
+        moves += [(supplier, False) for supplier in used[np.argsort(spend[used])]]
+        for supplier, opening in moves:
+            if time.monotonic() - started >= time_limit:
+                break
+            trial = open_suppliers.copy()
+            trial[supplier] = opening
+            trial_assignment, trial_total, _ = _evaluate(costs, trial, minimums)
+            if trial_total < total - EPSILON:
+                open_suppliers, assignment, total = trial, trial_assignment, trial_total
+                improved = True
+                break
+
+    result[rows] = assignment
+    return result
+
+
+# Loading
+
+def current_prices(product_ids):
+    """
+    (supplier_id, product_id, price) of active suppliers' latest prices for
+    ``product_ids``.
+    """
+    latest_date = (
+        SupplierProductCatalog.objects.filter(supplier=OuterRef("supplier"), product=OuterRef("product"))
+        .order_by("-price_entry_date")
+        .values("price_entry_date")[:1]
+    )
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), QUERY_CHUNK):
+        yield from SupplierProductCatalog.objects.filter(
+            product_id__in=product_ids[start:start + QUERY_CHUNK],
+            price_entry_date=Subquery(latest_date),
+            supplier__status="Active",
+        ).values_list("supplier_id", "product_id", "dealers_price")
+
+
+def plan_purchase(order_lines, time_limit=PLAN_TIME_LIMIT):
+    """
+    Plan an order of ``order_lines`` ((product_id, quantity) pairs; a product
+    listed twice is ordered once with the quantities added) in about
+    ``time_limit`` seconds. Returns the lines per supplier, the totals and
+    the lines nobody can supply.
+    """
+    started = time.monotonic()
+    quantities = {}
+    for product_id, quantity in order_lines:
+        quantity = Decimal(str(quantity))
+        if quantity <= 0:
+            raise PurchaseError(f"Product {product_id}: quantity must be positive.")
+        quantities[int(product_id)] = quantities.get(int(product_id), Decimal(0)) + quantity
+    if not quantities:
+        raise PurchaseError("The order has no lines.")
+    product_ids = list(quantities)
+    line_index = {product_id: line for line, product_id in enumerate(product_ids)}
+
+    prices = list(current_prices(product_ids))
+    supplier_ids = sorted({supplier_id for supplier_id, _, _ in prices})
+    supplier_index = {supplier_id: column for column, supplier_id in enumerate(supplier_ids)}
+    unit_prices = np.full((len(product_ids), len(supplier_ids)), np.inf)
+    exact_prices = {}
+    for supplier_id, product_id, price in prices:
+        cell = (line_index[product_id], supplier_index[supplier_id])
+        unit_prices[cell] = float(price)
+        exact_prices[cell] = price
+    quantity_column = np.array([float(quantities[product_id]) for product_id in product_ids])
+    suppliers = {
+        supplier_id: (company_name, minimum)
+        for supplier_id, company_name, minimum in Supplier.objects.filter(pk__in=supplier_ids).values_list(
+            "supplier_id", "company_name", "minimum_order_value"
+        )
+    }
+    minimums = np.array([float(suppliers[supplier_id][1]) for supplier_id in supplier_ids])
+
+    costs = unit_prices * quantity_column[:, None]
+    # Whatever loading took comes out of the search; repairing to a feasible
+    # plan still runs when nothing is left
+    search_limit = max(time_limit - (time.monotonic() - started) - TIME_MARGIN, 0)
+    assignment = optimize(costs, minimums, search_limit)
+
+    names = dict(Product.objects.filter(pk__in=product_ids).values_list("product_id", "product_name"))
+    orders = {}
+    unavailable = []
+    for line, product_id in enumerate(product_ids):
+        column = int(assignment[line])
+        if column < 0:
+            unavailable.append({"product_id": product_id, "product_name": names.get(product_id)})
+            continue
+        supplier_id = supplier_ids[column]
+        order = orders.setdefault(supplier_id, {
+            "supplier_id": supplier_id,
+            "company_name": suppliers[supplier_id][0],
+            "minimum_order_value": suppliers[supplier_id][1],
+            "total": Decimal(0),
+            "lines": [],
+        })
+        unit_price = exact_prices[(line, column)]
+        line_total = (unit_price * quantities[product_id]).quantize(Decimal("0.01"))
+        order["lines"].append({
+            "product_id": product_id,
+            "product_name": names.get(product_id),
+            "quantity": quantities[product_id],
+            "unit_price": unit_price,
+            "line_total": line_total,
+        })
+        order["total"] += line_total
+
+    # Cheapest supplier per line, ignoring minimums: what the plan can at best cost
+    cheapest = costs[assignment >= 0].min(axis=1, initial=np.inf).sum()
+    return {
+        "total": sum((order["total"] for order in orders.values()), Decimal(0)),
+        "lower_bound": Decimal(str(round(float(cheapest), 2))),
+        "suppliers": sorted(orders.values(), key=lambda order: -order["total"]),
+        "unavailable": unavailable,
+        "seconds": round(time.monotonic() - started, 3),
+    }
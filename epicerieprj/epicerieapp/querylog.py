@@ -0,0 +1,215 @@
+"""
+N+1 query detection and slow-query logging for development and CI.
+
+SQL is fingerprinted (literals and parameters stripped, IN lists collapsed) so
+the same query issued once per row of a list page shows up as one fingerprint
+repeated many times within a request. Queries slower than a threshold are
+logged with the line of project code that issued them.
+
+Configured with the QUERY_INSPECTOR setting:
+
+    QUERY_INSPECTOR = {
+        "ENABLED": DEBUG,         # install QueryInspectorMiddleware
+        "SLOW_QUERY_MS": 100,     # log queries slower than this
+        "REPEAT_THRESHOLD": 5,    # flag a fingerprint repeated this often
+        "RAISE_ON_REPEAT": False, # raise instead of log (CI)
+    }
+"""
+import logging
+import re
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": False,
+    "SLOW_QUERY_MS": 100,
+    "REPEAT_THRESHOLD": 5,
+    "RAISE_ON_REPEAT": False,
+}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?|:\w+")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+_PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+_THIS_FILE = str(Path(__file__).resolve())
+
+
+def inspector_settings():
+    return {**DEFAULTS, **getattr(settings, "QUERY_INSPECTOR", {})}
+
+
+class RepeatedQueryError(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """
+    Parameter-free form of a query, e.g.
+    SELECT ... WHERE "SupplierID" = 3 AND name = 'x' -> SELECT ... WHERE "SupplierID" = ? AND name = ?
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def query_origin():
+    """
+    The innermost stack frame in project code (outside this module and
+    installed packages) that led to the current query.
+    """
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = str(Path(frame.filename).resolve())
+        if filename == _THIS_FILE or not filename.startswith(_PROJECT_ROOT):
+            continue
+        if "site-packages" in filename:
+            continue
+        return f"{Path(filename).relative_to(_PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+class QueryInspector:
+    """
+    Collects fingerprints, counts and timings of the queries run while it is
+    installed on the database connections.
+    """
+
+    def __init__(self, slow_query_ms=None, repeat_threshold=None):
+        options = inspector_settings()
+        self.slow_query_ms = options["SLOW_QUERY_MS"] if slow_query_ms is None else slow_query_ms
+        self.repeat_threshold = options["REPEAT_THRESHOLD"] if repeat_threshold is None else repeat_threshold
+        self.count = 0
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            self.count += 1
+            key = fingerprint(sql)
+            entry = self.fingerprints.get(key)
+            if entry is None:
+                entry = self.fingerprints[key] = {"count": 0, "total_ms": 0.0, "origin": query_origin()}
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            if self.slow_query_ms is not None and duration_ms >= self.slow_query_ms:
+                logger.warning(
+                    "Slow query (%.1f ms) from %s: %s", duration_ms, query_origin(), sql
+                )
+
+    @contextmanager
+    def installed(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self):
+        """
+        Fingerprints run at least ``repeat_threshold`` times, most frequent first.
+        """
+        return sorted(
+            (
+                (key, entry)
+                for key, entry in self.fingerprints.items()
+                if entry["count"] >= self.repeat_threshold
+            ),
+            key=lambda item: -item[1]["count"],
+        )
+
+    def describe(self, limit=10):
+        ranked = sorted(self.fingerprints.items(), key=lambda item: -item[1]["count"])[:limit]
+        return "\n".join(
+            f"  {entry['count']}x ({entry['total_ms']:.1f} ms) {entry['origin']}: {key}"
+            for key, entry in ranked
+        )
+
+
+class QueryInspectorMiddleware:
+    """
+    Flags N+1 patterns (the same fingerprint repeated within one request) and
+    slow queries. Only active when QUERY_INSPECTOR["ENABLED"] is true.
+    Sync and async, like PerformanceMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.options = inspector_settings()
+        if not self.options["ENABLED"]:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        inspector = QueryInspector()
+        with inspector.installed():
+            response = self.get_response(request)
+        return self.check(request, response, inspector)
+
+    async def __acall__(self, request):
+        inspector = QueryInspector()
+        # Installed on the connections of the executor thread that runs the
+        # request's ORM calls
+        stack = ExitStack()
+        try:
+            await sync_to_async(stack.enter_context)(inspector.installed())
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.check(request, response, inspector)
+
+    def check(self, request, response, inspector):
+        repeated = inspector.repeated()
+        if repeated:
+            message = f"Possible N+1 on {request.path}: " + "; ".join(
+                f"{entry['count']}x from {entry['origin']}: {key}" for key, entry in repeated
+            )
+            if self.options["RAISE_ON_REPEAT"]:
+                raise RepeatedQueryError(message)
+            logger.warning(message)
+        return response
+
+
+@contextmanager
+def assert_query_budget(max_queries, max_repeats=None):
+    """
+    Fail if the block runs more than ``max_queries`` queries, or any single
+    fingerprint more than ``max_repeats`` times:
+
+        with assert_query_budget(3, max_repeats=1):
+            self.client.get(reverse("catalog_products"))
+    """
+    inspector = QueryInspector(slow_query_ms=None)
+    with inspector.installed():
+        yield inspector
+
+    problems = []
+    if inspector.count > max_queries:
+        problems.append(f"{inspector.count} queries run, budget is {max_queries}")
+    if max_repeats is not None:
+        worst = max((entry["count"] for entry in inspector.fingerprints.values()), default=0)
+        if worst > max_repeats:
+            problems.append(f"a query was repeated {worst} times, limit is {max_repeats}")
+    if problems:
+        raise AssertionError("; ".join(problems) + "\n" + inspector.describe())
@@ -0,0 +1,387 @@
+"""
+Read replica for reports and exports.
+
+SQLite allows one writer at a time, and a long report query holds a read
+lock that, outside WAL mode, keeps POS and inventory writes from committing.
+Views decorated with @read_from_replica read from the ``replica`` database
+instead: a snapshot of ``default`` copied with SQLite's online backup API by
+`manage.py refresh_replica` (run it on a schedule, or with --every). The copy
+is first made into a temporary file, in steps so that writers to ``default``
+are not held up, and then backed up into the replica in one step: readers
+never see a half-copied database. The replica file is written in place, never
+replaced, because it cannot be replaced on Windows while a server process has
+it open.
+
+Each refresh records when its snapshot was taken. While the snapshot is
+older than MAX_LAG_SECONDS, decorated views fall back to ``default``. A view
+opted in with @read_from_replica(read_your_writes=True) also reads from
+``default`` once the request has written anything, and for a client whose
+last write is newer than the snapshot, so users see their own changes.
+ReadYourWritesMiddleware records that last write in the session for every
+request that saves or deletes this app's rows outside the branch
+databases, whichever view it goes to; it must come after SessionMiddleware.
+
+Configured with the REPORT_REPLICA setting:
+
+    REPORT_REPLICA = {
+        "ALIAS": "replica",
+        "MAX_LAG_SECONDS": 300,
+        "PAGES_PER_STEP": 1024,   # backup step size; writers can commit between steps
+        "LOCK_TIMEOUT_SECONDS": 30,  # wait for report queries holding the replica
+    }
+"""
+import contextvars
+import functools
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import sharding
+
+DEFAULTS = {
+    "ALIAS": "replica",
+    "MAX_LAG_SECONDS": 300,
+    "PAGES_PER_STEP": 1024,
+    "LOCK_TIMEOUT_SECONDS": 30,
+}
+
+SESSION_LAST_WRITE = "replica_last_write"
+
+_reads = contextvars.ContextVar("replica_reads", default=None)
+_writes = contextvars.ContextVar("replica_writes", default=None)
+
+
+class ReplicaError(Exception):
+    pass
+
+
+def replica_settings():
+    return {**DEFAULTS, **getattr(settings, "REPORT_REPLICA", {})}
+
+
+def replica_alias():
+    alias = replica_settings()["ALIAS"]
+    return alias if alias in settings.DATABASES else None
+
+
+def _database_path(alias):
+    settings_dict = settings.DATABASES[alias]
+    if settings_dict["ENGINE"] != "django.db.backends.sqlite3":
+        raise ReplicaError(f"Database {alias!r} is not SQLite; use the server's own replication instead.")
+    return Path(settings_dict["NAME"])
+
+
+def _state_path(path):
+    return path.with_name(path.name + ".json")
+
+
+# Snapshot state
+
+_state_cache = {"mtime": None, "state": None}
+_state_lock = threading.Lock()
+
+
+def snapshot_state():
+    """
+    {"snapshot_at": epoch seconds, "seconds": copy time, "bytes": size} of the
+    current replica, or None when it has never been refreshed.
+    """
+    alias = replica_alias()
+    if alias is None:
+        return None
+    path = _state_path(_database_path(alias))
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _state_lock:
+        if _state_cache["mtime"] != mtime:
+            _state_cache["state"] = json.loads(path.read_text(encoding="utf-8"))
+            _state_cache["mtime"] = mtime
+        return _state_cache["state"]
+
+
+def replica_lag():
+    """
+    Seconds since the replica's snapshot was taken, or None without one.
+    """
+    state = snapshot_state()
+    return None if state is None else max(time.time() - state["snapshot_at"], 0.0)
+
+
+def refresh_replica():
+    """
+    Copy ``default`` into the replica with the SQLite backup API and return
+    the new snapshot state.
+    """
+    alias = replica_alias()
+    if alias is None:
+        raise ReplicaError(f"No {replica_settings()['ALIAS']!r} database is configured.")
+    options = replica_settings()
+    source_path = _database_path("default")
+    target_path = _database_path(alias)
+    temp_path = target_path.with_name(target_path.name + ".tmp")
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+
+    started = time.time()
+    try:
+        _backup(source_path, temp_path, pages=options["PAGES_PER_STEP"])
+        # One step: the replica is locked only for a local file copy, and
+        # its readers see the old snapshot or the new one
+        _backup(temp_path, target_path, timeout=options["LOCK_TIMEOUT_SECONDS"])
+    except (sqlite3.Error, OSError) as exc:
+        raise ReplicaError(f"Replica refresh failed: {exc}") from exc
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+    # The backup restarts when another connection writes, so the snapshot is
+    # as of the last restart; started is a safe lower bound.
+    state = {
+        "snapshot_at": started,
+        "seconds": round(time.time() - started, 3),
+        "bytes": target_path.stat().st_size,
+    }
+    _state_path(target_path).write_text(json.dumps(state), encoding="utf-8")
+    return state
+
+
+def _backup(source_path, target_path, pages=-1, timeout=None):
+    """
+    Back up ``source_path`` into ``target_path``. sqlite3's backup() retries
+    for as long as the target is locked; with ``timeout``, it gives up after
+    that many seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def progress(status, remaining, total):
+        if status in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED) and deadline and time.monotonic() > deadline:
+            raise sqlite3.OperationalError(f"{target_path.name} stayed locked for {timeout}s")
+
+    source = sqlite3.connect(source_path)
+    # No busy handler: a locked target is retried between steps, up to the deadline
+    target = sqlite3.connect(target_path, timeout=0)
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    finally:
+        target.close()
+        source.close()
+
+
+# Routing
+
+class ReplicaReads:
+    """
+    Routing state of one decorated view call.
+    """
+
+    __slots__ = ("read_your_writes", "primary", "wrote")
+
+    def __init__(self, read_your_writes, primary):
+        self.read_your_writes = read_your_writes
+        self.primary = primary
+        self.wrote = False
+
+
+_stats_lock = threading.Lock()
+_stats = {"replica": 0, "primary": 0}
+
+
+def _record(target):
+    with _stats_lock:
+        _stats[target] += 1
+
+
+def replica_status():
+    lag = replica_lag()
+    with _stats_lock:
+        reads = dict(_stats)
+    return {
+        "alias": replica_alias(),
+        "lag_seconds": None if lag is None else round(lag, 1),
+        "max_lag_seconds": replica_settings()["MAX_LAG_SECONDS"],
+        "snapshot": snapshot_state(),
+        "view_calls": reads,
+    }
+
+
+def _use_primary(request, read_your_writes):
+    lag = replica_lag()
+    if replica_alias() is None or lag is None or lag > replica_settings()["MAX_LAG_SECONDS"]:
+        return True
+    if read_your_writes and hasattr(request, "session"):
+        last_write = request.session.get(SESSION_LAST_WRITE)
+        return last_write is not None and last_write >= snapshot_state()["snapshot_at"]
+    return False
+
+
+@contextmanager
+def _reading(request, read_your_writes):
+    state = ReplicaReads(read_your_writes, _use_primary(request, read_your_writes))
+    _record("primary" if state.primary else "replica")
+    token = _reads.set(state)
+    try:
+        yield state
+    finally:
+        _reads.reset(token)
+
+
+def _streamed(chunks, state):
+    # Streaming responses run their queries after the view returns
+    chunks = iter(chunks)
+    while True:
+        token = _reads.set(state)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            _reads.reset(token)
+        yield chunk
+
+
+async def _astreamed(chunks, state):
+    chunks = aiter(chunks)
+    while True:
+        token = _reads.set(state)
+        try:
+            chunk = await anext(chunks)
+        except StopAsyncIteration:
+            return
+        finally:
+            _reads.reset(token)
+        yield chunk
+
+
+def read_from_replica(view=None, *, read_your_writes=False):
+    """
+    Route the view's catalog reads to the replica while it is fresh enough.
+    With read_your_writes=True, reads go to ``default`` after the view or
+    the client's earlier requests wrote data the snapshot does not have.
+    """
+    if view is None:
+        return functools.partial(read_from_replica, read_your_writes=read_your_writes)
+
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            with _reading(request, read_your_writes):
+                return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with _reading(request, read_your_writes) as state:
+                response = view(request, *args, **kwargs)
+            if response.streaming:
+                streamed = _astreamed if response.is_async else _streamed
+                response.streaming_content = streamed(response.streaming_content, state)
+            return response
+
+    return wrapper
+
+
+def note_write(sender, **kwargs):
+    # Only writes the replica can be behind on
+    if sender._meta.app_label != "epicerieapp" or sharding.is_branch_model(sender):
+        return
+    for state in (_reads.get(), _writes.get()):
+        if state is not None:
+            state.wrote = True
+
+
+class RequestWrites:
+    """
+    Whether the current request wrote anything. A mutable object, so writes
+    made in the threads running an async request's ORM calls are seen too.
+    """
+
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+
+class ReadYourWritesMiddleware:
+    """
+    Stores the time of the request's writes in the session, so the client's
+    later read_your_writes views read from ``default`` until a replica
+    snapshot includes them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        writes = RequestWrites()
+        token = _writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _writes.reset(token)
+        self.remember(request, writes)
+        return response
+
+    async def __acall__(self, request):
+        writes = RequestWrites()
+        token = _writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _writes.reset(token)
+        # Setting a session key loads the session, which may query the database
+        await sync_to_async(self.remember)(request, writes)
+        return response
+
+    def remember(self, request, writes):
+        if writes.wrote and hasattr(request, "session"):
+            request.session[SESSION_LAST_WRITE] = time.time()
+
+
+class ReplicaRouter:
+    """
+    Sends this app's reads made inside @read_from_replica views to the
+    replica. Sessions and users always come from the primary, and branch
+    models are left to BranchRouter, which is listed after this router.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _reads.get()
+        if state is None or state.primary:
+            return None
+        if model._meta.app_label != "epicerieapp" or sharding.is_branch_model(model):
+            return None
+        if state.read_your_writes and state.wrote:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        # Objects read from the replica are saved to the primary
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db == replica_alias():
+            return "default"
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its tables from the backup, never from migrate
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,122 @@
+"""
+Report result cache invalidated by per-table change versions.
+
+Every cached report records which tables it reads. The cache key includes the
+current TableVersions counter of each of those tables, so a change to any of
+them (bumped by model signals here, or by the triggers in mssql_schema.sql for
+writes made by the desktop client) makes the next request miss and recompute,
+while unrelated changes leave the cached result in place.
+"""
+import hashlib
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import TableVersion
+from .perf import record_cache_lookup
+
+CACHE_KEY_PREFIX = "report"
+
+
+def _timeout():
+    return getattr(settings, "REPORT_CACHE_TIMEOUT", 60 * 60)
+
+
+# Versions
+
+def bump_versions(*tables):
+    """
+    Increment the change version of each table. Call this after bulk writes
+    (bulk_create, queryset.update, raw SQL) that bypass model signals.
+    """
+    for table in tables:
+        updated = TableVersion.objects.filter(table_name=table).update(version=F("version") + 1)
+        if not updated:
+            TableVersion.objects.get_or_create(table_name=table, defaults={"version": 1})
+
+
+def table_versions(tables):
+    """
+    Current change version of each table, 0 for tables never changed.
+    """
+    versions = dict(
+        TableVersion.objects.filter(table_name__in=tables).values_list("table_name", "version")
+    )
+    return {table: versions.get(table, 0) for table in tables}
+
+
+# Metrics
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+def _record(report_name, outcome):
+    with _stats_lock:
+        _stats[report_name][outcome] += 1
+    record_cache_lookup(outcome == "hits")
+
+
+def cache_stats():
+    """
+    Hit/miss counters per report name for this process.
+    """
+    with _stats_lock:
+        return {
+            name: dict(counts, hit_ratio=counts["hits"] / ((counts["hits"] + counts["misses"]) or 1))
+            for name, counts in _stats.items()
+        }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# Cache
+
+def cache_key(report_name, params, versions):
+    payload = json.dumps({"params": params, "versions": versions}, sort_keys=True, default=str)
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{report_name}:{digest}"
+
+
+def get_or_compute(report_name, tables, compute, params=None, timeout=None):
+    """
+    Return the cached result of ``compute(**params)`` for the current versions
+    of ``tables``, computing and storing it on a miss.
+    """
+    params = params or {}
+    key = cache_key(report_name, params, table_versions(tables))
+
+    result = cache.get(key)
+    if result is not None:
+        _record(report_name, "hits")
+        return result
+
+    _record(report_name, "misses")
+    result = compute(**params)
+    cache.set(key, result, _timeout() if timeout is None else timeout)
+    return result
+
+
+def cached_report(report_name, tables, timeout=None):
+    """
+    Decorator form of get_or_compute; keyword arguments become the cache
+    parameters.
+    """
+
+    def decorator(compute):
+        def wrapper(**params):
+            return get_or_compute(report_name, tables, compute, params=params, timeout=timeout)
+
+        wrapper.__name__ = compute.__name__
+        wrapper.__doc__ = compute.__doc__
+        wrapper.uncached = compute
+        return wrapper
+
+    return decorator
@@ -0,0 +1,290 @@
+"""
+Report definitions for the Reporting & Utilities use cases
+(Generate Supplier List Report, Generate Product Catalog Report), and the
+price trends of the "View Price History" use case.
+"""
+import threading
+
+import numpy as np
+from django.db import connection
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.http import Http404, StreamingHttpResponse
+
+from library.price_history import MAX_PERIODS, PriceHistory
+
+from . import cdc, exports, sharding
+from .models import ChangeLog, Product, Sale, SaleLine, Supplier, SupplierProductCatalog
+from .report_cache import cached_report
+
+ITERATOR_CHUNK_SIZE = 2000
+
+# Price rows per query when checking the dates of new prices
+QUERY_CHUNK = 500
+
+
+class Report:
+    """
+    A named export: column headers plus a function returning the
+    ``values_list`` queryset of its rows.
+    """
+
+    def __init__(self, name, title, columns, queryset):
+        self.name = name
+        self.title = title
+        self.columns = columns
+        self.queryset = queryset
+
+    def rows(self):
+        # Lazy row iterator
+        return self.queryset().iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+    def count(self):
+        return self.queryset().count()
+
+
+def supplier_list_rows():
+    return (
+        Supplier.objects.order_by("company_name")
+        .values_list("supplier_id", "tin", "company_name", "status", "date_created", "date_updated")
+    )
+
+
+def product_catalog_rows():
+    return (
+        SupplierProductCatalog.objects.order_by(
+            "product__product_name", "supplier__company_name", "-price_entry_date"
+        )
+        .values_list(
+            "product__product_id",
+            "product__product_name",
+            "product__category",
+            "product__unit_of_measure",
+            "supplier__company_name",
+            "supplier__tin",
+            "supplier_product_code",
+            "dealers_price",
+            "price_entry_date",
+        )
+    )
+
+
+REPORTS = {
+    report.name: report
+    for report in [
+        Report(
+            "suppliers",
+            "Supplier List",
+            ["Supplier ID", "TIN", "Company Name", "Status", "Date Created", "Date Updated"],
+            supplier_list_rows,
+        ),
+        Report(
+            "product-catalog",
+            "Product Catalog",
+            [
+                "Product ID",
+                "Product Name",
+                "Category",
+                "Unit of Measure",
+                "Supplier",
+                "Supplier TIN",
+                "Supplier Product Code",
+                "Dealers Price",
+                "Price Entry Date",
+            ],
+            product_catalog_rows,
+        ),
+    ]
+}
+
+
+def export_response(report, fmt, asynchronous=False):
+    """
+    Build a StreamingHttpResponse that writes ``report`` as CSV or XLSX.
+    Pass asynchronous=True when serving under ASGI.
+    """
+    stats = exports.ExportStats(f"{report.name}.{fmt}")
+    if fmt == "csv":
+        chunks = exports.csv_chunks(report.columns, report.rows(), stats)
+        content_type = exports.CSV_CONTENT_TYPE
+    elif fmt == "xlsx":
+        chunks = exports.xlsx_chunks(report.columns, report.rows(), stats, sheet_name=report.title)
+        content_type = exports.XLSX_CONTENT_TYPE
+    else:
+        raise Http404(f"Unsupported export format: {fmt}")
+
+    chunks = exports.instrumented(chunks, stats)
+    if asynchronous:
+        chunks = exports.async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{report.name}.{fmt}"'
+    return response
+
+
+@cached_report(
+    "catalog-summary",
+    tables=[Supplier._meta.db_table, Product._meta.db_table, SupplierProductCatalog._meta.db_table],
+)
+def catalog_summary(category=None):
+    """
+    Supplier/product counts and per-product price statistics, optionally
+    limited to one product category.
+    """
+    products = Product.objects.all()
+    prices = SupplierProductCatalog.objects.all()
+    if category:
+        products = products.filter(category=category)
+        prices = prices.filter(product__category=category)
+
+    price_stats = (
+        prices.values("product__product_id", "product__product_name")
+        .annotate(
+            min_price=Min("dealers_price"),
+            max_price=Max("dealers_price"),
+            avg_price=Avg("dealers_price"),
+            suppliers=Count("supplier", distinct=True),
+            last_price_date=Max("price_entry_date"),
+        )
+        .order_by("product__product_name")
+    )
+    return {
+        "suppliers_by_status": dict(
+            Supplier.objects.values_list("status").annotate(Count("pk")).order_by()
+        ),
+        "products_by_category": dict(
+            products.values_list("category").annotate(Count("pk")).order_by()
+        ),
+        "prices": list(price_stats),
+    }
+
+
+def branch_sales_summary(since=None, until=None):
+    """
+    Sales count and revenue per branch and across all branches, and units
+    sold per product across all branches, optionally limited to sales on or
+    after ``since`` and before ``until``. Branches are queried in parallel.
+    """
+
+    def branch_totals(alias):
+        sales = Sale.objects.using(alias).all()
+        if since:
+            sales = sales.filter(sold_at__gte=since)
+        if until:
+            sales = sales.filter(sold_at__lt=until)
+        lines = SaleLine.objects.using(alias).filter(sale__in=sales)
+        totals = sales.aggregate(sales=Count("pk"), revenue=Sum("total"))
+        units = dict(lines.values_list("product_id").annotate(Sum("quantity")).order_by())
+        return totals, units
+
+    results = sharding.gather(branch_totals)
+    per_branch = {branch: totals for branch, (totals, _) in results.items()}
+    units = sharding.merge_totals({branch: units for branch, (_, units) in results.items()})
+    names = dict(Product.objects.filter(pk__in=units).values_list("product_id", "product_name"))
+    return {
+        "branches": per_branch,
+        "total": sharding.merge_totals(per_branch),
+        "units_sold": [
+            {"product_id": product_id, "product_name": names.get(product_id), "units": quantity}
+            for product_id, quantity in sorted(units.items(), key=lambda item: item[1], reverse=True)
+        ],
+    }
+
+
+# Price trends
+
+PRICE_PERIODS = ("D", "W", "M", "Y")
+# Longest moving-average window, in periods
+MAX_PRICE_WINDOW = MAX_PERIODS
+
+# Columnar copy of the price history of the default database, kept up to
+# date from the change log by _update_price_history()
+_price_history = PriceHistory(connection, placeholder="%s")
+_price_history_lock = threading.Lock()
+_price_history_position = None
+
+
+def _price_entry_dates(row_ids):
+    for start in range(0, len(row_ids), QUERY_CHUNK):
+        yield from SupplierProductCatalog.objects.filter(pk__in=row_ids[start:start + QUERY_CHUNK]).values_list(
+            "price_entry_date", flat=True
+        )
+
+
+def _update_price_history():
+    """
+    Bring the price history up to date with the prices changed since the
+    last call: prices entered on or after its latest date are merged in by
+    refresh(); an edited, deleted or back-dated price needs reload().
+    """
+    global _price_history_position
+    table = SupplierProductCatalog._meta.db_table
+    if _price_history_position is None:
+        # Changes made while loading are applied again by the next update
+        _price_history_position = ChangeLog.objects.aggregate(last=Max("change_id"))["last"] or 0
+        _price_history.reload()
+        return
+
+    consumer = cdc.Consumer("price-trends", tables=[table])
+    changes = {}
+    while True:
+        batch = consumer.poll(after=_price_history_position)
+        if consumer.position == consumer.polled_from:
+            break
+        changes.update(cdc.collapse(batch).get(table, {}))
+        _price_history_position = consumer.position
+    if not changes:
+        return
+
+    inserted = [row_id for row_id, operation in changes.items() if operation == cdc.INSERT]
+    latest = _price_history.last_entry_date
+    if (
+        len(inserted) < len(changes)
+        or latest is None
+        or any(np.datetime64(day, "D") < latest for day in _price_entry_dates(inserted))
+    ):
+        _price_history.reload()
+    else:
+        _price_history.refresh()
+
+
+def _amount(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def price_trends(period="M", window=3):
+    """
+    For every product with prices: its lowest, highest and average price
+    over all suppliers, the spread between its current supplier prices, and
+    the change and ``window``-period moving average of its average price in
+    the latest ``period`` ("D", "W", "M" or "Y"), computed over the whole
+    price history at once.
+    """
+    with _price_history_lock:
+        _update_price_history()
+        stats = _price_history.product_stats()
+        spreads = _price_history.supplier_spreads()
+        # Only the periods the latest change and moving average need
+        changes = _price_history.period_over_period(period, periods=2)
+        moving = _price_history.moving_average(window, period, periods=window)
+
+    # Every result has one row per product, in product id order
+    names = dict(Product.objects.values_list("product_id", "product_name"))
+    periods = changes["period"]
+    return {
+        "period": str(periods[-1]) if len(periods) else None,
+        "products": [
+            {
+                "product_id": int(product_id),
+                "product_name": names.get(int(product_id)),
+                "prices": int(stats["count"][row]),
+                "min_price": _amount(stats["min"][row]),
+                "max_price": _amount(stats["max"][row]),
+                "avg_price": _amount(stats["avg"][row]),
+                "suppliers": int(spreads["suppliers"][row]),
+                "cheapest_supplier_id": int(spreads["cheapest_supplier_id"][row]),
+                "current_spread": _amount(spreads["spread"][row]),
+                "change_pct": _amount(changes["change_pct"][row, -1]),
+                "moving_avg": _amount(moving["moving_avg"][row, -1]),
+            }
+            for row, product_id in enumerate(stats["product_id"])
+        ],
+    }
@@ -0,0 +1,198 @@
+"""
+Per-branch databases for the stores' transactional tables.
+
+Each branch code in the BRANCHES setting has its own database alias,
+``branch_<code>``, holding the models in BRANCH_MODELS (sales, sale lines,
+stock movements, suggested orders). Everything else, including the shared
+supplier and product catalog, stays in ``default``. A busy branch then only
+contends with its own writes, and a damaged branch file takes down one
+store, not all of them.
+
+BranchRouter sends branch models to the branch selected for the current
+request or task:
+
+    with using_branch("makati"):
+        Sale.objects.create(...)
+
+BranchMiddleware selects it per request: the ``branch`` key of a signed-in
+user's session (set by the select-branch view), else DEFAULT_BRANCH. Request
+headers are not trusted to pick a branch; POS devices get theirs from
+POS_DEVICE_TOKENS. Reports spanning stores use gather(), which runs a
+function against every branch in parallel and returns the results per
+branch for merging.
+
+`manage.py shards` lists, creates and migrates the branch databases.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+BRANCH_ALIAS_PREFIX = "branch_"
+
+BRANCH_MODELS = {"sale", "saleline", "stockmovement", "suggestedorder"}
+
+_current_branch = contextvars.ContextVar("branch", default=None)
+
+
+class BranchError(Exception):
+    pass
+
+
+def branches():
+    return list(getattr(settings, "BRANCHES", []))
+
+
+def branch_alias(branch):
+    if branch not in branches():
+        raise BranchError(f"Unknown branch {branch!r}; add it to the BRANCHES setting.")
+    return BRANCH_ALIAS_PREFIX + branch
+
+
+def is_branch_alias(alias):
+    return alias.startswith(BRANCH_ALIAS_PREFIX) and alias[len(BRANCH_ALIAS_PREFIX):] in branches()
+
+
+def is_branch_model(model):
+    return model._meta.app_label == "epicerieapp" and model._meta.model_name in BRANCH_MODELS
+
+
+def current_branch():
+    return _current_branch.get() or getattr(settings, "DEFAULT_BRANCH", None)
+
+
+@contextmanager
+def using_branch(branch):
+    """
+    Route branch models to ``branch`` inside the block. Nests, and is local
+    to the thread or asyncio task.
+    """
+    branch_alias(branch)
+    token = _current_branch.set(branch)
+    try:
+        yield branch
+    finally:
+        _current_branch.reset(token)
+
+
+class BranchRouter:
+    def _branch_db(self, model, **hints):
+        if not is_branch_model(model):
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        branch = current_branch()
+        if branch is None:
+            raise BranchError(
+                f"No branch selected for {model.__name__}; use using_branch() or set DEFAULT_BRANCH."
+            )
+        return branch_alias(branch)
+
+    def db_for_read(self, model, **hints):
+        return self._branch_db(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._branch_db(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_branch_model(type(obj1)) or is_branch_model(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name is None:
+            return None
+        sharded = app_label == "epicerieapp" and model_name in BRANCH_MODELS
+        return sharded == is_branch_alias(db)
+
+
+class BranchMiddleware:
+    """
+    Selects the request's branch from the signed-in user's session. Goes
+    after AuthenticationMiddleware. Sync and async: the branch is a context
+    variable, which sync_to_async carries into the thread running an async
+    view's ORM calls.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        branch = self.select(request)
+        if branch is None:
+            return self.get_response(request)
+        with using_branch(branch):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Reading the user and session may query the database
+        branch = await sync_to_async(self.select)(request)
+        if branch is None:
+            return await self.get_response(request)
+        with using_branch(branch):
+            return await self.get_response(request)
+
+    def select(self, request):
+        branch = None
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            branch = request.session.get("branch")
+        branch = branch or current_branch()
+        if branch not in branches():
+            return None
+        request.branch = branch
+        return branch
+
+
+# Cross-branch queries
+
+def _run_on_branch(branch, func):
+    alias = branch_alias(branch)
+    try:
+        with using_branch(branch):
+            return func(alias)
+    finally:
+        # Worker threads get their own connections; don't leave them open
+        connections[alias].close()
+
+
+def gather(func, branch_list=None, max_workers=None):
+    """
+    Call ``func(alias)`` for every branch in parallel, with that branch
+    selected, and return {branch: result} in BRANCHES order. Each call runs
+    in its own thread with its own database connection.
+    """
+    branch_list = branches() if branch_list is None else list(branch_list)
+    if not branch_list:
+        return {}
+    workers = max_workers or getattr(settings, "BRANCH_QUERY_WORKERS", None) or len(branch_list)
+    with ThreadPoolExecutor(max_workers=min(workers, len(branch_list))) as executor:
+        futures = {branch: executor.submit(_run_on_branch, branch, func) for branch in branch_list}
+        return {branch: future.result() for branch, future in futures.items()}
+
+
+def merge_totals(results):
+    """
+    Sum the per-branch dicts returned by gather() key by key; None values
+    (aggregates over no rows) count as zero.
+    """
+    merged = {}
+    for values in results.values():
+        for key, value in values.items():
+            if value is not None:
+                merged[key] = merged.get(key, 0) + value
+            else:
+                merged.setdefault(key, 0)
+    return merged
@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_save
+
+from .models import (
+    ContactPerson,
+    Product,
+    Supplier,
+    SupplierAddress,
+    SupplierContactNumber,
+    SupplierEmailAddress,
+    SupplierProductCatalog,
+)
+from . import cdc
+from .replicas import note_write
+from .report_cache import bump_versions
+
+VERSIONED_MODELS = [
+    Supplier,
+    SupplierAddress,
+    SupplierContactNumber,
+    SupplierEmailAddress,
+    ContactPerson,
+    Product,
+    SupplierProductCatalog,
+]
+
+
+def bump_table_version(sender, **kwargs):
+    bump_versions(sender._meta.db_table)
+
+
+def connect_signals():
+    for model in VERSIONED_MODELS:
+        post_save.connect(bump_table_version, sender=model, dispatch_uid=f"version-save-{model.__name__}")
+        post_delete.connect(bump_table_version, sender=model, dispatch_uid=f"version-delete-{model.__name__}")
+    for model in cdc.CAPTURED_MODELS:
+        post_save.connect(cdc.log_save, sender=model, dispatch_uid=f"changelog-save-{model.__name__}")
+        post_delete.connect(cdc.log_delete, sender=model, dispatch_uid=f"changelog-delete-{model.__name__}")
+    # Any write switches read-your-writes views back to the primary
+    post_save.connect(note_write, dispatch_uid="replica-note-save")
+    post_delete.connect(note_write, dispatch_uid="replica-note-delete")
@@ -0,0 +1,415 @@
+"""
+In-memory barcode/SKU lookup for the POS counters.
+
+Counters scan continuously, and a database round trip per scan is visible
+lag at a busy till. Products with a SKU are kept in a SkuIndex in each server
+process instead: a dict from SKU to a slot in parallel arrays holding the
+product's id, name, unit, status and current price, so a lookup is one dict
+probe and a few list reads. The current price is the lowest latest dealers
+price among active suppliers, the same rule as the catalog product page.
+
+The index is loaded in a background thread, started when a serving process
+starts (wsgi.py and asgi.py call sku_lookup.start()), and then refreshed
+from the change log (cdc.py) every REFRESH_SECONDS: only products and prices
+that changed since the last refresh are re-read. A thread does not survive
+a fork, so a process forked from one that had started the index starts its
+own at once; preforking servers that load the application before forking
+get an index in every worker. A lookup in a process without its own thread
+starts one as well. Until the first load finishes, lookups go to the
+database; a failed load or refresh is retried with exponential backoff.
+Each process reads the log from its own in-memory position and does not
+commit a consumer offset, since a restarted process reloads everything
+anyway.
+
+Configured with the SKU_LOOKUP setting:
+
+    SKU_LOOKUP = {
+        "ENABLED": True,      # False: every lookup queries the database
+        "REFRESH_SECONDS": 1.0,
+        "RETRY_MAX_SECONDS": 60,
+        "LOAD_CHUNK": 5000,   # rows fetched per query while loading
+    }
+"""
+import logging
+import os
+import threading
+import time
+from array import array
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import Max, Min, OuterRef, Subquery
+
+from . import cdc
+from .models import ChangeLog, Product, Supplier, SupplierProductCatalog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "REFRESH_SECONDS": 1.0,
+    "RETRY_MAX_SECONDS": 60,
+    "LOAD_CHUNK": 5000,
+}
+
+CONSUMER_NAME = "sku-index"
+
+# Price slot value of a product no active supplier prices
+NO_PRICE = -1
+
+
+def sku_settings():
+    return {**DEFAULTS, **getattr(settings, "SKU_LOOKUP", {})}
+
+
+def to_cents(price):
+    return NO_PRICE if price is None else int(price * 100)
+
+
+def from_cents(cents):
+    return None if cents == NO_PRICE else Decimal(cents).scaleb(-2)
+
+
+# Index
+
+class SkuRecord:
+    __slots__ = ("product_id", "sku", "name", "unit", "status", "price")
+
+    def __init__(self, product_id, sku, name, unit, status, price):
+        self.product_id = product_id
+        self.sku = sku
+        self.name = name
+        self.unit = unit
+        self.status = status
+        self.price = price
+
+    def as_dict(self):
+        return {
+            "sku": self.sku,
+            "product_id": self.product_id,
+            "name": self.name,
+            "unit": self.unit,
+            "status": self.status,
+            "price": self.price,
+        }
+
+
+class SkuIndex:
+    """
+    Products by SKU. Ids and prices (in centavos) are stored in typed arrays
+    and the strings in plain lists, one slot per product; units and statuses
+    are shared between slots. Slots of removed products are reused.
+
+    Updates come from a single thread; lookups from other threads see each
+    field either before or after an update.
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.by_product = {}
+        self.product_ids = array("q")
+        self.prices = array("q")
+        self.skus = []
+        self.names = []
+        self.units = []
+        self.statuses = []
+        self.free = []
+        self._shared = {}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get(self, sku):
+        slot = self.slots.get(sku)
+        if slot is None:
+            return None
+        return SkuRecord(
+            self.product_ids[slot],
+            self.skus[slot],
+            self.names[slot],
+            self.units[slot],
+            self.statuses[slot],
+            from_cents(self.prices[slot]),
+        )
+
+    def put(self, product_id, sku, name, unit, status):
+        """
+        Add or update a product. A new product has no price until
+        set_price().
+        """
+        unit = self._shared.setdefault(unit, unit)
+        status = self._shared.setdefault(status, status)
+        slot = self.by_product.get(product_id)
+        if slot is not None:
+            old_sku = self.skus[slot]
+            # The old SKU may already belong to another product
+            if old_sku != sku and self.slots.get(old_sku) == slot:
+                del self.slots[old_sku]
+            self.skus[slot] = sku
+            self.names[slot] = name
+            self.units[slot] = unit
+            self.statuses[slot] = status
+        elif self.free:
+            slot = self.free.pop()
+            self.product_ids[slot] = product_id
+            self.prices[slot] = NO_PRICE
+            self.skus[slot] = sku
+            self.names[slot] = name
+            self.units[slot] = unit
+            self.statuses[slot] = status
+        else:
+            slot = len(self.skus)
+            self.product_ids.append(product_id)
+            self.prices.append(NO_PRICE)
+            self.skus.append(sku)
+            self.names.append(name)
+            self.units.append(unit)
+            self.statuses.append(status)
+        self.by_product[product_id] = slot
+        self.slots[sku] = slot
+
+    def set_price(self, product_id, cents):
+        slot = self.by_product.get(product_id)
+        if slot is not None:
+            self.prices[slot] = cents
+
+    def remove(self, product_id):
+        slot = self.by_product.pop(product_id, None)
+        if slot is None:
+            return
+        if self.slots.get(self.skus[slot]) == slot:
+            del self.slots[self.skus[slot]]
+        self.prices[slot] = NO_PRICE
+        self.skus[slot] = self.names[slot] = self.units[slot] = self.statuses[slot] = None
+        self.free.append(slot)
+
+
+# Loading
+
+def product_rows(product_ids=None):
+    """
+    (product_id, sku, name, unit, status) of products that have a SKU.
+    """
+    products = Product.objects.exclude(sku=None).exclude(sku="")
+    if product_ids is not None:
+        products = products.filter(product_id__in=product_ids)
+    rows = products.values_list("product_id", "sku", "product_name", "unit_of_measure", "status")
+    return rows.iterator(chunk_size=sku_settings()["LOAD_CHUNK"])
+
+
+def current_prices(product_ids=None):
+    """
+    (product_id, price) pairs: the lowest of the active suppliers' latest
+    dealers prices for each product.
+    """
+    latest_date = (
+        SupplierProductCatalog.objects.filter(supplier=OuterRef("supplier"), product=OuterRef("product"))
+        .order_by("-price_entry_date")
+        .values("price_entry_date")[:1]
+    )
+    offers = SupplierProductCatalog.objects.filter(
+        price_entry_date=Subquery(latest_date), supplier__status="Active"
+    )
+    if product_ids is not None:
+        offers = offers.filter(product_id__in=product_ids)
+    prices = offers.values("product_id").order_by("product_id").annotate(price=Min("dealers_price"))
+    return prices.values_list("product_id", "price").iterator(chunk_size=sku_settings()["LOAD_CHUNK"])
+
+
+def load_index():
+    index = SkuIndex()
+    for row in product_rows():
+        index.put(*row)
+    for product_id, price in current_prices():
+        index.set_price(product_id, to_cents(price))
+    return index
+
+
+# Lookup service
+
+class SkuLookup:
+    def __init__(self):
+        self.index = None
+        # Last change log entry reflected in the index
+        self.position = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.refreshed_at = None
+        # Approximate under concurrent requests; not worth a lock per scan
+        self.lookups = {"memory": 0, "database": 0}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # Process that started the thread; a forked child must start its own
+        self._pid = None
+        self._stop = threading.Event()
+
+    @property
+    def ready(self):
+        return self.index is not None
+
+    def lookup(self, sku):
+        """
+        (SkuRecord or None, "memory" or "database").
+        """
+        if self._pid != os.getpid():
+            self.start()
+        index = self.index
+        if index is not None:
+            self.lookups["memory"] += 1
+            return index.get(sku), "memory"
+        self.lookups["database"] += 1
+        row = next(iter(Product.objects.filter(sku=sku).values_list(
+            "product_id", "sku", "product_name", "unit_of_measure", "status"
+        )), None)
+        if row is None:
+            return None, "database"
+        price = next(current_prices([row[0]]), (None, None))[1]
+        return SkuRecord(*row, from_cents(to_cents(price))), "database"
+
+    def warm(self):
+        """
+        Load the whole index and swap it in. Returns the number of SKUs.
+        """
+        with self._lock:
+            started = time.monotonic()
+            # Changes made while loading are applied again by the next refresh
+            position = ChangeLog.objects.aggregate(last=Max("change_id"))["last"] or 0
+            index = load_index()
+            self.index, self.position = index, position
+            self.load_seconds = round(time.monotonic() - started, 3)
+            self.loaded_at = self.refreshed_at = time.time()
+        logger.info("SKU index loaded: %d SKUs in %ss", len(index), self.load_seconds)
+        return len(index)
+
+    def refresh(self):
+        """
+        Apply changes logged since the last load or refresh. Returns the
+        number of changes applied.
+        """
+        if not self.ready:
+            return 0
+        with self._lock:
+            consumer = cdc.Consumer(
+                CONSUMER_NAME,
+                tables=[Supplier._meta.db_table, Product._meta.db_table, SupplierProductCatalog._meta.db_table],
+            )
+            applied = 0
+            while True:
+                batch = consumer.poll(after=self.position)
+                if consumer.position == consumer.polled_from:
+                    break
+                self._apply(cdc.collapse(batch))
+                self.position = consumer.position
+                applied += len(batch)
+            self.refreshed_at = time.time()
+        return applied
+
+    def _apply(self, tables):
+        index = self.index
+        products = tables.get(Product._meta.db_table, {})
+        catalog = tables.get(SupplierProductCatalog._meta.db_table, {})
+
+        changed = set()
+        for product_id, operation in products.items():
+            if operation == cdc.DELETE:
+                index.remove(product_id)
+            else:
+                changed.add(product_id)
+        if changed:
+            found = set()
+            for row in product_rows(changed):
+                index.put(*row)
+                found.add(row[0])
+            # Products whose SKU was cleared
+            for product_id in changed - found:
+                index.remove(product_id)
+
+        # A deleted price row or a supplier status change can move the lowest
+        # price of any product, and the log does not say which: reprice all.
+        if Supplier._meta.db_table in tables or cdc.DELETE in catalog.values():
+            self._reprice(None)
+            return
+        repriced = changed | set(
+            SupplierProductCatalog.objects.filter(pk__in=list(catalog)).values_list("product_id", flat=True)
+        )
+        if repriced:
+            self._reprice([product_id for product_id in repriced if product_id in index.by_product])
+
+    def _reprice(self, product_ids):
+        index = self.index
+        prices = {product_id: to_cents(price) for product_id, price in current_prices(product_ids)}
+        for product_id in index.by_product if product_ids is None else product_ids:
+            index.set_price(product_id, prices.get(product_id, NO_PRICE))
+
+    # Background loading and refreshing
+
+    def start(self):
+        """
+        Load the index and keep it fresh from a daemon thread of this
+        process, unless SKU_LOOKUP["ENABLED"] is false.
+        """
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # An index inherited over a fork would be refreshed by nobody
+            self.index = None
+            if not sku_settings()["ENABLED"]:
+                return
+            threading.Thread(target=self._run, name="sku-index", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _after_fork(self):
+        # Only this thread survives a fork; locks held by others never unlock
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        if self._pid is not None:
+            self.start()
+
+    def _run(self):
+        options = sku_settings()
+        failures = 0
+        while True:
+            action = "refresh" if self.ready else "load"
+            try:
+                if self.ready:
+                    self.refresh()
+                else:
+                    self.warm()
+            except Exception as exc:
+                # E.g. an unmigrated database: log the traceback once, then
+                # retry less and less often
+                failures += 1
+                delay = min(options["REFRESH_SECONDS"] * 2 ** failures, options["RETRY_MAX_SECONDS"])
+                if failures == 1:
+                    logger.exception("SKU index %s failed, retrying in %ss", action, delay)
+                else:
+                    logger.warning("SKU index %s failed again, retrying in %ss: %s", action, delay, exc)
+            else:
+                failures = 0
+                delay = options["REFRESH_SECONDS"]
+            finally:
+                close_old_connections()
+            if self._stop.wait(delay):
+                break
+        connections.close_all()
+
+    def status(self):
+        index = self.index
+        return {
+            "ready": index is not None,
+            "skus": len(index) if index is not None else 0,
+            "position": self.position,
+            "load_seconds": self.load_seconds,
+            "refresh_age_seconds": (
+                round(time.time() - self.refreshed_at, 1) if self.refreshed_at is not None else None
+            ),
+            "lookups": dict(self.lookups),
+        }
+
+
+sku_lookup = SkuLookup()
+os.register_at_fork(after_in_child=sku_lookup._after_fork)
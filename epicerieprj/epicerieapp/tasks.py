@@ -0,0 +1,96 @@
+"""
+Background tasks run by `manage.py run_workers` (see jobs.py).
+"""
+import datetime
+import importlib.util
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from django.conf import settings
+
+from . import exports, forecasting, jobs, reports
+from .importers import import_price_list
+from .models import Supplier
+
+
+def output_dir():
+    path = Path(jobs.job_settings().get("OUTPUT_DIR") or settings.BASE_DIR / "db/job_output")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def reversal_utilities():
+    # The archive/restore script kept with the documentation; it is not in a
+    # package, so it is loaded from its path
+    path = Path(settings.BASE_DIR) / "_documentation/reversalutilities.py"
+    spec = importlib.util.spec_from_file_location("reversalutilities", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@jobs.task("import-price-list")
+def import_price_list_task(context, path, supplier_id, price_entry_date=None, create_products=True):
+    context.progress(0, message="Importing")
+    summary = import_price_list(
+        path,
+        Supplier.objects.get(pk=supplier_id),
+        price_entry_date=datetime.date.fromisoformat(price_entry_date) if price_entry_date else None,
+        create_products=create_products,
+    )
+    return summary
+
+
+@jobs.task("export-report")
+def export_report_task(context, report_name, fmt="csv"):
+    report = reports.REPORTS[report_name]
+    stats = exports.ExportStats(f"{report.name}.{fmt}")
+    if fmt == "xlsx":
+        chunks = exports.xlsx_chunks(report.columns, report.rows(), stats, sheet_name=report.title)
+    else:
+        chunks = exports.csv_chunks(report.columns, report.rows(), stats)
+
+    total = report.count()
+
+    def progress(stats):
+        context.progress(stats.rows, total, message=f"{stats.rows} of {total} rows written")
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    target = output_dir() / f"{report.name}-{stamp}-{context.job_id}.{fmt}"
+    with open(target, "wb") as file:
+        for chunk in exports.instrumented(chunks, stats, progress):
+            file.write(chunk)
+    return {"path": str(target), "rows": stats.rows, "bytes": stats.bytes}
+
+
+@jobs.task("forecast-orders")
+def forecast_orders_task(context, branches=None):
+    context.progress(0, message="Forecasting")
+    return forecasting.run_forecast(branches)
+
+
+@jobs.task("archive")
+def archive_task(context, source, destination):
+    """
+    Copy new and changed files from ``source`` to ``destination`` with
+    copy_updated_files() of the reversal utilities. The files it reports go
+    to a log in OUTPUT_DIR instead of the worker's console.
+    """
+    if not Path(source).is_dir():
+        raise jobs.JobError(f"Source folder {source!r} does not exist.")
+    context.progress(0, message="Archiving")
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    log_path = output_dir() / f"archive-{stamp}-{context.job_id}.log"
+    with open(log_path, "w", encoding="utf-8") as log, redirect_stdout(log):
+        summary = reversal_utilities().copy_updated_files(source, destination)
+    return {**summary, "log": str(log_path)}
+
+
+@jobs.task("noop")
+def noop_task(context, seconds=0):
+    """
+    Does nothing (after sleeping ``seconds``); used by bench_jobs.
+    """
+    if seconds:
+        time.sleep(seconds)
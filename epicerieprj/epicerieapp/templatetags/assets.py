@@ -0,0 +1,119 @@
+"""
+Tags that switch templates over to the output of the asset build commands.
+
+    {% load assets %}
+    {% stylesheets %}
+        <link href="{% static 'css/bootstrap.min.css' %}" rel="stylesheet">
+        ...
+    {% endstylesheets %}
+    {% font_preloads %}
+    {% responsive_image 'homeapp/images/hero-bg.jpg' alt="" sizes="100vw" %}
+
+Once build_css has run, the stylesheets block is replaced by the page's
+critical CSS inlined in a <style> element and the purged bundle loaded
+without blocking rendering. Until then, or with CSS_BUNDLE_ENABLED off, the
+block renders as written. responsive_image likewise falls back to a plain
+<img> for images build_images has not processed.
+"""
+from django import template
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from epicerieapp import assets
+
+register = template.Library()
+
+
+def css_page(context):
+    """
+    The css manifest entry of the page being rendered, if there is one.
+    """
+    if not getattr(settings, "CSS_BUNDLE_ENABLED", not settings.DEBUG):
+        return None
+    manifest = assets.read_manifest("css")
+    if manifest is None or context.template is None:
+        return None
+    return manifest["pages"].get(context.template.name)
+
+
+class StylesheetsNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        page = css_page(context)
+        if page is None:
+            return self.nodelist.render(context)
+        href = static(page["bundle"])
+        return format_html(
+            '<style>{}</style>\n'
+            '    <link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+            '    <noscript><link rel="stylesheet" href="{}"></noscript>',
+            mark_safe(assets.read_built_file(page["critical"])),
+            href,
+            href,
+        )
+
+
+@register.tag
+def stylesheets(parser, token):
+    nodelist = parser.parse(("endstylesheets",))
+    parser.delete_first_token()
+    return StylesheetsNode(nodelist)
+
+
+@register.simple_tag(takes_context=True)
+def font_preloads(context):
+    """
+    <link rel="preload"> for the subset fonts build_fonts chose to preload,
+    so they download alongside the CSS instead of after it is parsed. Only
+    emitted when the page uses the built CSS bundle that references them.
+    """
+    manifest = assets.read_manifest("fonts")
+    if manifest is None or css_page(context) is None:
+        return ""
+    return format_html_join(
+        "\n    ",
+        '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>',
+        ((static(path),) for path in manifest["preload"]),
+    )
+
+
+# The <img> src for browsers without srcset support: the variant closest to
+# this width.
+FALLBACK_WIDTH = 1024
+
+
+def _srcset(group):
+    return ", ".join(f"{static(variant['path'])} {variant['width']}w" for variant in group)
+
+
+@register.simple_tag
+def responsive_image(path, alt="", sizes="100vw", loading="lazy", **attrs):
+    """
+    A <picture> offering every built variant of a static image through
+    srcset/sizes, with intrinsic width/height to avoid layout shift. Use
+    loading="eager" (and fetchpriority="high") for above-the-fold images.
+    """
+    attrs = {name.replace("_", "-"): value for name, value in attrs.items()}
+    entry = (assets.read_manifest("images") or {}).get("images", {}).get(path)
+    if entry is None:
+        return format_html("<img{}>", flatatt({"src": static(path), "alt": alt, "loading": loading, **attrs}))
+
+    sources = [
+        format_html('<source type="image/{}" srcset="{}" sizes="{}">', fmt, _srcset(group), sizes)
+        for fmt, group in entry["variants"].items()
+        if fmt != "jpeg"
+    ]
+    img = {"src": static(path), "alt": alt, "width": entry["width"], "height": entry["height"]}
+    jpeg = entry["variants"].get("jpeg")
+    if jpeg:
+        fallback = min(jpeg, key=lambda variant: abs(variant["width"] - FALLBACK_WIDTH))
+        img.update(src=static(fallback["path"]), srcset=_srcset(jpeg), sizes=sizes)
+    img.update(loading=loading, decoding="async", **attrs)
+    return format_html(
+        "<picture>{}<img{}></picture>", mark_safe("".join(sources)), flatatt(img)
+    )
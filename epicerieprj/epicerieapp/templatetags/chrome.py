@@ -0,0 +1,106 @@
+"""
+Cached rendering of the page chrome (header, footer) included by base.html.
+
+    {% load chrome %}
+    {% cached_include 'includes/header.html' %}
+
+The rendered fragment is cached per user role and navigation item, under a
+version that changes whenever any template file changes, so a template deploy
+invalidates every cached fragment without a manual cache clear.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from epicerieapp import perf
+
+register = template.Library()
+
+_version = None
+_version_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0, "render_ms": 0.0, "saved_ms": 0.0})
+# Last measured render time per cache key, used to estimate time saved on hits.
+_render_cost = {}
+
+
+def template_version():
+    """
+    CHROME_CACHE_VERSION if set (e.g. the deployed commit), otherwise a hash of
+    the project template files computed once per process.
+    """
+    global _version
+    configured = getattr(settings, "CHROME_CACHE_VERSION", None)
+    if configured:
+        return configured
+    with _version_lock:
+        if _version is None:
+            digest = hashlib.sha1()
+            for directory in settings.TEMPLATES[0]["DIRS"]:
+                for path in sorted(Path(directory).rglob("*.html")):
+                    digest.update(str(path.relative_to(directory)).encode())
+                    digest.update(path.read_bytes())
+            _version = digest.hexdigest()[:12]
+    return _version
+
+
+def user_role(request):
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return "anonymous"
+    return "staff" if user.is_staff else "user"
+
+
+def fragment_stats():
+    """
+    Hits, misses, render time and estimated render time saved per fragment.
+    """
+    with _stats_lock:
+        return {
+            name: {key: round(value, 2) if isinstance(value, float) else value for key, value in counts.items()}
+            for name, counts in _stats.items()
+        }
+
+
+@register.simple_tag(takes_context=True)
+def cached_include(context, template_name):
+    request = context.get("request")
+    key = ":".join([
+        "chrome",
+        template_version(),
+        template_name,
+        user_role(request),
+        context.get("nav_item", ""),
+    ])
+
+    html = cache.get(key)
+    if html is not None:
+        saved = _render_cost.get(key, 0.0)
+        with _stats_lock:
+            _stats[template_name]["hits"] += 1
+            _stats[template_name]["saved_ms"] += saved * 1000
+        perf.record_cache_lookup(True)
+        perf.record_fragment_saved(saved)
+        return mark_safe(html)
+
+    started = time.perf_counter()
+    fragment = context.template.engine.get_template(template_name)
+    with context.push():
+        html = fragment.render(context)
+    elapsed = time.perf_counter() - started
+
+    _render_cost[key] = elapsed
+    with _stats_lock:
+        _stats[template_name]["misses"] += 1
+        _stats[template_name]["render_ms"] += elapsed * 1000
+    perf.record_cache_lookup(False)
+    cache.set(key, html, getattr(settings, "CHROME_CACHE_TIMEOUT", 24 * 60 * 60))
+    return mark_safe(html)
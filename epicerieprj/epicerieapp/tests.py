@@ -1,3 +1,1062 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from library.price_history import PriceHistory
+
+from . import (
+    cdc,
+    dedup,
+    exports,
+    forecasting,
+    importers,
+    jobs,
+    pos_journal,
+    purchasing,
+    replicas,
+    report_cache,
+    reports,
+    sharding,
+    skus,
+)
+from .models import (
+    ChangeLog,
+    Job,
+    Product,
+    Sale,
+    SaleLine,
+    StockMovement,
+    Supplier,
+    SupplierProductCatalog,
+    TableVersion,
+)
+
+BRANCH = settings.DEFAULT_BRANCH
+BRANCH_ALIAS = sharding.branch_alias(BRANCH)
+
+DESKTOP_CODE = Path(settings.BASE_DIR) / "_documentation" / "Database Study" / "code"
+
+
+def desktop_module(name):
+    # The desktop client's modules are not a package; the pure-Python ones
+    # are loaded from their files
+    spec = importlib.util.spec_from_file_location(name, DESKTOP_CODE / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+replica_cache = desktop_module("replica_cache")
+search_index = desktop_module("search_index")
+
+
+class PosJournalRecoveryTests(TestCase):
+    databases = {"default", BRANCH_ALIAS}
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        # Small segments so a few sales span several files
+        journal_settings = override_settings(POS_JOURNAL={
+            "DIR": self.root,
+            "SYNC_DELAY_SECONDS": 0,
+            "SEGMENT_BYTES": 400,
+            "ORPHAN_SECONDS": 60,
+        })
+        journal_settings.enable()
+        self.addCleanup(journal_settings.disable)
+
+    def crashed_journal(self, sales, name="crashed-writer"):
+        """
+        Journal ``sales`` sales, then stop the way a killed process does:
+        halfway through writing another record, and with no heartbeat since.
+        """
+        journal = pos_journal.SaleJournal(self.root / BRANCH / name)
+        self.addCleanup(journal._file.close)
+        ids = [
+            journal.append(pos_journal.make_sale([(1, "2", "10.50"), (2, "1", "99.00")]))
+            for _ in range(sales)
+        ]
+        record = pos_journal.encode_record(pos_journal.make_sale([(3, "1", "5.00")]))
+        with open(pos_journal._segments(journal.directory)[-1], "ab") as segment:
+            segment.write(record[:len(record) // 2])
+        stale = time.time() - 120
+        os.utime(journal.directory / pos_journal.HEARTBEAT_FILE, (stale, stale))
+        return journal.directory, ids
+
+    def test_orphaned_journal_is_uploaded_and_removed(self):
+        directory, ids = self.crashed_journal(5)
+        self.assertGreater(len(pos_journal._segments(directory)), 1)
+
+        capture = pos_journal.SaleCapture()
+        capture.adopt_orphans(BRANCH)
+        self.assertEqual(capture.upload_all(), 5)
+
+        sales = Sale.objects.using(BRANCH_ALIAS)
+        self.assertEqual({str(client_uuid) for client_uuid in sales.values_list("client_uuid", flat=True)}, set(ids))
+        self.assertEqual({str(total) for total in sales.values_list("total", flat=True)}, {"120.00"})
+        self.assertEqual(SaleLine.objects.using(BRANCH_ALIAS).count(), 10)
+        movements = StockMovement.objects.using(BRANCH_ALIAS)
+        self.assertEqual(movements.count(), 10)
+        self.assertFalse(movements.filter(quantity__gte=0).exists())
+        # The torn record was never acknowledged and is dropped with the journal
+        self.assertEqual(list((self.root / BRANCH).iterdir()), [])
+
+    def test_replay_after_crash_before_checkpoint_does_not_duplicate(self):
+        directory, _ = self.crashed_journal(3)
+        # The batch commits, then the process dies before saving the checkpoint
+        with mock.patch.object(pos_journal, "save_checkpoint", side_effect=OSError("killed")):
+            with self.assertRaises(OSError):
+                pos_journal.upload(directory, BRANCH)
+        self.assertEqual(Sale.objects.using(BRANCH_ALIAS).count(), 3)
+
+        self.assertEqual(pos_journal.upload(directory, BRANCH), (3, 0))
+        self.assertEqual(Sale.objects.using(BRANCH_ALIAS).count(), 3)
+        self.assertEqual(pos_journal.count_pending(directory), 0)
+
+    def test_journals_adopted_before_are_adopted_again_under_distinct_names(self):
+        # Both left behind by processes that had themselves adopted them
+        ids = set()
+        for name in ("host-1-aaaaaa-adopted", "host-2-bbbbbb-adopted"):
+            ids.update(self.crashed_journal(2, name)[1])
+
+        capture = pos_journal.SaleCapture()
+        capture.adopt_orphans(BRANCH)
+        self.assertEqual(len(capture.adopted), 2)
+        self.assertEqual(capture.upload_all(), 4)
+        uploaded = Sale.objects.using(BRANCH_ALIAS).values_list("client_uuid", flat=True)
+        self.assertEqual({str(client_uuid) for client_uuid in uploaded}, ids)
+
+    def test_journal_with_fresh_heartbeat_is_not_adopted(self):
+        directory, _ = self.crashed_journal(1)
+        pos_journal.touch_heartbeat(directory)
+        self.assertEqual(pos_journal.orphaned_writers(BRANCH), [])
+
+    def test_non_finite_or_oversized_amounts_are_refused(self):
+        for line in [(1, "NaN", "1.00"), (1, "1", "Infinity"), (1, "1", "1e12"), (1, "0.0001", "1.00")]:
+            with self.subTest(line=line), self.assertRaises(pos_journal.JournalError):
+                pos_journal.make_sale([line])
+
+    def test_rejected_sale_is_dead_lettered_and_the_rest_uploaded(self):
+        journal = pos_journal.SaleJournal(self.root / BRANCH / "writer")
+        self.addCleanup(journal.close)
+        journal.append(pos_journal.make_sale([(1, "1", "10.00")]))
+        # Journaled by an older version that did not validate amounts
+        poison = pos_journal.make_sale([(1, "1", "10.00")])
+        poison["lines"][0][1] = "NaN"
+        journal.append(poison)
+        journal.append(pos_journal.make_sale([(2, "1", "5.00")]))
+
+        self.assertEqual(pos_journal.upload(journal.directory, BRANCH), (3, 2))
+        self.assertEqual(Sale.objects.using(BRANCH_ALIAS).count(), 2)
+        self.assertEqual(pos_journal.count_dead_letters(BRANCH), 1)
+        self.assertEqual(pos_journal.count_pending(journal.directory), 0)
+
+
+class PosSaleViewTests(TestCase):
+    databases = {"default", BRANCH_ALIAS}
+    sale = '{"lines": [{"product_id": 1, "quantity": "1", "unit_price": "10.00"}]}'
+
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+        capture = mock.patch.object(pos_journal.sale_capture, "capture", return_value="sale-id")
+        self.capture = capture.start()
+        self.addCleanup(capture.stop)
+
+    def post(self, **headers):
+        return self.client.post(reverse("pos_sale"), self.sale, content_type="application/json", headers=headers)
+
+    def test_anonymous_sale_is_refused(self):
+        self.assertEqual(self.post(X_Branch=BRANCH).status_code, 401)
+        self.capture.assert_not_called()
+
+    @override_settings(POS_DEVICE_TOKENS={"device-secret": BRANCH})
+    def test_device_token_sells_for_its_own_branch_without_csrf(self):
+        self.assertEqual(self.post(Authorization="Token wrong").status_code, 401)
+        response = self.post(Authorization="Token device-secret", X_Branch="elsewhere")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.capture.call_args.args[0], BRANCH)
+
+    def test_signed_in_user_needs_permission_and_csrf_token(self):
+        user = User.objects.create_user("cashier")
+        self.client.force_login(user)
+        self.assertEqual(self.post().status_code, 403)
+
+        user.user_permissions.add(Permission.objects.get(codename="add_sale"))
+        session = self.client.session
+        session["branch"] = BRANCH
+        session.save()
+        self.assertEqual(self.post().status_code, 403)  # No CSRF token
+
+        token = "x" * 32
+        self.client.cookies["csrftoken"] = token
+        self.assertEqual(self.post(X_CSRFToken=token).status_code, 202)
+
+
+class SkuIndexTests(SimpleTestCase):
+    def test_removed_slot_is_reused_without_its_price(self):
+        index = skus.SkuIndex()
+        index.put(1, "111", "Rice", "sack", "Active")
+        index.put(2, "222", "Sugar", "kg", "Active")
+        index.set_price(1, 4550)
+        index.remove(1)
+        self.assertIsNone(index.get("111"))
+
+        index.put(3, "333", "Salt", "kg", "Active")
+        self.assertEqual(index.by_product[3], 0)
+        self.assertEqual(len(index.skus), 2)
+        record = index.get("333")
+        self.assertEqual((record.product_id, record.name), (3, "Salt"))
+        self.assertIsNone(record.price)
+        self.assertEqual(index.get("222").name, "Sugar")
+
+    def test_sku_moved_to_another_product(self):
+        index = skus.SkuIndex()
+        index.put(1, "111", "Rice", "sack", "Active")
+        index.put(2, "111", "Brown rice", "sack", "Active")
+        self.assertEqual(index.get("111").product_id, 2)
+
+        # The first product's later changes leave the SKU with the second
+        index.put(1, "999", "Rice", "sack", "Active")
+        self.assertEqual(index.get("111").product_id, 2)
+        index.remove(1)
+        self.assertEqual(index.get("111").product_id, 2)
+        self.assertIsNone(index.get("999"))
+        self.assertEqual(len(index), 1)
+
+
+class SkuLookupViewTests(TestCase):
+    def setUp(self):
+        record = skus.SkuRecord(1, "111", "Rice", "sack", "Active", Decimal("45.50"))
+        lookup = mock.patch.object(
+            skus.sku_lookup, "lookup", side_effect=lambda sku: (record if sku == "111" else None, "memory")
+        )
+        lookup.start()
+        self.addCleanup(lookup.stop)
+
+    def get(self, sku, **headers):
+        return self.client.get(reverse("sku_lookup", args=[sku]), headers=headers)
+
+    def test_anonymous_lookup_is_refused(self):
+        self.assertEqual(self.get("111").status_code, 401)
+
+    @override_settings(POS_DEVICE_TOKENS={"device-secret": BRANCH})
+    def test_device_token(self):
+        self.assertEqual(self.get("111", Authorization="Token wrong").status_code, 401)
+        response = self.get("111", Authorization="Token device-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["price"], "45.50")
+        self.assertEqual(self.get("000", Authorization="Token device-secret").status_code, 404)
+
+    def test_signed_in_user_needs_sale_permission(self):
+        user = User.objects.create_user("clerk")
+        self.client.force_login(user)
+        self.assertEqual(self.get("111").status_code, 403)
+        user.user_permissions.add(Permission.objects.get(codename="add_sale"))
+        self.assertEqual(self.get("111").status_code, 200)
+
+
+@jobs.task("test-blocking")
+def blocking_task(context, seconds):
+    # Blocks past the lease without reporting progress, then checks whether
+    # another worker could take the job meanwhile
+    time.sleep(seconds)
+    return {"stolen": len(jobs.claim("other-worker", 10))}
+
+
+@jobs.task("test-long-transaction")
+def long_transaction_task(context, seconds):
+    # Holds SQLite's write lock past the lease, querying as it works, so the
+    # renewal thread cannot write; returns the lease left at commit time
+    with transaction.atomic():
+        Supplier.objects.create(tin="999", company_name="Locked")
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            Supplier.objects.count()
+        expires = Job.objects.get(pk=context.job_id).lease_expires
+    return {"lease_left": (expires - timezone.now()).total_seconds()}
+
+
+class JobClaimTests(TestCase):
+    def test_each_job_is_leased_to_one_worker(self):
+        queued = [jobs.enqueue("test-blocking", seconds=0).job_id for _ in range(3)]
+        first = jobs.claim("first", 2)
+        second = jobs.claim("second", 10)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(sorted(job.job_id for job in first + second), queued)
+        self.assertEqual(len({job.lease_owner for job in first}), 1)
+        self.assertEqual(jobs.claim("third", 10), [])
+
+    def test_job_is_claimed_again_once_its_lease_expires(self):
+        jobs.enqueue("test-blocking", seconds=0, max_attempts=2)
+        [job] = jobs.claim("first", 10)
+        self.assertEqual(jobs.claim("second", 10), [])
+
+        Job.objects.filter(pk=job.pk).update(lease_expires=job.lease_expires - timedelta(days=1))
+        [retry] = jobs.claim("second", 10)
+        self.assertEqual((retry.pk, retry.attempts), (job.pk, 2))
+        self.assertTrue(retry.lease_owner.startswith("second:"))
+        # The first worker lost the job
+        self.assertIsNone(jobs.run_job(job))
+
+        # On its last attempt an expired job is failed instead
+        Job.objects.filter(pk=job.pk).update(lease_expires=retry.lease_expires - timedelta(days=1))
+        self.assertEqual(jobs.claim("third", 10), [])
+        self.assertEqual(jobs.fail_abandoned(), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, jobs.FAILED)
+
+
+class JobLeaseTests(TransactionTestCase):
+    @override_settings(JOBS={"LEASE_SECONDS": 0.3})
+    def test_lease_is_renewed_while_a_task_blocks(self):
+        jobs.enqueue("test-blocking", seconds=1.0)
+        [job] = jobs.claim("worker", 10)
+        self.assertEqual(jobs.run_job(job), jobs.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.result, {"stolen": 0})
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(JOBS={"LEASE_SECONDS": 0.3})
+    def test_lease_is_renewed_inside_a_long_transaction(self):
+        jobs.enqueue("test-long-transaction", seconds=1.0)
+        [job] = jobs.claim("worker", 10)
+        self.assertEqual(jobs.run_job(job), jobs.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertGreater(job.result["lease_left"], 0)
+
+
+class PurchaseOptimizerTests(SimpleTestCase):
+    def spend(self, costs, assignment):
+        lines = np.flatnonzero(assignment >= 0)
+        return np.bincount(assignment[lines], weights=costs[lines, assignment[lines]], minlength=costs.shape[1])
+
+    def assertMinimumsMet(self, costs, minimums, assignment):
+        spend = self.spend(costs, assignment)
+        used = spend > 0
+        self.assertTrue((spend[used] >= minimums[used] - purchasing.EPSILON).all(), (costs, minimums, assignment))
+
+    def most_lines_served(self, costs, minimums):
+        # Every assignment of each line to a supplier offering it, or to none
+        choices = [[-1, *np.flatnonzero(np.isfinite(row))] for row in costs]
+        best = 0
+        for assignment in itertools.product(*choices):
+            assignment = np.array(assignment)
+            spend = self.spend(costs, assignment)
+            if ((spend > 0) & (spend < minimums - purchasing.EPSILON)).any():
+                continue
+            best = max(best, int((assignment >= 0).sum()))
+        return best
+
+    def test_plans_meet_minimums_and_serve_as_many_lines_as_brute_force(self):
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            lines, suppliers = rng.integers(2, 7), rng.integers(2, 5)
+            costs = np.where(
+                rng.random((lines, suppliers)) < 0.5, rng.uniform(10, 100, size=(lines, suppliers)), np.inf
+            )
+            minimums = np.where(rng.random(suppliers) < 0.7, rng.uniform(0, 200, size=suppliers), 0)
+            assignment = purchasing.optimize(costs, minimums)
+            self.assertMinimumsMet(costs, minimums, assignment)
+            self.assertEqual((assignment >= 0).sum(), self.most_lines_served(costs, minimums), (costs, minimums))
+
+    def test_closed_suppliers_are_reopened_for_lines_only_they_offer(self):
+        # Every supplier misses its minimum on the cheapest assignment; line
+        # 0 is only served if supplier 1 is closed and 0 and 2 share its lines
+        costs = np.array([
+            [89.8, np.inf, np.inf],
+            [np.inf, 83.2, 40.5],
+            [np.inf, 18.8, 44.2],
+            [91.3, 80.8, np.inf],
+            [np.inf, np.inf, 82.1],
+        ])
+        minimums = np.array([110.4, 144.9, 137.2])
+        assignment = purchasing.optimize(costs, minimums)
+        self.assertEqual(assignment.tolist(), [0, 2, 2, 0, 2])
+        self.assertMinimumsMet(costs, minimums, assignment)
+
+
+class PurchasePlanTests(TestCase):
+    def test_loading_time_comes_out_of_the_search(self):
+        supplier = Supplier.objects.create(tin="111", company_name="Alpha", status="Active")
+        product = Product.objects.create(product_name="Rice 5kg")
+        SupplierProductCatalog.objects.create(
+            supplier=supplier, product=product, dealers_price="10.00", price_entry_date=date(2025, 1, 1)
+        )
+        current_prices = purchasing.current_prices
+
+        def slow_prices(product_ids):
+            time.sleep(0.3)
+            return current_prices(product_ids)
+
+        with (
+            mock.patch.object(purchasing, "current_prices", slow_prices),
+            mock.patch.object(purchasing, "optimize", wraps=purchasing.optimize) as optimize,
+        ):
+            plan = purchasing.plan_purchase([(product.pk, 2)])
+        search_limit = optimize.call_args.args[2]
+        self.assertLessEqual(search_limit, purchasing.PLAN_TIME_LIMIT - 0.3 - purchasing.TIME_MARGIN)
+        self.assertGreater(search_limit, 0)
+        self.assertEqual(plan["total"], Decimal("20.00"))
+        self.assertLess(plan["seconds"], purchasing.PLAN_TIME_LIMIT)
+
+
+class PriceTrendsTests(TestCase):
+    def setUp(self):
+        # A history of its own, loaded from this test's database
+        history = mock.patch.multiple(
+            reports, _price_history=PriceHistory(connection, placeholder="%s"), _price_history_position=None
+        )
+        history.start()
+        self.addCleanup(history.stop)
+        self.product = Product.objects.create(product_name="Rice 25kg")
+        self.first = Supplier.objects.create(tin="100", company_name="First")
+        self.second = Supplier.objects.create(tin="200", company_name="Second")
+        self.client.force_login(User.objects.create(username="analyst", is_staff=True))
+
+    def price(self, supplier, day, price):
+        return SupplierProductCatalog.objects.create(
+            supplier=supplier, product=self.product, price_entry_date=day, dealers_price=price
+        )
+
+    def trends(self):
+        response = self.client.get(reverse("price_trends"))
+        self.assertEqual(response.status_code, 200)
+        [product] = response.json()["products"]
+        return product
+
+    def test_new_edited_and_back_dated_prices_are_picked_up(self):
+        self.price(self.first, "2026-01-10", "100.00")
+        self.price(self.first, "2026-02-10", "110.00")
+        second = self.price(self.second, "2026-02-12", "90.00")
+        self.assertEqual(self.client.get(reverse("price_trends")).json()["period"], "2026-02")
+        product = self.trends()
+        self.assertEqual((product["prices"], product["min_price"], product["max_price"]), (3, 90.0, 110.0))
+        self.assertEqual((product["current_spread"], product["cheapest_supplier_id"]), (20.0, self.second.pk))
+        self.assertEqual((product["change_pct"], product["moving_avg"]), (0.0, 100.0))
+
+        self.price(self.first, "2026-02-20", "120.00")
+        self.assertEqual(self.trends()["current_spread"], 30.0)
+
+        self.price(self.second, "2026-01-05", "70.00")
+        self.assertEqual(self.trends()["min_price"], 70.0)
+
+        second.dealers_price = "95.00"
+        second.save()
+        product = self.trends()
+        self.assertEqual((product["prices"], product["current_spread"]), (5, 25.0))
+
+    def test_bad_parameters_are_refused(self):
+        self.assertEqual(self.client.get(reverse("price_trends"), {"period": "Q"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("price_trends"), {"window": "0"}).status_code, 400)
+        too_long = reports.MAX_PRICE_WINDOW + 1
+        self.assertEqual(self.client.get(reverse("price_trends"), {"window": too_long}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("price_trends")).status_code, 302)
+
+    def test_period_matrices_keep_only_the_latest_periods(self):
+        old = Product.objects.create(product_name="Old stock")
+        SupplierProductCatalog.objects.create(
+            supplier=self.first, product=old, price_entry_date="2025-11-03", dealers_price="10.00"
+        )
+        for day, price in [("2025-12-01", "80.00"), ("2026-01-10", "100.00"), ("2026-02-10", "110.00")]:
+            self.price(self.first, day, price)
+        history = PriceHistory(connection, placeholder="%s")
+        history.reload()
+
+        moving = history.moving_average(2, "M", periods=2)
+        self.assertEqual([str(label) for label in moving["period"]], ["2026-01", "2026-02"])
+        self.assertEqual(moving["product_id"].tolist(), [self.product.pk, old.pk])
+        np.testing.assert_array_equal(moving["moving_avg"], [[100, 105], [np.nan, np.nan]])
+        changes = history.period_over_period("M")
+        self.assertEqual(changes["change_pct"].shape, (2, 4))
+        self.assertEqual(changes["change_pct"][0, -1], 10)
+
+
+class ForecastTests(SimpleTestCase):
+    options = {
+        "LEAD_TIME_DAYS": 3,
+        "REVIEW_DAYS": 7,
+        "SERVICE_LEVEL_Z": 1.65,
+        # Only the last day sets the demand rate
+        "SMOOTHING": 1.0,
+        "SEASONAL_PRIOR_UNITS": 28,
+    }
+
+    def test_reorder_points_and_suggested_quantities(self):
+        # Two weeks from a Sunday: 2 units a day (twice, with different
+        # stock), nothing, and 7 units on Saturdays only
+        saturdays = np.zeros(14)
+        saturdays[[6, 13]] = 7
+        demand = np.array([np.full(14, 2.0), np.full(14, 2.0), np.zeros(14), saturdays])
+        result = forecasting.forecast(demand, 6, np.array([6.0, 7.0, 0.0, 3.0]), self.options)
+
+        # Saturday seller: 14 units against a prior of 28 make the profile a
+        # third of the way from flat to (0, ..., 0, 7), i.e. 2/3 on weekdays
+        # and Sundays and 3 on Saturdays. Its rate is the last Saturday's 7 / 3.
+        rate = 7 / 3
+        error = np.sqrt(12 / 14) * rate * 2 / 3
+        safety_stock = 1.65 * error * np.sqrt(10)
+        np.testing.assert_allclose(result["daily_demand"], [2, 2, 0, rate])
+        # Sunday to Tuesday, then up to the next Tuesday with one Saturday
+        np.testing.assert_allclose(result["lead_time_demand"], [6, 6, 0, rate * 2])
+        np.testing.assert_allclose(result["safety_stock"], [0, 0, 0, safety_stock], atol=1e-12)
+        np.testing.assert_allclose(result["reorder_point"], [6, 6, 0, rate * 2 + safety_stock])
+        np.testing.assert_array_equal(
+            result["suggested_quantity"], [14, 0, 0, np.ceil(rate * 9 + safety_stock - 3)]
+        )
+
+
+class ChangeLogPruneTests(TestCase):
+    def row_ids(self, consumer):
+        return [change.row_id for change in consumer.poll()]
+
+    def test_consumers_resume_from_their_offsets_after_prune(self):
+        for row_id in range(1, 7):
+            cdc.record_change("Products", row_id, cdc.UPDATE)
+        first_id = ChangeLog.objects.order_by("change_id").values_list("change_id", flat=True)[0]
+        ChangeLog.objects.update(changed_at=timezone.now() - timedelta(days=30))
+        cdc.record_change("Products", 7, cdc.UPDATE)  # Recent: kept
+        behind, ahead = cdc.Consumer("behind"), cdc.Consumer("ahead")
+        behind.commit(first_id + 2)
+        ahead.commit(first_id + 4)
+
+        # Only old changes that every consumer has read
+        self.assertEqual(cdc.prune(), 3)
+        self.assertEqual(self.row_ids(behind), [4, 5, 6, 7])
+        self.assertEqual(self.row_ids(ahead), [6, 7])
+        # A new consumer starts at the oldest change left
+        self.assertEqual(self.row_ids(cdc.Consumer("new")), [4, 5, 6, 7])
+
+        behind.commit()
+        self.assertEqual(cdc.prune(), 2)
+        self.assertEqual(self.row_ids(ahead), [6, 7])
+
+
+class PriceListImportTests(TestCase):
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = directory / "prices.csv"
+        self.supplier = Supplier.objects.create(tin="300", company_name="Importer Test")
+
+    def write(self, rows):
+        self.path.write_text("Product Name,Dealers Price\n" + "".join(f"{name},{price}\n" for name, price in rows))
+
+    def state(self):
+        return (
+            SupplierProductCatalog.objects.count(),
+            ChangeLog.objects.count(),
+            list(TableVersion.objects.order_by("table_name").values_list("table_name", "version")),
+        )
+
+    def test_reimporting_an_unchanged_list_changes_nothing(self):
+        self.write([("Sugar 1kg", "55.00"), ("Salt 1kg", "20.50")])
+        summary = importers.import_price_list(self.path, self.supplier, date(2026, 3, 1))
+        self.assertEqual((summary["inserted"], summary["products_created"]), (2, 2))
+        before = self.state()
+
+        for day in (date(2026, 3, 1), date(2026, 3, 2)):
+            summary = importers.import_price_list(self.path, self.supplier, day)
+            self.assertEqual((summary["inserted"], summary["updated"], summary["unchanged"]), (0, 0, 2))
+            self.assertEqual(summary["products_created"], 0)
+            self.assertEqual(self.state(), before)
+
+        self.write([("Sugar 1kg", "57.00"), ("Salt 1kg", "20.50")])
+        summary = importers.import_price_list(self.path, self.supplier, date(2026, 3, 2))
+        self.assertEqual((summary["inserted"], summary["unchanged"]), (1, 1))
+
+
+class ExportTests(TestCase):
+    header = ["Name", "Price", "Date", "Note"]
+    rows = [
+        (f"Item {number}", Decimal("12.50") + number, date(2026, 1, 1) + timedelta(days=number), None)
+        for number in range(200)
+    ] + [("Bell\x07 & <Co>", True, "Ñame", "line\nbreak")]
+
+    def export(self, writer, **kwargs):
+        stats = exports.ExportStats("test")
+        with mock.patch.object(exports, "CHUNK_SIZE", 1024), mock.patch.object(stats, "log") as log:
+            chunks = list(exports.instrumented(writer(self.header, iter(self.rows), stats, **kwargs), stats))
+        log.assert_called_once_with()
+        data = b"".join(chunks)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual((stats.rows, stats.bytes), (len(self.rows), len(data)))
+        return data
+
+    def test_csv_round_trips_in_chunks(self):
+        data = self.export(exports.csv_chunks)
+        parsed = list(csv.reader(io.StringIO(data.decode("utf-8"))))
+        self.assertEqual(parsed[0], self.header)
+        self.assertEqual(parsed[1], ["Item 0", "12.50", "2026-01-01", ""])
+        self.assertEqual(parsed[-1], ["Bell\x07 & <Co>", "True", "Ñame", "line\nbreak"])
+        self.assertEqual(len(parsed), len(self.rows) + 1)
+
+    def test_xlsx_is_a_valid_workbook(self):
+        data = self.export(exports.xlsx_chunks, sheet_name="Prices & Co")
+        with zipfile.ZipFile(io.BytesIO(data)) as workbook:
+            self.assertIn('name="Prices &amp; Co"', workbook.read("xl/workbook.xml").decode())
+            sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+        namespace = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        rows = sheet.findall("s:sheetData/s:row", namespace)
+        self.assertEqual(len(rows), len(self.rows) + 1)
+        self.assertEqual([cell.findtext("s:v", namespaces=namespace) for cell in rows[1]][:2], [None, "12.50"])
+        last = ["".join(cell.itertext()) for cell in rows[-1]]
+        # Control characters are dropped; Excel refuses them
+        self.assertEqual(last, ["Bell & <Co>", "1", "Ñame", "line\nbreak"])
+
+    def test_export_job_reports_row_progress(self):
+        for number in range(40):
+            Supplier.objects.create(tin=f"7{number:02}", company_name=f"Supplier {number}")
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output, ignore_errors=True)
+        jobs.enqueue("export-report", report_name="suppliers", fmt="csv")
+        [job] = jobs.claim("worker", 1)
+
+        progress = []
+        record = mock.patch.object(
+            jobs.JobContext, "progress", lambda context, done, total=None, message="": progress.append((done, total))
+        )
+        with override_settings(JOBS={"OUTPUT_DIR": output}), mock.patch.object(exports, "CHUNK_SIZE", 256), record:
+            self.assertEqual(jobs.run_job(job), jobs.SUCCEEDED)
+        self.assertGreater(len(progress), 3)
+        self.assertEqual(progress[-1], (40, 40))
+        self.assertEqual([done for done, _ in progress], sorted(done for done, _ in progress))
+
+    async def test_export_view_streams_asynchronously_under_asgi(self):
+        user = await User.objects.acreate(username="exporter", is_staff=True)
+        for number in range(3):
+            await Supplier.objects.acreate(tin=f"40{number}", company_name=f"Supplier {number}")
+        url = reverse("report_export", args=["suppliers", "csv"])
+
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(url)
+        self.assertTrue(response.is_async)
+        streamed = b"".join([chunk async for chunk in response.streaming_content])
+
+        await sync_to_async(self.client.force_login)(user)
+        response = await sync_to_async(self.client.get)(url)
+        self.assertFalse(response.is_async)
+        self.assertEqual(streamed, await sync_to_async(b"".join)(response.streaming_content))
+        self.assertEqual(streamed.decode().count(",Supplier "), 3)
+
+
+class ReadYourWritesTests(TestCase):
+    def setUp(self):
+        # A replica refreshed ten seconds ago
+        snapshot = mock.patch.object(replicas, "snapshot_state", return_value={"snapshot_at": time.time() - 10})
+        snapshot.start()
+        self.addCleanup(snapshot.stop)
+        self.user = User.objects.create(username="writer", is_staff=True)
+        self.client.force_login(self.user)
+
+    def summary_reads(self):
+        # Where the router sends the summary view's catalog reads; the test
+        # database has no replica, so they all run on default
+        routed = set()
+        db_for_read = replicas.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            if model._meta.app_label == "epicerieapp":
+                routed.add(db_for_read(router, model, **hints) or "default")
+
+        with mock.patch.object(replicas.ReplicaRouter, "db_for_read", record):
+            self.assertEqual(self.client.get(reverse("catalog_summary")).status_code, 200)
+        return routed
+
+    def test_write_in_one_request_sends_the_next_reads_to_default(self):
+        self.assertEqual(self.summary_reads(), {"replica"})
+
+        # A write through a view that does not read from the replica itself
+        response = self.client.post(reverse("report_job", args=["suppliers", "csv"]))
+        self.assertEqual(response.status_code, 202)
+        self.assertIn(replicas.SESSION_LAST_WRITE, self.client.session)
+
+        self.assertEqual(self.summary_reads(), {"default"})
+
+        # Another client has not written anything
+        other = Client()
+        other.force_login(self.user)
+        self.client = other
+        self.assertEqual(self.summary_reads(), {"replica"})
+
+
+class CatalogViewTests(TransactionTestCase):
+    # The detail view's queries run in pool threads on their own connections
+    def setUp(self):
+        self.product = Product.objects.create(product_name="Flour 1kg", category="Baking")
+        cheap = Supplier.objects.create(tin="500", company_name="Cheap")
+        dear = Supplier.objects.create(tin="600", company_name="Dear")
+        prices = [(cheap, "2026-01-01", "40.00"), (cheap, "2026-02-01", "42.00"), (dear, "2026-01-15", "50.00")]
+        for supplier, day, price in prices:
+            SupplierProductCatalog.objects.create(
+                supplier=supplier, product=self.product, price_entry_date=day, dealers_price=price
+            )
+        self.url = reverse("catalog_product_detail", args=[self.product.pk])
+
+    def test_catalog_views_are_staff_only(self):
+        for url in (reverse("catalog_products"), self.url, reverse("catalog_price_history", args=[self.product.pk])):
+            self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_product_detail(self):
+        self.client.force_login(User.objects.create(username="clerk", is_staff=True))
+        detail = self.client.get(self.url).json()
+        self.assertEqual(detail["product"]["product_name"], "Flour 1kg")
+        self.assertEqual(
+            [(offer["supplier__company_name"], offer["dealers_price"]) for offer in detail["current_prices"]],
+            [("Cheap", "42.00"), ("Dear", "50.00")],
+        )
+        stats = detail["price_stats"]
+        self.assertEqual((Decimal(stats["min_price"]), Decimal(stats["max_price"]), stats["entries"]), (40, 50, 3))
+        missing = reverse("catalog_product_detail", args=[self.product.pk + 1])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+        self.assertEqual(self.client.get(reverse("catalog_products"), {"q": "bak"}).json()["count"], 1)
+
+
+class ReportCacheTests(TestCase):
+    tables = [Product._meta.db_table, Supplier._meta.db_table]
+
+    def setUp(self):
+        # Keys hold table versions, which every test starts over from
+        cache.clear()
+        report_cache.reset_cache_stats()
+
+    def test_saving_a_model_bumps_its_version_and_invalidates_cached_reports(self):
+        product = Product.objects.create(product_name="Oil 1L", category="Pantry")
+        products, suppliers = report_cache.table_versions(self.tables).values()
+        for _ in range(2):
+            self.assertEqual(reports.catalog_summary()["products_by_category"], {"Pantry": 1})
+
+        product.category = "Oils"
+        product.save()
+        self.assertEqual(list(report_cache.table_versions(self.tables).values()), [products + 1, suppliers])
+        self.assertEqual(reports.catalog_summary()["products_by_category"], {"Oils": 1})
+        stats = report_cache.cache_stats()["catalog-summary"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_report_views_are_staff_only(self):
+        for name in ("catalog_summary", "branch_sales"):
+            self.assertEqual(self.client.get(reverse(name)).status_code, 302)
+
+
+@override_settings(BRANCHES=["main", "north"], DEFAULT_BRANCH="main")
+class BranchRoutingTests(SimpleTestCase):
+    router = sharding.BranchRouter()
+
+    def test_branch_models_go_to_the_selected_branch(self):
+        self.assertEqual(self.router.db_for_read(Sale), "branch_main")
+        with sharding.using_branch("north"):
+            self.assertEqual(self.router.db_for_read(SaleLine), "branch_north")
+            self.assertEqual(self.router.db_for_write(StockMovement), "branch_north")
+            # An instance stays in the database it was loaded from
+            sale = Sale()
+            sale._state.db = "branch_main"
+            self.assertEqual(self.router.db_for_write(Sale, instance=sale), "branch_main")
+            self.assertIsNone(self.router.db_for_read(Product))
+        with self.assertRaises(sharding.BranchError):
+            sharding.using_branch("south").__enter__()
+        with override_settings(DEFAULT_BRANCH=None), self.assertRaises(sharding.BranchError):
+            self.router.db_for_read(Sale)
+
+    def test_tables_are_migrated_to_their_own_databases(self):
+        cases = [
+            ("default", "product", True),
+            ("default", "sale", False),
+            ("branch_north", "sale", True),
+            ("branch_north", "product", False),
+            ("branch_south", "sale", False),  # Not in BRANCHES
+        ]
+        for db, model_name, allowed in cases:
+            with self.subTest(db=db, model_name=model_name):
+                self.assertIs(self.router.allow_migrate(db, "epicerieapp", model_name), allowed)
+        self.assertIsNone(self.router.allow_migrate("default", "epicerieapp"))
+
+    def test_branch_comes_from_a_signed_in_users_session_only(self):
+        middleware = sharding.BranchMiddleware(lambda request: None)
+        request = RequestFactory().get("/", headers={"X-Branch": "north"})
+        request.session = {"branch": "north"}
+        request.user = AnonymousUser()
+        self.assertEqual(middleware.select(request), "main")
+        request.user = User(username="clerk")
+        self.assertEqual(middleware.select(request), "north")
+
+    def test_inventory_page_survives_a_missing_branch_database(self):
+        missing = OperationalError("no such table: SuggestedOrders")
+        with mock.patch("epicerieapp.views.Paginator.get_page", side_effect=missing), \
+                self.assertLogs("epicerieapp.views", "ERROR"):
+            response = self.client.get(reverse("inventory"))
+        self.assertContains(response, "shards migrate", status_code=503)
+
+    def test_merge_totals(self):
+        merged = sharding.merge_totals({
+            "main": {"sales": 2, "revenue": Decimal("30.00")},
+            "north": {"sales": 0, "revenue": None, "returns": 1},
+        })
+        self.assertEqual(merged, {"sales": 2, "revenue": Decimal("30.00"), "returns": 1})
+
+
+class BranchSalesTests(TransactionTestCase):
+    # gather() queries each branch from its own thread and connection
+    databases = {"default", BRANCH_ALIAS}
+
+    def test_sales_are_summed_over_branches_and_products(self):
+        rice = Product.objects.create(product_name="Rice 5kg")
+        now = timezone.now()
+        for days_ago, lines in [(1, [(rice.pk, "2", "10.00"), (999, "1", "5.00")]), (10, [(rice.pk, "7", "10.00")])]:
+            sale = Sale.objects.using(BRANCH_ALIAS).create(
+                sold_at=now - timedelta(days=days_ago), total=sum(Decimal(q) * Decimal(p) for _, q, p in lines)
+            )
+            for product_id, quantity, price in lines:
+                SaleLine.objects.using(BRANCH_ALIAS).create(
+                    sale=sale, product_id=product_id, quantity=quantity, unit_price=price
+                )
+
+        summary = reports.branch_sales_summary(since=now - timedelta(days=5))
+        self.assertEqual(summary["branches"], {BRANCH: {"sales": 1, "revenue": Decimal("25.00")}})
+        self.assertEqual(summary["total"], {"sales": 1, "revenue": Decimal("25.00")})
+        self.assertEqual(
+            [(row["product_name"], row["units"]) for row in summary["units_sold"]],
+            [("Rice 5kg", Decimal("2")), (None, Decimal("1"))],
+        )
+        self.assertEqual(reports.branch_sales_summary()["total"]["sales"], 2)
+        self.assertEqual(sharding.gather(lambda alias: alias, branch_list=[]), {})
+
+
+class DuplicateSupplierTests(SimpleTestCase):
+    def test_normalize_name(self):
+        for name in ["Juan's Trading, Incorporated", "JUANS TRADING INC.", "Juan\u2019s  Trading Inc"]:
+            self.assertEqual(dedup.normalize_name(name), "JUANS TRDG INC")
+        self.assertEqual(dedup.normalize_name("A.B.C. Distributors & Co."), "ABC DIST & CO")
+        self.assertEqual(dedup.normalize_name("Ni\u00f1o Enterprises Corporation"), "NINO ENT CORP")
+        self.assertEqual(dedup.core_name("ABC DIST & CO"), "ABC DIST")
+        self.assertEqual(dedup.normalize_name(None), "")
+
+    def test_soundex(self):
+        codes = {"Robert": "R163", "Rupert": "R163", "Ashcraft": "A261", "Tymczak": "T522", "Pfister": "P236"}
+        for word, code in codes.items():
+            self.assertEqual(dedup.soundex(word), code, word)
+        self.assertEqual(dedup.soundex("123"), "")
+
+    def test_blocking_keys(self):
+        formatted = dedup.SupplierRecord(1, "123-456-789-000", "Juan's Trading, Incorporated")
+        plain = dedup.SupplierRecord(2, "123456789001", "Juans Trading Inc.")
+        self.assertEqual(formatted.tin_digits, "123456789000")
+        self.assertEqual(dedup.blocking_keys(formatted, []), ["tin:123456789", "ph:J520T632"])
+        self.assertEqual(dedup.blocking_keys(plain, ["mh0:x"]), ["mh0:x", "tin:123456789", "ph:J520T632"])
+        # Too short to have a 9-digit base
+        self.assertEqual(dedup.blocking_keys(dedup.SupplierRecord(3, "12-34", "Co."), []), ["ph:C000"])
+
+    def test_find_duplicates(self):
+        matches, stats = dedup.find_duplicates([
+            (1, "123-456-789-000", "Juan's Trading, Incorporated"),
+            (2, "123456789000", "Juans Trading Inc."),
+            (3, "987654321000", "Unrelated Foods Corp"),
+        ])
+        self.assertEqual(
+            [(match["left"].supplier_id, match["right"].supplier_id, match["reasons"]) for match in matches],
+            [(1, 2, ["same name", "same TIN"])],
+        )
+        self.assertEqual(stats["candidate_pairs"], 1)
+        self.assertEqual(stats["groups"], 1)
+
+
+class FakeSqlServer:
+    """
+    SQLite standing in for SQL Server in ReplicaSync tests: RowVer is an
+    8-byte big-endian blob bumped on every insert and update, which compares
+    like a rowversion, and MIN_ACTIVE_ROWVERSION() is the next one.
+    """
+
+    def __init__(self):
+        self.rowversion = 0
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.create_function("NEXT_ROWVERSION", 0, self._next)
+        self.conn.create_function("MIN_ACTIVE_ROWVERSION", 0, lambda: (self.rowversion + 1).to_bytes(8, "big"))
+        for table, (key_column, columns) in replica_cache.TABLES.items():
+            self.conn.executescript(f"""
+                CREATE TABLE {table} ({", ".join(columns)}, RowVer BLOB);
+                CREATE TRIGGER {table}_Insert AFTER INSERT ON {table} BEGIN
+                    UPDATE {table} SET RowVer = NEXT_ROWVERSION() WHERE {key_column} = NEW.{key_column};
+                END;
+                CREATE TRIGGER {table}_Update AFTER UPDATE ON {table} WHEN NEW.RowVer IS OLD.RowVer BEGIN
+                    UPDATE {table} SET RowVer = NEXT_ROWVERSION() WHERE {key_column} = NEW.{key_column};
+                END;
+            """)
+
+    def _next(self):
+        self.rowversion += 1
+        return self.rowversion.to_bytes(8, "big")
+
+    def execute(self, sql, params=()):
+        self.conn.execute(sql, params)
+        self.conn.commit()
+
+
+class ReplicaCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.replica = replica_cache.ReplicaCache(Path(directory) / "replica.sqlite3")
+        self.server = FakeSqlServer()
+        self.sync = replica_cache.ReplicaSync(self.replica, connect=None)
+        self.server.execute(
+            "INSERT INTO Suppliers (SupplierID, TIN, CompanyName, Status) VALUES "
+            "(1, '111', 'Alpha Trading', 'Active'), (2, '222', 'Beta Foods', 'Active')"
+        )
+
+    def names(self):
+        return {row[0]: row[2] for row in self.replica.suppliers()}
+
+    def test_pulls_only_rows_changed_since_the_watermark(self):
+        result = self.sync.sync(self.server.conn)
+        self.assertEqual(result["pulled"]["Suppliers"], 2)
+        self.assertEqual(self.names(), {1: "Alpha Trading", 2: "Beta Foods"})
+        self.assertEqual(self.replica.watermark("Suppliers"), (2, 1))
+
+        self.assertEqual(self.sync.sync(self.server.conn)["pulled"]["Suppliers"], 0)
+
+        self.server.execute("UPDATE Suppliers SET CompanyName = 'Beta Foods Inc' WHERE SupplierID = 2")
+        self.server.execute("INSERT INTO Suppliers (SupplierID, CompanyName) VALUES (3, 'Gamma')")
+        self.assertEqual(self.sync.sync(self.server.conn)["pulled"]["Suppliers"], 2)
+        self.assertEqual(self.names(), {1: "Alpha Trading", 2: "Beta Foods Inc", 3: "Gamma"})
+
+    def test_deleted_rows_are_reconciled(self):
+        self.sync.sync(self.server.conn)
+        self.server.execute("DELETE FROM Suppliers WHERE SupplierID = 1")
+        with mock.patch.object(replica_cache, "RECONCILE_EVERY", 1):
+            self.assertEqual(self.sync.sync(self.server.conn)["deleted"]["Suppliers"], 1)
+        self.assertEqual(self.names(), {2: "Beta Foods"})
+
+    def test_local_edits_are_merged_and_pushed(self):
+        self.sync.sync(self.server.conn)
+        self.replica.queue_update("Suppliers", 1, {"CompanyName": "Alpha Trading Corp"})
+        self.replica.queue_update("Suppliers", 1, {"Status": "Inactive"})
+        self.assertEqual(len(self.replica.pending_changes()), 1)
+        self.assertEqual(self.names()[1], "Alpha Trading Corp")
+        with self.assertRaises(ValueError):
+            self.replica.queue_update("Suppliers", 1, {"Password": "x"})
+
+        result = self.sync.sync(self.server.conn)
+        self.assertEqual((result["pushed"], result["conflicts"]), (1, 0))
+        self.assertEqual(self.replica.pending_changes(), [])
+        server_row = self.server.conn.execute(
+            "SELECT CompanyName, Status, RowVer FROM Suppliers WHERE SupplierID = 1"
+        ).fetchone()
+        self.assertEqual(server_row[:2], ("Alpha Trading Corp", "Inactive"))
+        local_rowver = self.replica.connection().execute(
+            "SELECT RowVer FROM Suppliers WHERE SupplierID = 1"
+        ).fetchone()[0]
+        self.assertEqual(local_rowver, int.from_bytes(server_row[2], "big"))
+
+        # The next edit is based on the version the push wrote
+        self.replica.queue_update("Suppliers", 1, {"Status": "Active"})
+        self.assertEqual(self.sync.sync(self.server.conn)["pushed"], 1)
+
+    def test_conflicting_edit_keeps_the_server_version(self):
+        self.sync.sync(self.server.conn)
+        self.replica.queue_update("Suppliers", 2, {"CompanyName": "Beta (local)"})
+        self.server.execute("UPDATE Suppliers SET CompanyName = 'Beta (server)' WHERE SupplierID = 2")
+
+        result = self.sync.sync(self.server.conn)
+        self.assertEqual((result["pushed"], result["conflicts"]), (0, 1))
+        self.assertEqual(self.names()[2], "Beta (server)")
+        self.assertEqual(self.replica.pending_changes(), [])
+        [(conflict_id, table, key, local_changes, server_values, _)] = self.replica.conflicts()
+        self.assertEqual((table, key), ("Suppliers", 2))
+        self.assertEqual(json.loads(local_changes), {"CompanyName": "Beta (local)"})
+        self.assertEqual(json.loads(server_values)["CompanyName"], "Beta (server)")
+
+        # Re-applied on top of the server version, it goes through
+        self.replica.resolve_conflict(conflict_id, keep="local")
+        self.assertEqual(self.replica.conflicts(), [])
+        self.assertEqual(self.sync.sync(self.server.conn)["pushed"], 1)
+        self.assertEqual(
+            self.server.conn.execute("SELECT CompanyName FROM Suppliers WHERE SupplierID = 2").fetchone()[0],
+            "Beta (local)",
+        )
+
+    def test_default_path_is_in_the_user_data_directory(self):
+        with mock.patch.dict(os.environ, {"XDG_DATA_HOME": "/data", "LOCALAPPDATA": "C:/Local"}):
+            path = replica_cache.default_path()
+        self.assertTrue(path.is_absolute())
+        self.assertEqual(path.name, replica_cache.REPLICA_FILE_NAME)
+        self.assertEqual(path.parent.name, replica_cache.APP_DIR_NAME)
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = search_index.SearchIndex()
+        self.index.sync([
+            (1, "Santa Ana Trading", "123-456"),
+            (2, "Jos\u00e9 Rizal Foods", "789"),
+            (3, "Sanitary Supplies", None),
+        ])
+
+    def test_search_by_token_prefixes(self):
+        self.assertEqual(self.index.search("san ana"), {1})
+        self.assertEqual(self.index.search("SAN"), {1, 3})
+        self.assertEqual(self.index.search("sani"), {3})
+        self.assertEqual(self.index.search("jose"), {2})
+        self.assertEqual(self.index.search("123"), {1})
+        self.assertEqual(self.index.search("santa foods"), set())
+        self.assertIsNone(self.index.search("  "))
+
+    def test_set_row_and_remove_row(self):
+        self.index.set_row(3, "Sanitary Supplies", None)  # Unchanged
+        self.index.set_row(1, "Santos Trading")
+        self.assertEqual(self.index.search("ana"), set())
+        self.assertEqual(self.index.search("santos"), {1})
+        self.assertEqual(self.index.search("santa"), set())
+        # "S" still prefixes "santos" and "sanitary"
+        self.assertEqual(self.index.search("s"), {1, 3})
+
+        self.index.remove_row(3)
+        self.index.remove_row(99)
+        self.assertEqual(self.index.search("san"), {1})
+        self.assertNotIn("sanitary", self.index.postings)
+        self.assertNotIn("sanitary", self.index.sorted_vocabulary())
+        self.assertNotIn("sup", self.index.short)
+        self.assertEqual(len(self.index), 2)
+
+    def test_sync_counts_and_applies_changes(self):
+        changed = self.index.sync([
+            (1, "Santa Ana Trading", "123-456"),
+            (2, "Jose Rizal Foods", "789"),
+            (4, "Ana Rice Mill", None),
+        ])
+        self.assertEqual(changed, 3)  # 2 changed, 3 removed, 4 added
+        self.assertEqual(self.index.search("ana"), {1, 4})
+        self.assertEqual(self.index.search("sanitary"), set())
+        self.assertEqual(sorted(self.index.keys()), [1, 2, 4])
+        self.assertEqual(self.index.sync([(1, "Santa Ana Trading", "123-456")]), 2)
@@ -18,6 +18,33 @@ urlpatterns = [
     path("payroll/", views.payroll_view, name="payroll"),
     path("tasks/", views.tasks_management_view, name="tasks"),
     path("inventory/", views.inventory_view, name="inventory"),
+    path("inventory/branch/", views.select_branch_view, name="select_branch"),  # POST: branch=<code>
     path("grocery/", views.online_grocery_view, name="grocery"),
     path("onlinetemp/", views.onlinetemp, name="onlinetemp"),
+    path("catalog/products/", views.catalog_products_view, name="catalog_products"),
+    path(
+        "catalog/products/<int:product_id>/",
+        views.catalog_product_detail_view,
+        name="catalog_product_detail",
+    ),
+    path(
+        "catalog/products/<int:product_id>/prices/",
+        views.catalog_price_history_view,
+        name="catalog_price_history",
+    ),
+    path("reports/summary/", views.catalog_summary_view, name="catalog_summary"),
+    path("reports/branches/", views.branch_sales_view, name="branch_sales"),
+    path("reports/price-trends/", views.price_trends_view, name="price_trends"),
+    path(
+        "reports/<slug:report_name>.<str:fmt>", views.report_export_view, name="report_export"
+    ),  # e.g. reports/suppliers.csv, reports/product-catalog.xlsx
+    path(
+        "reports/<slug:report_name>.<str:fmt>/jobs/", views.report_job_view, name="report_job"
+    ),  # POST: build the export in the background
+    path("pos/sku/<str:sku>/", views.sku_lookup_view, name="sku_lookup"),
+    path("pos/sales/", views.pos_sale_view, name="pos_sale"),
+    path("purchasing/plan/", views.purchase_plan_view, name="purchase_plan"),
+    path("jobs/", views.job_list_view, name="job_list"),
+    path("jobs/<int:job_id>/", views.job_status_view, name="job_status"),
+    path("__perf/", views.perf_dashboard_view, name="perf_dashboard"),
 ]
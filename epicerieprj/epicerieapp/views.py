@@ -1,4 +1,32 @@
-from django.shortcuts import render, redirect
+import asyncio
+import datetime
+import hmac
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Avg, Count, Max, Min, OuterRef, Q, Subquery
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import jobs, pos_journal, purchasing, replicas, reports, sharding, skus
+from .middleware import route_stats
+from .templatetags.chrome import fragment_stats
+from .models import Job, Product, SuggestedOrder, SupplierProductCatalog
+
+logger = logging.getLogger(__name__)
 
 
 def home(request):
@@ -67,8 +95,40 @@ def tasks_management_view(request):
     return render(request, "epicerieapp/tasks_management.html")
 
 
+INVENTORY_PAGE_SIZE = 50
+
+
 def inventory_view(request):
-    return render(request, "epicerieapp/inventory.html")
+    # Reorder suggestions of the request's branch from the nightly forecast
+    context = {"branch": getattr(request, "branch", None), "branches": sharding.branches()}
+    status = 200
+    if context["branch"] is not None:
+        suggestions = SuggestedOrder.objects.order_by("-suggested_quantity", "product_id")
+        try:
+            page = Paginator(suggestions, INVENTORY_PAGE_SIZE).get_page(request.GET.get("page"))
+            product_ids = [row.product_id for row in page]
+        except DatabaseError:
+            # Branch database missing or not migrated: `manage.py shards migrate`
+            logger.exception("Branch %s database is not available", context["branch"])
+            context["unavailable"] = True
+            status = 503
+        else:
+            names = dict(Product.objects.filter(pk__in=product_ids).values_list("product_id", "product_name"))
+            for row in page:
+                row.product_name = names.get(row.product_id, f"#{row.product_id}")
+            context["suggestions"] = page
+    return render(request, "epicerieapp/inventory.html", context, status=status)
+
+
+@require_POST
+@login_required
+def select_branch_view(request):
+    # Stores the signed-in user's branch; BranchMiddleware reads it back
+    branch = request.POST.get("branch")
+    if branch not in sharding.branches():
+        return JsonResponse({"error": "Unknown branch"}, status=400)
+    request.session["branch"] = branch
+    return redirect("inventory")
 
 
 def online_grocery_view(request):
@@ -77,3 +137,301 @@ def online_grocery_view(request):
 
 def onlinetemp(request):
     return render(request, "epicerieapp/onlinetemp.html")
+
+
+# Report exports
+@staff_member_required
+@replicas.read_from_replica
+def report_export_view(request, report_name, fmt):
+    report = reports.REPORTS.get(report_name)
+    if report is None:
+        raise Http404("Unknown report")
+    return reports.export_response(report, fmt, asynchronous=isinstance(request, ASGIRequest))
+
+
+@require_POST
+@staff_member_required
+def report_job_view(request, report_name, fmt):
+    # Build the export file in the background; poll the returned status URL
+    if report_name not in reports.REPORTS or fmt not in ("csv", "xlsx"):
+        raise Http404("Unknown report")
+    job = jobs.enqueue("export-report", report_name=report_name, fmt=fmt)
+    status_url = reverse("job_status", args=[job.job_id])
+    response = JsonResponse({**jobs.job_status(job), "status_url": status_url}, status=202)
+    response["Location"] = status_url
+    return response
+
+
+@staff_member_required
+@replicas.read_from_replica(read_your_writes=True)
+def catalog_summary_view(request):
+    summary = reports.catalog_summary(category=request.GET.get("category") or None)
+    return JsonResponse(summary)
+
+
+@staff_member_required
+@replicas.read_from_replica
+def branch_sales_view(request):
+    # ?since=YYYY-MM-DD&until=YYYY-MM-DD, both optional; until is exclusive
+    try:
+        since, until = (parse_date(request.GET.get(name, "")) for name in ("since", "until"))
+    except ValueError:
+        return JsonResponse({"error": "Dates must be YYYY-MM-DD."}, status=400)
+    since, until = (
+        timezone.make_aware(datetime.datetime.combine(day, datetime.time.min)) if day else None
+        for day in (since, until)
+    )
+    return JsonResponse(reports.branch_sales_summary(since=since, until=until))
+
+
+@staff_member_required
+def price_trends_view(request):
+    # ?period=D|W|M|Y (default M)&window=<periods in the moving average, default 3>
+    period = request.GET.get("period", "M")
+    try:
+        window = int(request.GET.get("window", 3))
+    except ValueError:
+        window = 0
+    if period not in reports.PRICE_PERIODS or not 1 <= window <= reports.MAX_PRICE_WINDOW:
+        return JsonResponse(
+            {"error": f"period must be D, W, M or Y and window a number from 1 to {reports.MAX_PRICE_WINDOW}."},
+            status=400,
+        )
+    return JsonResponse(reports.price_trends(period=period, window=window))
+
+
+# Catalog endpoints (async)
+CATALOG_PAGE_SIZE = 50
+
+
+def _on_own_connection(func):
+    try:
+        return func()
+    finally:
+        # Pool threads get their own connections; don't leave them open
+        connections.close_all()
+
+
+async def _concurrently(*funcs):
+    """
+    Run the query functions at the same time. The async ORM would send them
+    all to the request's one thread-sensitive thread, one after another, so
+    each runs in a pool thread with its own database connection instead.
+    """
+    return await asyncio.gather(
+        *(sync_to_async(_on_own_connection, thread_sensitive=False)(func) for func in funcs)
+    )
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+def _page_number(request):
+    try:
+        return max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        return 1
+
+
+@staff_member_required
+async def catalog_products_view(request):
+    query = request.GET.get("q", "").strip()
+    page = _page_number(request)
+    products = Product.objects.order_by("product_name")
+    if query:
+        products = products.filter(Q(product_name__icontains=query) | Q(category__icontains=query))
+
+    start = (page - 1) * CATALOG_PAGE_SIZE
+    rows = products.values("product_id", "product_name", "category", "unit_of_measure", "status")
+    total, results = await _concurrently(products.count, lambda: list(rows[start:start + CATALOG_PAGE_SIZE]))
+    return JsonResponse({"count": total, "page": page, "results": results})
+
+
+@staff_member_required
+async def catalog_product_detail_view(request, product_id):
+    latest_date = (
+        SupplierProductCatalog.objects.filter(supplier=OuterRef("supplier"), product=OuterRef("product"))
+        .order_by("-price_entry_date")
+        .values("price_entry_date")[:1]
+    )
+    current_prices = (
+        SupplierProductCatalog.objects.filter(
+            product_id=product_id, price_entry_date=Subquery(latest_date), supplier__status="Active"
+        )
+        .order_by("dealers_price")
+        .values("supplier_id", "supplier__company_name", "dealers_price", "price_entry_date")
+    )
+    products = Product.objects.values(
+        "product_id", "product_name", "product_description", "category", "unit_of_measure", "status"
+    )
+
+    try:
+        product, offers, stats = await _concurrently(
+            lambda: products.get(pk=product_id),
+            lambda: list(current_prices),
+            lambda: SupplierProductCatalog.objects.filter(product_id=product_id).aggregate(
+                min_price=Min("dealers_price"),
+                max_price=Max("dealers_price"),
+                avg_price=Avg("dealers_price"),
+                entries=Count("pk"),
+            ),
+        )
+    except Product.DoesNotExist:
+        raise Http404("Product not found")
+    return JsonResponse({"product": product, "current_prices": offers, "price_stats": stats})
+
+
+@staff_member_required
+async def catalog_price_history_view(request, product_id):
+    history = (
+        SupplierProductCatalog.objects.filter(product_id=product_id)
+        .order_by("-price_entry_date", "supplier__company_name")
+        .values("supplier_id", "supplier__company_name", "dealers_price", "price_entry_date")
+    )
+    supplier_id = request.GET.get("supplier")
+    if supplier_id and supplier_id.isdigit():
+        history = history.filter(supplier_id=int(supplier_id))
+    return JsonResponse({"product_id": product_id, "history": await _alist(history)})
+
+
+# POS scanning
+
+def sku_lookup_view(request, sku):
+    # Prices are for the counters: POS devices and users who record sales
+    rejected = _pos_unauthorized(request)
+    if rejected is not None:
+        return rejected
+    record, source = skus.sku_lookup.lookup(sku)
+    if record is None:
+        response = JsonResponse({"sku": sku, "error": "Unknown SKU"}, status=404)
+    else:
+        response = JsonResponse(record.as_dict())
+    response["X-Sku-Source"] = source
+    return response
+
+
+def _device_branch(request):
+    """
+    (authenticated, branch) for a request carrying an "Authorization: Token
+    <token>" header: the branch is the one POS_DEVICE_TOKENS assigns to the
+    device, never one the request names.
+    """
+    token = request.headers["Authorization"].partition(" ")[2].strip()
+    for known, branch in getattr(settings, "POS_DEVICE_TOKENS", {}).items():
+        if token and hmac.compare_digest(token.encode(), known.encode()):
+            return True, branch
+    return False, None
+
+
+def _pos_unauthorized(request):
+    """
+    An error response unless the request comes from a POS device, by its
+    token, or from a signed-in user allowed to add sales.
+    """
+    if "Authorization" in request.headers:
+        if not _device_branch(request)[0]:
+            response = JsonResponse({"error": "Invalid device token"}, status=401)
+            response["WWW-Authenticate"] = "Token"
+            return response
+        return None
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Sign in or send a device token"}, status=401)
+    if not request.user.has_perm("epicerieapp.add_sale"):
+        return JsonResponse({"error": "Not allowed to record sales"}, status=403)
+    return None
+
+
+def _pos_branch(request):
+    """
+    The branch a POS request may record sales for, or an error response.
+    Devices authenticate with their token; browsers with a signed-in user
+    allowed to add sales, selling for the branch chosen in their session,
+    and are subject to the usual CSRF check.
+    """
+    rejected = _pos_unauthorized(request)
+    if rejected is not None:
+        return None, rejected
+    if "Authorization" in request.headers:
+        branch = _device_branch(request)[1]
+    else:
+        rejected = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+        if rejected is not None:
+            return None, rejected
+        branch = request.session.get("branch")
+    if branch not in sharding.branches():
+        return None, JsonResponse({"error": "No branch selected"}, status=400)
+    return branch, None
+
+
+@csrf_exempt  # Checked in _pos_branch() unless a device token is sent
+@require_POST
+def pos_sale_view(request):
+    # Acknowledged once the sale is in the local journal; the upload to the
+    # branch database happens in the background (see pos_journal.py)
+    branch, error = _pos_branch(request)
+    if error is not None:
+        return error
+    try:
+        payload = json.loads(request.body)
+        lines = [(line["product_id"], line["quantity"], line["unit_price"]) for line in payload["lines"]]
+        sale_id = pos_journal.sale_capture.capture(branch, lines, sale_id=payload.get("id"))
+    except (ValueError, KeyError, TypeError, ArithmeticError, pos_journal.JournalError) as exc:
+        return JsonResponse({"error": f"Invalid sale: {exc}"}, status=400)
+    return JsonResponse({"id": sale_id, "branch": branch, "status": "journaled"}, status=202)
+
+
+# Purchasing
+
+@require_POST
+@staff_member_required
+def purchase_plan_view(request):
+    try:
+        payload = json.loads(request.body)
+        lines = [(line["product_id"], line["quantity"]) for line in payload["lines"]]
+        plan = purchasing.plan_purchase(lines)
+    except (ValueError, KeyError, TypeError, ArithmeticError, purchasing.PurchaseError) as exc:
+        return JsonResponse({"error": f"Invalid order: {exc}"}, status=400)
+    return JsonResponse(plan)
+
+
+# Background jobs
+JOB_LIST_SIZE = 50
+
+
+@staff_member_required
+def job_status_view(request, job_id):
+    return JsonResponse(jobs.job_status(get_object_or_404(Job, pk=job_id)))
+
+
+@staff_member_required
+def job_list_view(request):
+    # Queued and running jobs, then the most recently finished ones
+    active = Job.objects.filter(status__in=[jobs.QUEUED, jobs.RUNNING]).order_by("-priority", "run_after")
+    finished = Job.objects.filter(status__in=[jobs.SUCCEEDED, jobs.FAILED]).order_by("-finished_at")
+    return JsonResponse({
+        "active": [jobs.job_status(job) for job in active[:JOB_LIST_SIZE]],
+        "finished": [jobs.job_status(job) for job in finished[:JOB_LIST_SIZE]],
+    })
+
+
+@staff_member_required
+def perf_dashboard_view(request):
+    snapshot = route_stats.snapshot()
+    snapshot["fragments"] = fragment_stats()
+    snapshot["replica"] = replicas.replica_status()
+    snapshot["sku_index"] = skus.sku_lookup.status()
+    if request.GET.get("format") == "json":
+        return JsonResponse(snapshot)
+    return render(
+        request,
+        "epicerieapp/perf_dashboard.html",
+        {
+            "routes": snapshot["routes"].items(),
+            "buckets_ms": snapshot["buckets_ms"],
+            "ring_size": route_stats.size,
+            "fragments": snapshot["fragments"].items(),
+            "replica": snapshot["replica"],
+            "sku_index": snapshot["sku_index"],
+        },
+    )
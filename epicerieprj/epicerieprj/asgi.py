@@ -11,6 +11,18 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'homeprj.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'epicerieprj.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Sends 103 Early Hints with each page's preload links when the server
+# supports the http.response.early_hint extension (see epicerieapp/preload.py).
+from epicerieapp.preload import EarlyHintsMiddleware  # noqa: E402
+
+application = EarlyHintsMiddleware(django_application)
+
+# Load the POS SKU index now rather than at the first scan (see
+# epicerieapp/skus.py); processes forked from this one start their own.
+from epicerieapp.skus import sku_lookup  # noqa: E402
+
+sku_lookup.start()
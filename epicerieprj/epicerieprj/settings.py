@@ -56,16 +56,21 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'epicerieapp.middleware.PerformanceMiddleware',
+    'epicerieapp.querylog.QueryInspectorMiddleware',
+    'epicerieapp.preload.PreloadHintsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'epicerieapp.replicas.ReadYourWritesMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'epicerieapp.sharding.BranchMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'homeprj.urls'
+ROOT_URLCONF = 'epicerieprj.urls'
 
 TEMPLATES = [
     {
@@ -78,12 +83,13 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'epicerieapp.context_processors.navigation',
             ],
         },
     },
 ]
 
-WSGI_APPLICATION = 'homeprj.wsgi.application'
+WSGI_APPLICATION = 'epicerieprj.wsgi.application'
 
 
 # Database
@@ -93,7 +99,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db/db.sqlite3',
+    },
+    # Snapshot of 'default' for reports and exports, refreshed by
+    # `manage.py refresh_replica` (see epicerieapp/replicas.py)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db/replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Per-branch databases for sales and stock movements (see
+# epicerieapp/sharding.py); the catalog stays in 'default'. Add a branch code
+# here, then run `manage.py shards migrate` to create its database.
+BRANCHES = ['main']
+DEFAULT_BRANCH = 'main'
+DATABASES.update({
+    f'branch_{branch}': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db/branch_{branch}.sqlite3',
     }
+    for branch in BRANCHES
+})
+DATABASE_ROUTERS = ['epicerieapp.replicas.ReplicaRouter', 'epicerieapp.sharding.BranchRouter']
+
+# Report replica: decorated views fall back to 'default' when the snapshot is
+# older than MAX_LAG_SECONDS
+REPORT_REPLICA = {
+    'ALIAS': 'replica',
+    'MAX_LAG_SECONDS': 300,
+    'PAGES_PER_STEP': 1024,
+    'LOCK_TIMEOUT_SECONDS': 30,
 }
 
 
@@ -134,6 +170,118 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Purged CSS bundle and inlined critical CSS built by `manage.py build_css`
+# (epicerieapp/cssbuild.py). Templates use the source stylesheets until the
+# bundle is built, and while developing so CSS edits show without a rebuild.
+CSS_BUNDLE_ENABLED = not DEBUG
+CSS_CRITICAL_FOLD_CHARS = 1500
+CSS_PURGE_SAFELIST = []
+
+# Responsive image variants built by `manage.py build_images` (needs Pillow)
+# for the {% responsive_image %} tag: widths in pixels and output formats.
+IMAGE_BREAKPOINTS = [320, 480, 768, 1024, 1440, 1920]
+IMAGE_FORMATS = ['webp', 'jpeg']
+IMAGE_QUALITY = {'webp': 75, 'jpeg': 80}
+
+# Web font subsetting by `manage.py build_fonts` (needs fontTools and brotli):
+# stylesheets whose @font-face rules are rewritten, characters kept besides
+# those in the templates (Latin-1 covers Filipino/Spanish names; U+20B1 is
+# the peso sign) and faces preloaded as family:weight.
+FONT_STYLESHEETS = ['homeapp/css/fonts.css', 'css/css2.css']
+FONT_SUBSET_RANGES = 'U+0020-007E, U+00A0-00FF, U+2013-2014, U+2018-201E, U+2022, U+2026, U+20AC, U+20B1'
+FONT_DISPLAY = 'swap'
+FONT_PRELOAD = ['Poppins:400']
+
+# Link: rel=preload headers, and 103 Early Hints under ASGI, listing the
+# assets of each page (see epicerieapp/preload.py)
+PRELOAD_HINTS = {
+    'ENABLED': True,
+    'MAX_LINKS': 12,
+    'EARLY_HINTS': True,
+}
+
+# Change log of the catalog tables (see epicerieapp/cdc.py); `manage.py
+# changelog prune` deletes entries every consumer has read once they are
+# older than RETENTION_DAYS.
+CHANGE_LOG = {
+    'BATCH_SIZE': 500,
+    'GAP_GRACE_SECONDS': 30,
+    'RETENTION_DAYS': 7,
+}
+
+# POS barcode/SKU lookups (/pos/sku/<sku>/) are answered from an in-memory
+# index (see epicerieapp/skus.py), loaded in a background thread once a
+# server process serves its first lookup and refreshed from the change log
+# every REFRESH_SECONDS.
+SKU_LOOKUP = {
+    'ENABLED': True,
+    'REFRESH_SECONDS': 1.0,
+    'RETRY_MAX_SECONDS': 60,
+    'LOAD_CHUNK': 5000,
+}
+
+# POS sales are journaled to local files and uploaded to the branch
+# databases in the background (see epicerieapp/pos_journal.py). A journal
+# whose process has not heartbeated for ORPHAN_SECONDS is taken over and
+# uploaded by another process.
+POS_JOURNAL = {
+    'DIR': BASE_DIR / 'db/pos_journal',
+    'SYNC_DELAY_SECONDS': 0.002,
+    'SEGMENT_BYTES': 4 * 1024 * 1024,
+    'UPLOAD_BATCH': 200,
+    'UPLOAD_INTERVAL_SECONDS': 0.5,
+    'RETRY_MAX_SECONDS': 60,
+    'ORPHAN_SECONDS': 60,
+}
+
+# POS devices posting sales (/pos/sales/) without a signed-in user, as
+# "Authorization: Token <token>": token -> the branch code the device sells
+# for. Keep the real tokens out of version control.
+POS_DEVICE_TOKENS = {}
+
+# Nightly demand forecast (`manage.py forecast_orders`, see
+# epicerieapp/forecasting.py): reorder suggestions per branch for the
+# inventory page. PRODUCT_BLOCK x HISTORY_DAYS bounds the demand matrix held
+# in memory.
+FORECAST = {
+    'HISTORY_DAYS': 56,
+    'LEAD_TIME_DAYS': 3,
+    'REVIEW_DAYS': 7,
+    'SERVICE_LEVEL_Z': 1.65,
+    'SMOOTHING': 0.1,
+    'SEASONAL_PRIOR_UNITS': 28,
+    'PRODUCT_BLOCK': 20000,
+    'CHUNK_ROWS': 50000,
+}
+
+# Background jobs run by `manage.py run_workers` (see epicerieapp/jobs.py).
+# A job's lease is its visibility timeout: a job whose worker stops renewing
+# it is claimed again after LEASE_SECONDS.
+JOBS = {
+    'LEASE_SECONDS': 60,
+    'POLL_SECONDS': 1.0,
+    'CLAIM_BATCH': 10,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'TASK_MODULES': ['epicerieapp.tasks'],
+    'OUTPUT_DIR': BASE_DIR / 'db/job_output',
+}
+
+# Request performance dashboard (/__perf/): samples kept per route
+PERF_RING_SIZE = 500
+
+# Cached header/footer fragments (templatetags/chrome.py). Set
+# CHROME_CACHE_VERSION to the deployed release to invalidate on deploy;
+# by default a hash of the template files is used.
+CHROME_CACHE_TIMEOUT = 24 * 60 * 60
+
+# N+1 and slow-query detection (see epicerieapp/querylog.py)
+QUERY_INSPECTOR = {
+    'ENABLED': DEBUG,
+    'SLOW_QUERY_MS': 100,
+    'REPEAT_THRESHOLD': 5,
+    'RAISE_ON_REPEAT': False,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -11,6 +11,12 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'homeprj.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'epicerieprj.settings')
 
 application = get_wsgi_application()
+
+# Load the POS SKU index now rather than at the first scan (see
+# epicerieapp/skus.py); processes forked from this one start their own.
+from epicerieapp.skus import sku_lookup  # noqa: E402
+
+sku_lookup.start()
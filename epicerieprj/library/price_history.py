@@ -0,0 +1,296 @@
+"""
+Price-history analytics over SupplierProductCatalog.
+
+The DealersPrice/PriceEntryDate series are loaded once into columnar NumPy
+arrays and refreshed incrementally by PriceEntryDate, so the Reports tab and the
+"View Price History" use case can compute statistics for every product in a
+single vectorized call instead of querying row by row.
+
+Works with any DB-API connection (pyodbc for the SQL Server desktop client,
+Django's connection for the web reports in epicerieapp/reports.py); pass the
+placeholder of its paramstyle. Keep one PriceHistory per connection for as
+long as the connection is open.
+"""
+import threading
+
+import numpy as np
+
+FETCH_SIZE = 10000
+
+# Periods kept in the (products x periods) matrices of the per-period
+# analytics; older prices are left out so daily periods over years of
+# history stay small
+MAX_PERIODS = 120
+
+_PRICE_ROWS_SQL = """
+    SELECT SupplierID, ProductID, PriceEntryDate, DealersPrice
+    FROM SupplierProductCatalog
+    {where}
+"""
+
+_PERIOD_UNITS = {
+    "D": "datetime64[D]",
+    "W": "datetime64[W]",
+    "M": "datetime64[M]",
+    "Y": "datetime64[Y]",
+}
+
+
+class PriceHistory:
+    """
+    Columnar, in-memory copy of the supplier price history.
+
+    Rows are kept sorted by (ProductID, SupplierID, PriceEntryDate) so that
+    per-product and per-(supplier, product) groups are contiguous slices.
+    """
+
+    def __init__(self, db_connection, placeholder="?"):
+        self.db_connection = db_connection
+        self.placeholder = placeholder
+        self.supplier_ids = np.empty(0, dtype=np.int64)
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.entry_dates = np.empty(0, dtype="datetime64[D]")
+        self.prices = np.empty(0, dtype=np.float64)
+        self.last_entry_date = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.prices)
+
+    def reload(self):
+        """
+        Discard the cached arrays and load the full history again.
+        Needed only when back-dated prices were entered.
+        """
+        with self._lock:
+            self.last_entry_date = None
+            self._set_columns(*self._fetch(None))
+
+    def refresh(self):
+        """
+        Fetch rows entered on or after the last seen PriceEntryDate and merge
+        them into the cached arrays. Returns the number of rows fetched.
+
+        The last date is fetched again because more prices may have been added
+        for it since the previous refresh; its cached rows are replaced.
+        """
+        with self._lock:
+            since = self.last_entry_date
+            supplier_ids, product_ids, entry_dates, prices = self._fetch(since)
+
+            if since is None:
+                self._set_columns(supplier_ids, product_ids, entry_dates, prices)
+                return len(prices)
+
+            keep = self.entry_dates < since
+            self._set_columns(
+                np.concatenate((self.supplier_ids[keep], supplier_ids)),
+                np.concatenate((self.product_ids[keep], product_ids)),
+                np.concatenate((self.entry_dates[keep], entry_dates)),
+                np.concatenate((self.prices[keep], prices)),
+            )
+            return len(prices)
+
+    def _fetch(self, since):
+        cursor = self.db_connection.cursor()
+        if since is None:
+            cursor.execute(_PRICE_ROWS_SQL.format(where=""))
+        else:
+            cursor.execute(
+                _PRICE_ROWS_SQL.format(where=f"WHERE PriceEntryDate >= {self.placeholder}"),
+                (since.item().isoformat(),),
+            )
+
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            supplier_ids, product_ids, entry_dates, prices = zip(*rows)
+            chunks.append((
+                np.array(supplier_ids, dtype=np.int64),
+                np.array(product_ids, dtype=np.int64),
+                np.array([str(d)[:10] for d in entry_dates], dtype="datetime64[D]"),
+                np.array(prices, dtype=np.float64),
+            ))
+        cursor.close()
+
+        if not chunks:
+            return (
+                np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=np.int64),
+                np.empty(0, dtype="datetime64[D]"),
+                np.empty(0, dtype=np.float64),
+            )
+        return tuple(np.concatenate(column) for column in zip(*chunks))
+
+    def _set_columns(self, supplier_ids, product_ids, entry_dates, prices):
+        order = np.lexsort((entry_dates, supplier_ids, product_ids))
+        self.supplier_ids = supplier_ids[order]
+        self.product_ids = product_ids[order]
+        self.entry_dates = entry_dates[order]
+        self.prices = prices[order]
+        if len(entry_dates):
+            self.last_entry_date = self.entry_dates.max()
+
+    # Grouping helpers
+
+    def _group_starts(self, *keys):
+        """
+        Start index of every run of equal keys in the sorted arrays.
+        """
+        if not len(self.prices):
+            return np.empty(0, dtype=np.intp)
+        changed = np.zeros(len(self.prices), dtype=bool)
+        changed[0] = True
+        for key in keys:
+            changed[1:] |= key[1:] != key[:-1]
+        return np.flatnonzero(changed)
+
+    def _latest_rows(self):
+        """
+        Index of the most recent row for each (SupplierID, ProductID).
+        """
+        starts = self._group_starts(self.product_ids, self.supplier_ids)
+        if not len(starts):
+            return starts
+        return np.append(starts[1:], len(self.prices)) - 1
+
+    def _period_matrix(self, period, max_periods=MAX_PERIODS):
+        """
+        Average price per product in each of the latest ``max_periods``
+        periods with prices, as a (products x periods) matrix, NaN where a
+        product has no price in that period. Every product has a row, even
+        one without prices in those periods.
+        """
+        periods = self.entry_dates.astype(_PERIOD_UNITS[period])
+        period_labels, period_index = np.unique(periods, return_inverse=True)
+        product_labels, product_index = np.unique(self.product_ids, return_inverse=True)
+
+        first = max(len(period_labels) - max_periods, 0)
+        period_labels = period_labels[first:]
+        recent = period_index >= first
+        cells = product_index[recent] * len(period_labels) + period_index[recent] - first
+        size = len(product_labels) * len(period_labels)
+        totals = np.bincount(cells, weights=self.prices[recent], minlength=size)
+        counts = np.bincount(cells, minlength=size)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages = totals / counts
+        shape = (len(product_labels), len(period_labels))
+        return product_labels, period_labels, averages.reshape(shape)
+
+    # Analytics
+
+    def product_stats(self):
+        """
+        Minimum, maximum and average DealersPrice per product over all suppliers.
+        """
+        starts = self._group_starts(self.product_ids)
+        if not len(starts):
+            empty = np.empty(0)
+            return {
+                "product_id": empty.astype(np.int64),
+                "min": empty,
+                "max": empty,
+                "avg": empty,
+                "count": empty.astype(np.int64),
+            }
+
+        counts = np.diff(np.append(starts, len(self.prices)))
+        return {
+            "product_id": self.product_ids[starts],
+            "min": np.minimum.reduceat(self.prices, starts),
+            "max": np.maximum.reduceat(self.prices, starts),
+            "avg": np.add.reduceat(self.prices, starts) / counts,
+            "count": counts,
+        }
+
+    def latest_prices(self):
+        """
+        Current price of every (supplier, product) pair, like
+        vw_SupplierProductsCurrentPrices.
+        """
+        latest = self._latest_rows()
+        return {
+            "supplier_id": self.supplier_ids[latest],
+            "product_id": self.product_ids[latest],
+            "price_entry_date": self.entry_dates[latest],
+            "dealers_price": self.prices[latest],
+        }
+
+    def supplier_spreads(self):
+        """
+        Spread between the cheapest and dearest current supplier price per
+        product, with the supplier offering the lowest price.
+        """
+        latest = self._latest_rows()
+        product_ids = self.product_ids[latest]
+        supplier_ids = self.supplier_ids[latest]
+        prices = self.prices[latest]
+
+        # Latest rows stay sorted by product; order by price within each product.
+        order = np.lexsort((prices, product_ids))
+        product_ids, supplier_ids, prices = product_ids[order], supplier_ids[order], prices[order]
+
+        if not len(prices):
+            empty = np.empty(0)
+            return {
+                "product_id": empty.astype(np.int64),
+                "min": empty,
+                "max": empty,
+                "spread": empty,
+                "suppliers": empty.astype(np.int64),
+                "cheapest_supplier_id": empty.astype(np.int64),
+            }
+
+        starts = np.flatnonzero(np.r_[True, product_ids[1:] != product_ids[:-1]])
+        ends = np.append(starts[1:], len(prices)) - 1
+        return {
+            "product_id": product_ids[starts],
+            "min": prices[starts],
+            "max": prices[ends],
+            "spread": prices[ends] - prices[starts],
+            "suppliers": ends - starts + 1,
+            "cheapest_supplier_id": supplier_ids[starts],
+        }
+
+    def period_over_period(self, period="M", periods=MAX_PERIODS):
+        """
+        Percentage change of the average price between consecutive periods
+        ("D", "W", "M" or "Y") for every product, over the latest ``periods``
+        periods with prices.
+
+        Returns product ids, period labels and a (products x periods) matrix whose
+        first column and any period without prices on both sides are NaN.
+        """
+        product_ids, periods, averages = self._period_matrix(period, periods)
+        change = np.full(averages.shape, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change[:, 1:] = (averages[:, 1:] - averages[:, :-1]) / averages[:, :-1] * 100
+        return {"product_id": product_ids, "period": periods, "change_pct": change}
+
+    def moving_average(self, window, period="D", periods=MAX_PERIODS):
+        """
+        Trailing moving average of the per-period average price over ``window``
+        periods for every product, over the latest ``periods`` periods with
+        prices (the first ``window - 1`` of them average fewer). Periods
+        without prices are skipped rather than counted as zero.
+        """
+        product_ids, periods, averages = self._period_matrix(period, periods)
+        present = ~np.isnan(averages)
+        values = np.where(present, averages, 0.0)
+
+        zeros = np.zeros((values.shape[0], 1))
+        value_sums = np.hstack((zeros, np.cumsum(values, axis=1)))
+        count_sums = np.hstack((zeros, np.cumsum(present, axis=1)))
+
+        upper = np.arange(1, values.shape[1] + 1)
+        lower = np.maximum(upper - window, 0)
+        totals = value_sums[:, upper] - value_sums[:, lower]
+        counts = count_sums[:, upper] - count_sums[:, lower]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            moving = totals / counts
+        return {"product_id": product_ids, "period": periods, "moving_avg": moving}
+